@@ -1,9 +1,31 @@
 # analysis.py
 
+import asyncio
+import json
+import logging
 import os
-from typing import List
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Type
 from pydantic import BaseModel
-import openai
+
+from json_stream import JsonEvent, JsonStreamParser
+from llm_client import get_llm_client
+from metrics import SEGMENT_ANALYSES
+
+if TYPE_CHECKING:
+    from context import RollingContext
+
+logger = logging.getLogger(__name__)
+
+# Target length of the rolling summary produced by summarize_conversation
+SUMMARY_MAX_WORDS = 150
+
+# Follow-up sent once when a JSON response doesn't parse or match its schema
+REPAIR_PROMPT = """Your previous response could not be used: {error}
+
+Reply again with ONLY the corrected JSON, conforming to the schema in the instructions and without additional commentary or formatting."""
 
 class TranscriptEntry(BaseModel):
     """
@@ -13,21 +35,57 @@ class TranscriptEntry(BaseModel):
     speaker: str
     transcript: str
 
-def get_meeting_objective(transcript_entries: List[TranscriptEntry]) -> str:
+def format_entries(transcript_entries: List[TranscriptEntry]) -> str:
     """
-    Given a list of transcript entries, this function:
-      1) Aggregates them into a single string (conversation_history).
-      2) Defines a system prompt instructing the LLM to produce a JSON array
-         with the conversation's objective.
-      3) Calls your SambaNova (or other) LLM using openai.py.
-      4) Returns the LLM's textual response (expected to be valid JSON).
+    Render transcript entries as "speaker: text" lines.
     """
-    # Build a single text of all speaker transcripts
-    conversation_history = "\n".join(
+    return "\n".join(
         f"{entry.speaker}: {entry.transcript}"
         for entry in transcript_entries
     )
 
+async def build_conversation_history(
+    transcript_entries: List[TranscriptEntry],
+    context: Optional["RollingContext"] = None,
+) -> str:
+    """
+    Return the conversation text for a prompt. Without a context this is the
+    full transcript; with a RollingContext it is the rolling summary plus the
+    most recent entries, so prompt size stays bounded over long meetings.
+    """
+    if context is None:
+        return format_entries(transcript_entries)
+    await context.update(transcript_entries)
+    return context.render()
+
+async def summarize_conversation(previous_summary: str, transcript_entries: List[TranscriptEntry]) -> str:
+    """
+    Fold a batch of transcript entries into a running summary of the
+    conversation and return the new summary as plain text.
+    """
+    system_prompt = f"""You maintain a running summary of a conversation among multiple participants.
+
+You are given the current summary (possibly empty) and the next part of the conversation.
+
+Return an updated summary that:
+- Covers the whole conversation so far, including the topics, decisions, disagreements and the stance of each speaker.
+- Keeps speaker labels exactly as they appear.
+- Is at most {SUMMARY_MAX_WORDS} words.
+- MUST NOT include additional commentary or formatting."""
+
+    user_content = (
+        f"Current summary:\n{previous_summary or '(none)'}\n\n"
+        f"Next part of the conversation:\n{format_entries(transcript_entries)}"
+    )
+
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_content}
+    ]
+
+    return await get_llm_client().complete("summary", messages, json_mode=False)
+
+def objective_messages(conversation_history: str) -> List[dict]:
     system_prompt = """You are reviewing a conversation among multiple participants.
 
     Your goal is to produce a JSON array containing the objective of the conversation.
@@ -41,35 +99,45 @@ def get_meeting_objective(transcript_entries: List[TranscriptEntry]) -> str:
       ]
     - MUST NOT include additional commentary or formatting."""
 
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": conversation_history}
     ]
 
-    client = openai.OpenAI(
-        api_key=os.environ.get("SAMBANOVA_API_KEY"),
-        base_url="https://api.sambanova.ai/v1",
-    )
-
-    response = client.chat.completions.create(
-        model="Meta-Llama-3.3-70B-Instruct",
-        messages=messages,
-        response_format={"type": "json_object"},  # optional, depends on your config
-        temperature=0.1,
-        top_p=0.1
-    )
-
-    llm_content = response.choices[0].message.content
-    return llm_content
-
-def get_speaker_sentiment(transcript_entries: List[TranscriptEntry]) -> str:
+async def get_meeting_objective(
+    transcript_entries: List[TranscriptEntry],
+    context: Optional["RollingContext"] = None,
+) -> str:
     """
     Given a list of transcript entries, this function:
-      1) Aggregates them into a single string (conversation_history).
+      1) Aggregates them into a single string (conversation_history), using
+         the rolling summary + recent window when a context is given.
       2) Defines a system prompt instructing the LLM to produce a JSON array
-         with a sentiment score per speaker.
-      3) Calls your SambaNova (or other) LLM using openai.py.
+         with the conversation's objective.
+      3) Calls your SambaNova (or other) LLM through the shared LLMClient.
       4) Returns the LLM's textual response (expected to be valid JSON).
+    """
+    # Build a single text of the speaker transcripts
+    conversation_history = await build_conversation_history(transcript_entries, context)
+    return await get_llm_client().complete("objective", objective_messages(conversation_history))
+
+async def analyze_objective(
+    transcript_entries: List[TranscriptEntry],
+    context: Optional["RollingContext"] = None,
+    on_event: Optional[Callable[[JsonEvent], Awaitable[None]]] = None,
+) -> List[dict]:
+    """
+    get_meeting_objective, decoded and validated as [{"Objective": str}]
+    (see complete_json for streaming and the repair retry).
+    """
+    conversation_history = await build_conversation_history(transcript_entries, context)
+    return await complete_json("objective", objective_messages(conversation_history), validate_objective, on_event)
+
+async def score_speaker_delta(speaker: str, new_text: str, previous_score: Optional[float] = None) -> str:
+    """
+    Score only the newest text of a single speaker. The previous running
+    score is passed along so the LLM can judge the new text in context
+    without re-reading the whole meeting.
 
     The LLM's response is expected to be valid JSON of the form:
       [
@@ -79,16 +147,11 @@ def get_speaker_sentiment(transcript_entries: List[TranscriptEntry]) -> str:
         }
       ]
     """
-    conversation_history = "\n".join(
-        f"{entry.speaker}: {entry.transcript}"
-        for entry in transcript_entries
-    )
-
-    system_prompt = """You are reviewing a conversation among multiple participants.
+    system_prompt = """You are scoring the sentiment of one participant in a conversation.
 
-Your goal is to produce a JSON array containing the sentiment score per speaker provided in the conversation.
+You are given the speaker's sentiment score so far (if any) and ONLY the text they have said since that score was computed.
 
-For each unique speaker, compute a sentiment score that reflects the overall tone of that individual speaker. Make sure to compute the sentiment score ONLY for that speaker. The sentiment score should be a floating point number between -1 (very negative) and 1 (very positive).
+Compute a sentiment score for the new text alone. The sentiment score should be a floating point number between -1 (very negative) and 1 (very positive).
 
 The output:
 - MUST be valid JSON conforming to the schema below:
@@ -100,23 +163,538 @@ The output:
   ]
 - MUST NOT include additional commentary or formatting."""
 
+    previous = "none" if previous_score is None else f"{previous_score:.2f}"
+    user_content = (
+        f"Speaker: {speaker}\n"
+        f"Sentiment so far: {previous}\n"
+        f"New text: {new_text}"
+    )
+
     messages = [
         {"role": "system", "content": system_prompt},
-        {"role": "user", "content": conversation_history}
+        {"role": "user", "content": user_content}
     ]
 
-    client = openai.OpenAI(
-        api_key=os.environ.get("SAMBANOVA_API_KEY"),
-        base_url="https://api.sambanova.ai/v1",
-    )
+    # Validated (with one repair retry) but still returned as text, as before
+    return json.dumps(await complete_json("sentiment_delta", messages, validate_sentiment))
+
+def combined_messages(conversation_history: str, speaker_updates: List[Tuple[str, str, Optional[float]]]) -> List[dict]:
+    system_prompt = """You are reviewing a conversation among multiple participants.
 
-    response = client.chat.completions.create(
-        model="Meta-Llama-3.3-70B-Instruct",
-        messages=messages,
-        response_format={"type": "json_object"},  # optional, depends on your config
-        temperature=0.1,
-        top_p=0.1
+You have two tasks:
+1) Determine the objective of the conversation.
+2) For each speaker listed under "New text per speaker", compute a sentiment score for that new text alone. You are given each speaker's sentiment score so far (if any) for context. The sentiment score should be a floating point number between -1 (very negative) and 1 (very positive).
+
+The output:
+- MUST be valid JSON conforming to the schema below:
+  {
+    "Objective": "some string",
+    "Sentiment": [
+      {
+        "Speaker": "speaker name",
+        "Sentiment": sentiment score (number)
+      }
+    ]
+  }
+- MUST NOT include additional commentary or formatting."""
+
+    updates = "\n".join(
+        f"{speaker} (sentiment so far: {'none' if previous is None else f'{previous:.2f}'}): {new_text}"
+        for speaker, new_text, previous in speaker_updates
+    )
+    user_content = (
+        f"Conversation:\n{conversation_history}\n\n"
+        f"New text per speaker:\n{updates or '(none)'}"
     )
 
-    llm_content = response.choices[0].message.content
-    return llm_content
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_content}
+    ]
+
+async def get_combined_analysis(
+    transcript_entries: List[TranscriptEntry],
+    speaker_updates: List[Tuple[str, str, Optional[float]]],
+    context: Optional["RollingContext"] = None,
+) -> str:
+    """
+    Batched mode: answer the objective and the per-speaker sentiment deltas
+    in one structured prompt instead of one request each.
+
+    `speaker_updates` holds (speaker, new text, previous score) for every
+    speaker with unscored text, as in score_speaker_delta.
+
+    The LLM's response is expected to be valid JSON of the form:
+      {
+        "Objective": "some string",
+        "Sentiment": [
+          {
+            "Speaker": "speaker name",
+            "Sentiment": sentiment score (float)
+          }
+        ]
+      }
+    """
+    conversation_history = await build_conversation_history(transcript_entries, context)
+    return await get_llm_client().complete("combined", combined_messages(conversation_history, speaker_updates))
+
+async def analyze_combined(
+    transcript_entries: List[TranscriptEntry],
+    speaker_updates: List[Tuple[str, str, Optional[float]]],
+    context: Optional["RollingContext"] = None,
+    on_event: Optional[Callable[[JsonEvent], Awaitable[None]]] = None,
+) -> dict:
+    """
+    get_combined_analysis, decoded and validated (see complete_json for
+    streaming and the repair retry).
+    """
+    conversation_history = await build_conversation_history(transcript_entries, context)
+    messages = combined_messages(conversation_history, speaker_updates)
+    return await complete_json("combined", messages, validate_combined, on_event)
+
+# -------------------
+# Structured responses
+# -------------------
+class ObjectiveItem(BaseModel):
+    Objective: str
+
+class SpeakerSentimentItem(BaseModel):
+    # Single-speaker answers sometimes leave the speaker out
+    Speaker: Optional[str] = None
+    Sentiment: float
+
+class CombinedAnalysis(BaseModel):
+    Objective: str
+    Sentiment: List[SpeakerSentimentItem] = []
+
+def validate_objective(data) -> List[dict]:
+    """
+    Check an objective response. JSON mode may force a bare object, or the
+    array wrapped in one, instead of the documented array.
+    """
+    if isinstance(data, dict) and "Objective" not in data:
+        data = next((value for value in data.values() if isinstance(value, list)), data)
+    items = data if isinstance(data, list) else [data]
+    if not items:
+        raise ValueError("expected at least one objective")
+    return [ObjectiveItem.model_validate(item).model_dump() for item in items]
+
+def validate_sentiment(data) -> List[dict]:
+    """Check a sentiment response; JSON mode may force a bare object instead of the array."""
+    items = data if isinstance(data, list) else [data]
+    if not items:
+        raise ValueError("expected at least one sentiment score")
+    return [SpeakerSentimentItem.model_validate(item).model_dump() for item in items]
+
+def validate_combined(data) -> dict:
+    return CombinedAnalysis.model_validate(data).model_dump()
+
+
+async def complete_json(
+    kind: str,
+    messages: List[dict],
+    validate: Callable[[object], object],
+    on_event: Optional[Callable[[JsonEvent], Awaitable[None]]] = None,
+):
+    """
+    Run a JSON prompt and return `validate(decoded response)`.
+
+    With `on_event` the response is streamed and parsed as it arrives, and
+    `on_event` is awaited with every array element and top-level member as
+    soon as it is complete, so callers can publish partial results before
+    the rest is generated. Events are not validated; callers check what they
+    use.
+
+    A response that doesn't decode or validate gets one repair request that
+    shows the model its answer and the error. Events from the repaired
+    answer are delivered too, so callers must tolerate seeing an item twice.
+    """
+    response = await _complete_json(kind, messages, on_event)
+    try:
+        return validate(json.loads(response))
+    except ValueError as e:
+        error = str(e).splitlines()[0] if str(e) else type(e).__name__
+        logger.warning(f"Invalid {kind} response ({error}); asking for a repair")
+        repair = messages + [
+            {"role": "assistant", "content": response},
+            {"role": "user", "content": REPAIR_PROMPT.format(error=e)},
+        ]
+        response = await _complete_json(f"{kind}_repair", repair, on_event)
+        return validate(json.loads(response))
+
+
+async def _complete_json(kind: str, messages: List[dict], on_event) -> str:
+    client = get_llm_client()
+    if on_event is None:
+        return await client.complete(kind, messages)
+    parser: Optional[JsonStreamParser] = JsonStreamParser()
+    parts = []
+    async for chunk in client.stream(kind, messages):
+        parts.append(chunk)
+        if parser is None:
+            continue
+        try:
+            events = parser.feed(chunk)
+        except ValueError:
+            # Malformed; the whole response goes through validation and repair
+            parser = None
+            continue
+        for event in events:
+            await on_event(event)
+    return "".join(parts)
+
+
+# -------------------
+# Segment analyzers
+# -------------------
+# Each analyzer is declared once below: its prompt, the schema its answer is
+# validated against, which segments it runs on and how much of the meeting
+# it sees. Live sessions run them on every finalized segment through the
+# shared AnalysisExecutor; batch_analyze.py runs them on archived messages.
+
+# Analyzers run on the finalized segments of live sessions ("" = none)
+SEGMENT_ANALYZERS = os.getenv("SEGMENT_ANALYZERS", "info_density,controversy,fallacies")
+# LLM requests of segment analyzers in flight across all sessions. Kept below
+# LLM_MAX_CONCURRENCY so objective and sentiment always find a free slot
+SEGMENT_ANALYSIS_CONCURRENCY = int(os.getenv("SEGMENT_ANALYSIS_CONCURRENCY", "4"))
+
+# Earlier messages of the same speaker shown to speaker-scope analyzers
+SPEAKER_CONTEXT_ENTRIES = 5
+# Most recent messages shown to meeting-scope analyzers, after the summary
+MEETING_CONTEXT_ENTRIES = 10
+# Snippets from the context index (this and past meetings) shown to analyzers
+# that check a message against what was said before
+RELATED_CONTEXT_ENTRIES = 5
+
+# How much of the meeting an analyzer sees besides the segment itself
+SCOPES = ("segment", "speaker", "meeting")
+
+CONTEXT_NOTE = """
+
+The message is given with earlier context from the conversation. Use the context only to understand the message; judge the message itself."""
+
+
+@dataclass
+class SegmentTrigger:
+    """
+    Which segments an analyzer runs on: those of at least `min_words` words
+    (backchannel like "yeah, right" isn't worth a call) that got a slot in
+    the shared budget within `max_delay` seconds. A segment that waited
+    longer is skipped by the analyzer, so a backlog sheds load instead of
+    delivering results long after the segment scrolled past.
+    """
+    min_words: int = 1
+    max_delay: float = 30.0  # seconds
+
+
+@dataclass
+class Analyzer:
+    """
+    One per-segment analysis. `name` is also the LLM request kind (cache key
+    and metrics label); `fields` turns the validated answer into the fields
+    it contributes to the segment's analysis record. With `related`, the
+    prompt also carries the earlier statements most relevant to the segment,
+    looked up in the context index.
+    """
+    name: str
+    prompt: str
+    schema: Type[BaseModel]
+    fields: Callable[[BaseModel], dict]
+    scope: str = "segment"
+    trigger: SegmentTrigger = field(default_factory=SegmentTrigger)
+    related: bool = False
+
+    def __post_init__(self):
+        if self.scope not in SCOPES:
+            raise ValueError(f"{self.name}: unknown scope {self.scope!r}")
+
+
+class InfoDensityResult(BaseModel):
+    info_density: float
+
+class MessageSentimentResult(BaseModel):
+    sentiment: float
+
+class ControversyResult(BaseModel):
+    controversial: bool
+
+class FallacyItem(BaseModel):
+    type: str = ""
+    segment: str = ""
+    explanation: str = ""
+
+class FallaciesResult(BaseModel):
+    fallacies: Optional[List[FallacyItem]] = None
+
+
+ANALYZERS: Dict[str, Analyzer] = {analyzer.name: analyzer for analyzer in [
+    Analyzer(
+        name="info_density",
+        prompt="""You are rating a single message from a conversation.
+
+Rate its information density: how much concrete, specific information (facts, numbers, decisions, technical details) it carries relative to its length. 0 means pure filler, 1 means every sentence carries new information.
+
+The output:
+- MUST be valid JSON conforming to the schema below:
+  {
+    "info_density": number between 0 and 1
+  }
+- MUST NOT include additional commentary or formatting.""",
+        schema=InfoDensityResult,
+        # Its own field, so it doesn't replace the lexical info_density filled in
+        # locally from speaker_stats when the segment was published
+        fields=lambda result: {"llm_info_density": min(1.0, max(0.0, result.info_density))},
+        trigger=SegmentTrigger(min_words=3),
+    ),
+    Analyzer(
+        name="message_sentiment",
+        prompt="""You are rating a single message from a conversation.
+
+Rate the sentiment of the message as a floating point number between -1 (very negative) and 1 (very positive).
+
+The output:
+- MUST be valid JSON conforming to the schema below:
+  {
+    "sentiment": number between -1 and 1
+  }
+- MUST NOT include additional commentary or formatting.""",
+        schema=MessageSentimentResult,
+        fields=lambda result: {"sentiment": min(1.0, max(-1.0, result.sentiment))},
+        trigger=SegmentTrigger(min_words=3),
+    ),
+    Analyzer(
+        # Whether a claim is contested depends on what the meeting has said so far
+        name="controversy",
+        prompt="""You are reviewing a single message from a conversation.
+
+Decide whether the message is controversial: it makes a contested, risky or misleading claim, or proposes something others in a professional setting are likely to object to.
+
+The output:
+- MUST be valid JSON conforming to the schema below:
+  {
+    "controversial": true or false
+  }
+- MUST NOT include additional commentary or formatting.""",
+        schema=ControversyResult,
+        fields=lambda result: {"controversial": result.controversial},
+        scope="meeting",
+        trigger=SegmentTrigger(min_words=5),
+        # ...and on what was said about the same subject in earlier meetings
+        related=True,
+    ),
+    Analyzer(
+        # An argument often spans several turns of the same speaker
+        name="fallacies",
+        prompt="""You are reviewing a single message from a conversation for logical fallacies.
+
+For each logical fallacy in the message, give its name, the exact segment of the message that contains it, and a one-sentence explanation. Return an empty list if there are none.
+
+The output:
+- MUST be valid JSON conforming to the schema below:
+  {
+    "fallacies": [
+      {
+        "type": "fallacy name",
+        "segment": "exact text from the message",
+        "explanation": "why this is a fallacy"
+      }
+    ]
+  }
+- MUST NOT include additional commentary or formatting.""",
+        schema=FallaciesResult,
+        fields=lambda result: {"fallacies": [item.model_dump() for item in result.fallacies or []]},
+        scope="speaker",
+        trigger=SegmentTrigger(min_words=8),
+    ),
+]}
+
+
+def load_segment_analyzers(spec: str = SEGMENT_ANALYZERS) -> List[Analyzer]:
+    """The analyzers named in `spec` (comma-separated). Raises ValueError for unknown names."""
+    names = [name.strip() for name in spec.split(",") if name.strip()]
+    unknown = [name for name in names if name not in ANALYZERS]
+    if unknown:
+        raise ValueError(f"Unknown segment analyzers: {', '.join(unknown)}")
+    return [ANALYZERS[name] for name in names]
+
+
+def analyzer_messages(
+    analyzer: Analyzer, transcript: str, speaker: str = "", context: str = "", related: str = ""
+) -> List[dict]:
+    """
+    The prompt of `analyzer` for one message, with the earlier `context` its
+    scope calls for and the `related` earlier statements from the context index.
+    """
+    if not context and not related:
+        return [
+            {"role": "system", "content": analyzer.prompt},
+            {"role": "user", "content": transcript}
+        ]
+    if not context:
+        user_content = f"Message:\n{speaker}: {transcript}" if speaker else f"Message:\n{transcript}"
+    elif analyzer.scope == "speaker":
+        user_content = f"Earlier messages by {speaker}:\n{context}\n\nMessage:\n{transcript}"
+    else:
+        user_content = f"Conversation so far:\n{context}\n\nMessage:\n{speaker}: {transcript}"
+    if related:
+        user_content = f"Related statements from this and earlier meetings:\n{related}\n\n{user_content}"
+    return [
+        {"role": "system", "content": analyzer.prompt + CONTEXT_NOTE},
+        {"role": "user", "content": user_content}
+    ]
+
+
+async def run_analyzer(
+    analyzer: Analyzer, transcript: str, speaker: str = "", context: str = "", related: str = ""
+) -> dict:
+    """
+    Run one analyzer on one message and return the fields it contributes to
+    the message's analysis record (see complete_json for the repair retry).
+    """
+    def validate(data) -> dict:
+        return analyzer.fields(analyzer.schema.model_validate(data))
+
+    messages = analyzer_messages(analyzer, transcript, speaker, context, related)
+    return await complete_json(analyzer.name, messages, validate)
+
+
+class AnalysisExecutor:
+    """
+    Runs segment analyzers for every session of the process under one
+    concurrency budget. The analyzers of a segment run concurrently with
+    each other and with those of other segments, but at most
+    `max_concurrency` of their LLM requests are in flight at once; the
+    rest wait in arrival order, subject to each analyzer's trigger.
+    """
+
+    def __init__(self, max_concurrency: int = SEGMENT_ANALYSIS_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.waiting = 0
+        self.running = 0
+        self.outcomes: Counter = Counter()
+
+    async def analyze(
+        self,
+        speaker: str,
+        transcript: str,
+        analyzers: Sequence[Analyzer],
+        get_context: Callable[[str, str], str],
+        on_result: Optional[Callable[[dict, List[str]], Awaitable[None]]] = None,
+        get_related: Optional[Callable[[], Awaitable[str]]] = None,
+    ) -> dict:
+        """
+        Run `analyzers` on one segment and return its merged analysis record.
+        `get_context(scope, speaker)` renders the earlier context for a
+        scope; it is called once a slot is free, so the context is current.
+        `on_result(record, pending)` is awaited each time an analyzer's
+        fields are merged, with the names of those still running.
+        `get_related()` renders the related earlier statements for analyzers
+        that want them (none without it).
+        """
+        record: dict = {}
+        words = len(transcript.split())
+        pending = [analyzer.name for analyzer in analyzers]
+
+        async def run(analyzer: Analyzer):
+            try:
+                fields = await self._run(analyzer, speaker, transcript, words, get_context, get_related)
+            finally:
+                pending.remove(analyzer.name)
+            if fields is not None:
+                record.update(fields)
+                if on_result is not None:
+                    await on_result(record, list(pending))
+
+        await asyncio.gather(*(run(analyzer) for analyzer in analyzers))
+        return record
+
+    async def _run(self, analyzer: Analyzer, speaker: str, transcript: str, words: int,
+                   get_context: Callable[[str, str], str],
+                   get_related: Optional[Callable[[], Awaitable[str]]]) -> Optional[dict]:
+        if words < analyzer.trigger.min_words:
+            return self._outcome(analyzer, "skipped_short")
+        queued = time.monotonic()
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            if time.monotonic() - queued > analyzer.trigger.max_delay:
+                return self._outcome(analyzer, "skipped_late")
+            self.running += 1
+            try:
+                context = get_context(analyzer.scope, speaker) if analyzer.scope != "segment" else ""
+                related = await get_related() if analyzer.related and get_related is not None else ""
+                fields = await run_analyzer(analyzer, transcript, speaker, context, related)
+            finally:
+                self.running -= 1
+        except Exception as e:
+            logger.error(f"Error running {analyzer.name} analysis: {e}")
+            return self._outcome(analyzer, "error")
+        finally:
+            self.semaphore.release()
+        self._outcome(analyzer, "ok")
+        return fields
+
+    def _outcome(self, analyzer: Analyzer, outcome: str) -> None:
+        self.outcomes[analyzer.name, outcome] += 1
+        SEGMENT_ANALYSES.labels(analyzer.name, outcome).inc()
+
+    def stats(self) -> dict:
+        analyzers: Dict[str, Dict[str, int]] = {}
+        for (name, outcome), count in self.outcomes.items():
+            analyzers.setdefault(name, {})[outcome] = count
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self.running,
+            "waiting": self.waiting,
+            "analyzers": analyzers,
+        }
+
+
+_executor: Optional[AnalysisExecutor] = None
+_executor_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_analysis_executor() -> AnalysisExecutor:
+    """Return the process-wide executor for the running event loop, creating it on first use."""
+    global _executor, _executor_loop
+    loop = asyncio.get_running_loop()
+    if _executor is None or _executor_loop is not loop:
+        _executor = AnalysisExecutor()
+        _executor_loop = loop
+    return _executor
+
+
+# -------------------
+# Per-message analyzers
+# -------------------
+async def analyze_info_density(transcript: str) -> float:
+    """
+    Score how much new, concrete information a single message carries,
+    from 0 (filler) to 1 (dense with facts, decisions or specifics).
+    """
+    return (await run_analyzer(ANALYZERS["info_density"], transcript))["llm_info_density"]
+
+async def analyze_sentiment(transcript: str) -> float:
+    """Score the tone of a single message, from -1 (very negative) to 1 (very positive)."""
+    return (await run_analyzer(ANALYZERS["message_sentiment"], transcript))["sentiment"]
+
+async def analyze_controversy(transcript: str) -> bool:
+    """Whether a single message makes a claim others are likely to dispute."""
+    return (await run_analyzer(ANALYZERS["controversy"], transcript))["controversial"]
+
+async def analyze_fallacies(transcript: str) -> dict:
+    """
+    Find logical fallacies in a single message.
+
+    Returns a dict of the form:
+      {
+        "fallacies": [
+          {"type": "fallacy name", "segment": "quoted text", "explanation": "why"}
+        ]
+      }
+    """
+    return await run_analyzer(ANALYZERS["fallacies"], transcript)
@@ -0,0 +1,401 @@
+# audio_preprocess.py
+
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+import numpy as np
+
+from audio_sources import SAMPLE_WIDTH
+from metrics import AUDIO_BYTES, AUDIO_SEND_DELAY
+
+logger = logging.getLogger(__name__)
+
+# Withhold silence from backends that allow it (Deepgram), keeping the stream
+# open with KeepAlive messages instead
+AUDIO_VAD = os.getenv("AUDIO_VAD", "true").lower() in ("1", "true", "yes")
+# A frame is speech when its level is above both this absolute floor and the
+# tracked background noise level plus VAD_MARGIN_DB
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "-50"))  # dBFS
+VAD_MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", "12"))
+VAD_FRAME_MS = int(os.getenv("VAD_FRAME_MS", "20"))
+# Audio still sent after the last speech frame; must outlast the backend's
+# endpointing silence, or utterances are only finalized when speech resumes
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", "800"))
+# Audio before a speech onset sent along with it, so soft word starts aren't clipped
+VAD_PREROLL_MS = int(os.getenv("VAD_PREROLL_MS", "300"))
+# Audio aggregated into one send (capture reads are 64 ms)
+AUDIO_SEND_MS = int(os.getenv("AUDIO_SEND_MS", "100"))
+# Seconds between KeepAlive messages while silence is withheld; Deepgram
+# closes a stream that gets neither audio nor KeepAlive for 10 seconds
+KEEPALIVE_INTERVAL = float(os.getenv("KEEPALIVE_INTERVAL", "5"))
+# Capacity of the ring buffer between capture and send, in seconds of audio
+AUDIO_RING_SECONDS = float(os.getenv("AUDIO_RING_SECONDS", "10"))
+
+# Starting background level, and the share of the gap to a louder frame the
+# floor rises by per frame: quickly toward background frames, very slowly
+# (a time constant of ~100 s at 20 ms frames) toward speech, so a monologue
+# doesn't raise it but steady noise eventually does. Falling is immediate
+NOISE_FLOOR_START_DB = -90.0
+NOISE_FLOOR_RISE = 0.05
+NOISE_FLOOR_RISE_SPEECH = 0.0002
+# Send delays kept for the percentiles in stats()
+DELAY_SAMPLES = 1000
+
+
+class AudioRing:
+    """
+    Single-producer, single-consumer ring buffer of PCM bytes between the
+    capture thread and the send thread.
+
+    Neither side takes a lock: the producer only advances `written` and the
+    consumer only advances `consumed`, each after its bytes are in place.
+    A live producer (microphone, pushed audio) never waits: when the
+    consumer falls more than `capacity` behind, e.g. during a network stall,
+    the oldest audio is overwritten, and the consumer skips past it and
+    counts it in `lost`. A non-live producer (a file) waits for space
+    instead, so nothing is lost when it reads faster than real time.
+    """
+
+    def __init__(self, capacity: int, bytes_per_second: int, clock: Callable[[], float] = time.perf_counter):
+        self.capacity = capacity
+        self.bytes_per_second = bytes_per_second
+        self.clock = clock
+        self.buffer = bytearray(capacity)
+        self.written = 0
+        self.consumed = 0
+        self.lost = 0
+        self.closed = False
+        # (end position, time) of each write, to date the bytes read
+        self.marks: Deque[Tuple[int, float]] = deque()
+        # Wake-ups only; correctness doesn't depend on them
+        self.readable = threading.Event()
+        self.writable = threading.Event()
+
+    def __len__(self) -> int:
+        """Bytes written and not yet read (may exceed capacity once the reader was lapped)."""
+        return self.written - self.consumed
+
+    def write(self, data: bytes, block: bool = False) -> bool:
+        """Append `data`; False once the ring is closed."""
+        n = len(data)
+        if n > self.capacity:
+            data, n = data[-self.capacity:], self.capacity
+        while block and not self.closed and self.written + n - self.consumed > self.capacity:
+            self.writable.clear()
+            if self.written + n - self.consumed > self.capacity:
+                self.writable.wait(0.1)
+        if self.closed:
+            return False
+        start = self.written % self.capacity
+        first = min(n, self.capacity - start)
+        self.buffer[start:start + first] = data[:first]
+        if first < n:
+            self.buffer[:n - first] = data[first:]
+        self.marks.append((self.written + n, self.clock()))
+        self.written += n
+        self.readable.set()
+        return True
+
+    def close(self):
+        """No more writes; the reader drains what is left."""
+        self.closed = True
+        self.readable.set()
+        self.writable.set()
+
+    def read(self, n: int, timeout: float) -> Optional[bytes]:
+        """
+        Up to `n` bytes: as soon as `n` are available, or whatever arrived
+        within `timeout` seconds (possibly b""). None once the ring is closed
+        and drained.
+        """
+        deadline = None
+        while self.written - self.consumed < n and not self.closed:
+            self.readable.clear()
+            if self.written - self.consumed >= n or self.closed:
+                break
+            now = time.monotonic()
+            deadline = deadline or now + timeout
+            if now >= deadline or not self.readable.wait(deadline - now):
+                break
+        start = max(self.consumed, self.written - self.capacity)
+        end = min(self.written, start + n)
+        if start >= end:
+            return None if self.closed else b""
+        data = self._copy(start, end)
+        # The producer may have lapped us while copying
+        lapped = self.written - self.capacity
+        if lapped > start:
+            data, start = data[lapped - start:], lapped
+        self.lost += start - self.consumed
+        self.consumed = start + len(data)
+        self.writable.set()
+        return data
+
+    def _copy(self, start: int, end: int) -> bytes:
+        first, last = start % self.capacity, end % self.capacity or self.capacity
+        if first < last:
+            return bytes(self.buffer[first:last])
+        return bytes(self.buffer[first:]) + bytes(self.buffer[:last])
+
+    def captured_at(self, position: int) -> Optional[float]:
+        """When the byte at `position` was captured; forgets the writes before it."""
+        marks = self.marks
+        while marks and marks[0][0] <= position:
+            marks.popleft()
+        if not marks:
+            return None
+        end, written_at = marks[0]
+        return written_at - (end - position) / self.bytes_per_second
+
+
+class EnergyGate:
+    """
+    Frame-level speech detection from signal energy. A frame is speech when
+    its RMS level is above `threshold_db` and `margin_db` above the
+    background level. The background follows quieter frames down at once
+    and louder background up quickly, but rises toward speech only over a
+    minute or two: long monologues stay speech, while steady noise loud
+    enough to pass for it (a fan, hum) eventually stops counting.
+    """
+
+    def __init__(self, threshold_db: float = VAD_THRESHOLD_DB, margin_db: float = VAD_MARGIN_DB):
+        self.threshold_db = threshold_db
+        self.margin_db = margin_db
+        self.noise_floor = NOISE_FLOOR_START_DB
+
+    @staticmethod
+    def levels(frames: np.ndarray) -> np.ndarray:
+        """RMS level in dBFS of each row of int16 samples."""
+        samples = frames.astype(np.float32)
+        rms = np.sqrt(np.mean(samples * samples, axis=1))
+        return 20 * np.log10(rms / 32768.0 + 1e-9)
+
+    def speech(self, frames: np.ndarray) -> List[bool]:
+        flags = []
+        for level in self.levels(frames).tolist():
+            speech = level > max(self.threshold_db, self.noise_floor + self.margin_db)
+            flags.append(speech)
+            if level < self.noise_floor:
+                self.noise_floor = level
+            else:
+                self.noise_floor += (level - self.noise_floor) * (NOISE_FLOOR_RISE_SPEECH if speech else NOISE_FLOOR_RISE)
+        return flags
+
+
+class StreamTimeline:
+    """
+    Maps stream time (seconds of audio the backend received) to capture
+    time. They differ once silence has been withheld: the backend's clock
+    only advances with the audio it gets, so its timestamps are moved back
+    onto the meeting's timeline before the segmenter sees them.
+    """
+
+    def __init__(self, bytes_per_second: int):
+        self.bytes_per_second = bytes_per_second
+        self.lock = threading.Lock()
+        # Stream and capture time at which each contiguous run starts
+        self.stream_starts: List[float] = [0.0]
+        self.capture_starts: List[float] = [0.0]
+        self.streamed = 0
+        self.next_capture = 0
+
+    def add(self, capture_offset: int, nbytes: int):
+        """Record a run of `nbytes` bytes, starting at capture byte `capture_offset`, being sent."""
+        with self.lock:
+            if capture_offset != self.next_capture:
+                self.stream_starts.append(self.streamed / self.bytes_per_second)
+                self.capture_starts.append(capture_offset / self.bytes_per_second)
+            self.streamed += nbytes
+            self.next_capture = capture_offset + nbytes
+
+    def to_capture(self, t: float, end: bool = False) -> float:
+        """Capture time of stream time `t`; an `end` on a run boundary belongs to the earlier run."""
+        with self.lock:
+            search = bisect.bisect_left if end else bisect.bisect_right
+            i = max(0, search(self.stream_starts, t) - 1)
+            return self.capture_starts[i] + t - self.stream_starts[i]
+
+    def remap(self, result):
+        """Move a Deepgram result's timestamps (result and words) from stream to capture time, in place."""
+        if len(self.stream_starts) == 1:
+            return  # nothing withheld yet
+        start = result.start or 0.0
+        end = self.to_capture(start + (result.duration or 0.0), end=True)
+        result.start = self.to_capture(start)
+        result.duration = end - result.start
+        for alternative in result.channel.alternatives:
+            for word in alternative.words or []:
+                word.start = self.to_capture(word.start)
+                word.end = self.to_capture(word.end, end=True)
+
+
+class AudioPreprocessor:
+    """
+    Everything between capture and the transcription backend: a ring
+    buffer the capture thread writes to, and on the send side aggregation
+    into `send_ms` blocks and, with `gate`, an energy gate that withholds
+    silence. Speech is sent with `preroll_ms` of the audio before it and
+    `hangover_ms` after it; while the gate is closed `keepalive_due` says
+    when the backend should be pinged.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        channels: int,
+        gate: bool = AUDIO_VAD,
+        send_ms: int = AUDIO_SEND_MS,
+        frame_ms: int = VAD_FRAME_MS,
+        hangover_ms: int = VAD_HANGOVER_MS,
+        preroll_ms: int = VAD_PREROLL_MS,
+        keepalive_interval: float = KEEPALIVE_INTERVAL,
+        ring_seconds: float = AUDIO_RING_SECONDS,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        self.channels = channels
+        self.bytes_per_second = sample_rate * channels * SAMPLE_WIDTH
+        self.frame_bytes = sample_rate * frame_ms // 1000 * channels * SAMPLE_WIDTH
+        self.send_bytes = max(1, send_ms // frame_ms) * self.frame_bytes
+        self.send_seconds = self.send_bytes / self.bytes_per_second
+        ring_bytes = max(2 * self.send_bytes, int(ring_seconds * self.bytes_per_second) // self.frame_bytes * self.frame_bytes)
+        self.ring = AudioRing(ring_bytes, self.bytes_per_second, clock)
+        self.timeline = StreamTimeline(self.bytes_per_second)
+        self.clock = clock
+
+        self.gate = EnergyGate() if gate else None
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.preroll: Deque[Tuple[int, bytes]] = deque(maxlen=max(0, preroll_ms // frame_ms))
+        self.open = False
+        self.hang = 0
+        self.keepalive_interval = keepalive_interval
+        self.last_activity = clock()
+
+        self.remainder = b""
+        self.position = 0  # capture offset of the first byte not yet processed
+        self.sent_bytes = 0
+        self.sends = 0
+        self.keepalives = 0
+        self.delays: Deque[float] = deque(maxlen=DELAY_SAMPLES)
+
+    def read(self, timeout: Optional[float] = None) -> Optional[List[Tuple[int, bytes]]]:
+        """
+        Wait for the next block of captured audio and return the runs to send
+        as (capture offset, audio). None once capture has ended and the rest
+        has been returned. The runs are recorded as sent, so send them in
+        order right away.
+        """
+        lost = self.ring.lost
+        block = self.ring.read(self.send_bytes, 2 * self.send_seconds if timeout is None else timeout)
+        if block is None:
+            return self.process(b"", final=True) if self.remainder else None
+        if self.ring.lost != lost:
+            # Capture overran us; what was left of the previous block is gone too
+            AUDIO_BYTES.labels("lost").inc(self.ring.lost - lost)
+            self.remainder = b""
+            self.position = self.ring.consumed - len(block)
+        return self.process(block)
+
+    def process(self, block: bytes, final: bool = False) -> List[Tuple[int, bytes]]:
+        AUDIO_BYTES.labels("captured").inc(len(block))
+        data = self.remainder + block
+        offset = self.position
+        usable = len(data) if final else len(data) - len(data) % self.frame_bytes
+        self.remainder = data[usable:]
+        self.position += usable
+        if not usable:
+            return []
+
+        if self.gate is None:
+            runs = [(offset, data[:usable])]
+        else:
+            runs = self._gate(data[:usable], offset)
+        for run_offset, run in runs:
+            self._sent(run_offset, run)
+        return runs
+
+    def _gate(self, data: bytes, offset: int) -> List[Tuple[int, bytes]]:
+        fb = self.frame_bytes
+        whole = len(data) // fb
+        samples = np.frombuffer(data[:whole * fb], dtype=np.int16).reshape(whole, fb // SAMPLE_WIDTH)
+        flags = self.gate.speech(samples)
+        if whole * fb < len(data):
+            flags.append(self.open)  # a final partial frame follows the gate as it is
+        runs: List[Tuple[int, bytes]] = []
+
+        def emit(frame_offset: int, frame: bytes):
+            if runs and runs[-1][0] + len(runs[-1][1]) == frame_offset:
+                runs[-1] = (runs[-1][0], runs[-1][1] + frame)
+            else:
+                runs.append((frame_offset, frame))
+
+        for i, speech in enumerate(flags):
+            frame_offset, frame = offset + i * fb, data[i * fb:(i + 1) * fb]
+            if speech:
+                if not self.open:
+                    self.open = True
+                    for preroll in self.preroll:
+                        emit(*preroll)
+                    self.preroll.clear()
+                self.hang = self.hangover_frames
+                emit(frame_offset, frame)
+            elif self.open:
+                emit(frame_offset, frame)
+                self.hang -= 1
+                if self.hang <= 0:
+                    self.open = False
+            else:
+                self.preroll.append((frame_offset, frame))
+        return runs
+
+    def _sent(self, offset: int, run: bytes):
+        now = self.clock()
+        self.timeline.add(offset, len(run))
+        self.sent_bytes += len(run)
+        self.sends += 1
+        self.last_activity = now
+        AUDIO_BYTES.labels("sent").inc(len(run))
+        captured = self.ring.captured_at(offset)
+        if captured is not None:
+            self.delays.append(now - captured)
+            AUDIO_SEND_DELAY.observe(now - captured)
+
+    def keepalive_due(self) -> bool:
+        """Whether the backend should get a KeepAlive now (counted as sent when True)."""
+        if self.gate is None or self.open:
+            return False
+        now = self.clock()
+        if now - self.last_activity < self.keepalive_interval:
+            return False
+        self.last_activity = now
+        self.keepalives += 1
+        return True
+
+    def seconds(self, offset: int) -> float:
+        return offset / self.bytes_per_second
+
+    def stats(self) -> dict:
+        captured = self.position + len(self.remainder)
+        delays = sorted(self.delays)
+
+        def pct(q):
+            return round(delays[min(len(delays) - 1, int(len(delays) * q))] * 1000, 1) if delays else None
+
+        return {
+            "gate": self.gate is not None,
+            "speaking": self.open,
+            "noise_floor_db": round(self.gate.noise_floor, 1) if self.gate is not None else None,
+            "captured_s": round(captured / self.bytes_per_second, 2),
+            "sent_s": round(self.sent_bytes / self.bytes_per_second, 2),
+            "saved_ratio": round(1 - self.sent_bytes / captured, 3) if captured else 0.0,
+            "sends": self.sends,
+            "keepalives": self.keepalives,
+            "lost_s": round(self.ring.lost / self.bytes_per_second, 2),
+            # Capture of a send's first byte to the send: batching plus ring wait
+            "send_delay_p50_ms": pct(0.5),
+            "send_delay_p99_ms": pct(0.99),
+        }
@@ -0,0 +1,224 @@
+# audio_sources.py
+
+import logging
+import os
+import queue
+import time
+import wave
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Default capture format: 16 kHz mono 16-bit PCM, read 1024 frames (64 ms) at a time
+CHUNK = 1024
+RATE = 16000
+CHANNELS = 1
+SAMPLE_WIDTH = 2  # bytes per sample (linear16)
+
+# Directory that file sources (and fake transcription scripts) may read from
+AUDIO_FILE_DIR = os.getenv("AUDIO_FILE_DIR", os.path.dirname(os.path.realpath(__file__)))
+
+
+class AudioSource:
+    """
+    A stream of linear16 PCM audio chunks for a transcription backend.
+
+    `read` returns the next chunk, b"" when nothing is available yet (the
+    worker should just check its stop flag and try again), or None once the
+    stream has ended.
+    """
+
+    sample_rate = RATE
+    channels = CHANNELS
+    # Live audio can't be paused: if sending falls behind, the oldest audio is
+    # dropped rather than holding up capture
+    live = False
+
+    def open(self):
+        pass
+
+    def read(self) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    @property
+    def bytes_per_second(self) -> int:
+        return self.sample_rate * self.channels * SAMPLE_WIDTH
+
+
+class MicrophoneSource(AudioSource):
+    """The local sound card, via PyAudio."""
+
+    live = True
+
+    def __init__(self, chunk: int = CHUNK, sample_rate: int = RATE, channels: int = CHANNELS):
+        self.chunk = chunk
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.pa = None
+        self.stream = None
+
+    def open(self):
+        # Imported here so headless deployments don't need PortAudio
+        import pyaudio
+
+        self.pa = pyaudio.PyAudio()
+        self.stream = self.pa.open(
+            format=pyaudio.paInt16,
+            channels=self.channels,
+            rate=self.sample_rate,
+            input=True,
+            frames_per_buffer=self.chunk
+        )
+
+    def read(self) -> Optional[bytes]:
+        return self.stream.read(self.chunk, exception_on_overflow=False)
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+        if self.pa is not None:
+            self.pa.terminate()
+
+
+class FileSource(AudioSource):
+    """
+    A WAV file, or a headerless raw PCM file (.raw/.pcm) in the default
+    format. Chunks are paced at `speed` times real time; `speed=0` reads as
+    fast as the backend accepts them.
+    """
+
+    def __init__(self, path: str, chunk: int = CHUNK, speed: float = 1.0,
+                 sample_rate: int = RATE, channels: int = CHANNELS):
+        self.path = path
+        self.chunk = chunk
+        self.speed = speed
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.wav: Optional[wave.Wave_read] = None
+        self.raw = None
+        self.next_send = 0.0
+
+    def open(self):
+        if os.path.splitext(self.path)[1].lower() in (".raw", ".pcm"):
+            self.raw = open(self.path, "rb")
+        else:
+            self.wav = wave.open(self.path, "rb")
+            if self.wav.getsampwidth() != SAMPLE_WIDTH:
+                raise ValueError(f"{self.path}: only 16-bit PCM is supported")
+            self.sample_rate = self.wav.getframerate()
+            self.channels = self.wav.getnchannels()
+        self.next_send = time.monotonic()
+
+    def read(self) -> Optional[bytes]:
+        if self.wav is not None:
+            data = self.wav.readframes(self.chunk)
+        else:
+            data = self.raw.read(self.chunk * self.channels * SAMPLE_WIDTH)
+        if not data:
+            return None
+        if self.speed > 0:
+            self.next_send += len(data) / self.bytes_per_second / self.speed
+            delay = self.next_send - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return data
+
+    def close(self):
+        if self.wav is not None:
+            self.wav.close()
+        if self.raw is not None:
+            self.raw.close()
+
+
+class SilenceSource(AudioSource):
+    """`duration` seconds of synthetic silence, paced like FileSource. For load tests."""
+
+    def __init__(self, duration: float, chunk: int = CHUNK, speed: float = 1.0):
+        self.remaining = int(duration * self.sample_rate) * self.channels * SAMPLE_WIDTH
+        self.chunk_bytes = chunk * self.channels * SAMPLE_WIDTH
+        self.speed = speed
+        self.next_send = 0.0
+
+    def open(self):
+        self.next_send = time.monotonic()
+
+    def read(self) -> Optional[bytes]:
+        if self.remaining <= 0:
+            return None
+        size = min(self.chunk_bytes, self.remaining)
+        self.remaining -= size
+        if self.speed > 0:
+            self.next_send += size / self.bytes_per_second / self.speed
+            delay = self.next_send - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return bytes(size)
+
+
+class PushSource(AudioSource):
+    """
+    Audio pushed by a client (e.g. a browser over a WebSocket). `push` may be
+    called from any thread; when the buffer is full the oldest chunk is
+    dropped so a stalled backend can't block the client.
+    """
+
+    live = True
+
+    def __init__(self, max_chunks: int = 256, sample_rate: int = RATE, channels: int = CHANNELS):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.chunks: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=max_chunks)
+        self.dropped = 0
+
+    def push(self, data: bytes):
+        while True:
+            try:
+                self.chunks.put_nowait(data)
+                return
+            except queue.Full:
+                try:
+                    self.chunks.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def end(self):
+        """Signal that the client has stopped sending audio."""
+        self.push(None)
+
+    def read(self) -> Optional[bytes]:
+        try:
+            return self.chunks.get(timeout=0.1)
+        except queue.Empty:
+            return b""
+
+
+def resolve_audio_path(path: str) -> str:
+    """Resolve `path` relative to AUDIO_FILE_DIR, refusing to escape it."""
+    root = os.path.realpath(AUDIO_FILE_DIR)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"{path} is outside AUDIO_FILE_DIR")
+    if not os.path.isfile(resolved):
+        raise ValueError(f"{path} does not exist")
+    return resolved
+
+
+def make_audio_source(kind: str, path: Optional[str] = None, speed: float = 1.0,
+                      duration: float = 60.0) -> AudioSource:
+    """Build an AudioSource by name: microphone, file, silence or websocket."""
+    if kind == "microphone":
+        return MicrophoneSource()
+    if kind == "file":
+        if not path:
+            raise ValueError("A file source needs a path")
+        return FileSource(resolve_audio_path(path), speed=speed)
+    if kind == "silence":
+        return SilenceSource(duration, speed=speed)
+    if kind == "websocket":
+        return PushSource()
+    raise ValueError(f"Unknown audio source {kind!r}")
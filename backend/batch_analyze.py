@@ -0,0 +1,341 @@
+# batch_analyze.py
+#
+# Offline batch analysis of transcript archives. Reads messages
+# ({"speaker", "transcript", ...}) from JSON files (a list, or an object with a
+# "messages" list), JSONL files (one message per line) or directories of them,
+# runs the per-message analyzers (info density, sentiment, controversy,
+# fallacies) over a bounded pool of concurrent workers and streams the
+# analyzed messages to a JSONL file as they finish.
+#
+# The output doubles as the checkpoint: every line carries the message's
+# "source" (the file's absolute path) and "index", and a rerun skips messages
+# already in the output, from any working directory, so an interrupted run
+# resumes where it stopped. Messages that failed are
+# not written and are retried on the next run.
+#
+#   python batch_analyze.py archive/ -o analyzed.jsonl --concurrency 32
+#   python batch_analyze.py sample.json -o out.jsonl --stub --latency-ms 200
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import time
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from analysis import analyze_controversy, analyze_fallacies, analyze_info_density, analyze_sentiment
+from llm_cache import get_response_cache
+from llm_client import LLMClient, close_llm_client, set_llm_client
+
+logger = logging.getLogger(__name__)
+
+# Messages read ahead of the workers; bounds memory on large archives
+READ_AHEAD = 256
+
+# LLM requests in flight. httpx's pool bookkeeping grows with the number of
+# connections, so past a few dozen a bigger pool gets slower, not faster
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "16"))
+
+INPUT_EXTENSIONS = (".json", ".jsonl")
+
+
+async def info_density_stage(message: dict) -> dict:
+    return {"info_density": await analyze_info_density(message["transcript"])}
+
+
+async def sentiment_stage(message: dict) -> dict:
+    return {"sentiment": await analyze_sentiment(message["transcript"])}
+
+
+async def controversy_stage(message: dict) -> dict:
+    return {"controversial": await analyze_controversy(message["transcript"])}
+
+
+async def fallacies_stage(message: dict) -> dict:
+    return {"fallacies": (await analyze_fallacies(message["transcript"]))["fallacies"]}
+
+
+# Stage name -> analyzer filling part of the message's "analysis" block
+STAGES: Dict[str, Callable[[dict], Awaitable[dict]]] = {
+    "info_density": info_density_stage,
+    "sentiment": sentiment_stage,
+    "controversy": controversy_stage,
+    "fallacies": fallacies_stage,
+}
+
+
+def input_files(paths: List[str]) -> List[str]:
+    """Expand directories into the JSON/JSONL files below them, in a stable order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files.extend(
+                    os.path.join(root, name)
+                    for name in sorted(names)
+                    if name.endswith(INPUT_EXTENSIONS)
+                )
+        else:
+            files.append(path)
+    return files
+
+
+def read_messages(path: str) -> Iterator[Tuple[int, dict]]:
+    """Yield (index, message) pairs from a JSON or JSONL transcript file."""
+    if path.endswith(".jsonl"):
+        with open(path, "r") as f:
+            for index, line in enumerate(f):
+                if line.strip():
+                    yield index, json.loads(line)
+        return
+    with open(path, "r") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("messages", [])
+    yield from enumerate(data)
+
+
+def load_checkpoint(output: str) -> Set[Tuple[str, int]]:
+    """
+    Return the (source, index) keys already in `output`, truncating a
+    partially written last line left by a crash.
+    """
+    done: Set[Tuple[str, int]] = set()
+    if not os.path.exists(output):
+        return done
+    valid_end = 0
+    with open(output, "rb") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                # Older outputs recorded paths relative to the directory the run started in
+                done.add((os.path.abspath(record["source"]), record["index"]))
+            except (ValueError, KeyError):
+                break
+            valid_end += len(line)
+    if valid_end < os.path.getsize(output):
+        logger.warning(f"Truncating incomplete output after byte {valid_end}")
+        with open(output, "r+b") as f:
+            f.truncate(valid_end)
+    return done
+
+
+class StageStats:
+    """Call count, failures and latencies of one stage."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latencies: List[float] = []
+
+    def report(self, elapsed: float) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "per_s": round(self.calls / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+            "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 1) if latencies else None,
+        }
+
+
+class BatchAnalyzer:
+    """
+    Reader -> bounded queue -> `concurrency` workers -> writer. Each worker
+    runs every stage of one message concurrently; at most `concurrency`
+    messages are in flight and at most READ_AHEAD are buffered.
+    """
+
+    def __init__(self, files: List[str], output: str, concurrency: int, stages: List[str], resume: bool = True):
+        self.files = files
+        self.output = output
+        self.concurrency = concurrency
+        self.stages = stages
+        self.resume = resume
+        self.stage_stats = {name: StageStats() for name in ["read"] + stages + ["write"]}
+        self.skipped = 0
+        self.written = 0
+        self.failed = 0
+
+    async def run(self) -> dict:
+        done = load_checkpoint(self.output) if self.resume else set()
+        if not self.resume and os.path.exists(self.output):
+            os.remove(self.output)
+
+        todo: asyncio.Queue = asyncio.Queue(maxsize=READ_AHEAD)
+        results: asyncio.Queue = asyncio.Queue(maxsize=READ_AHEAD)
+        start = time.perf_counter()
+
+        workers = [asyncio.create_task(self.worker(todo, results)) for _ in range(self.concurrency)]
+        writer = asyncio.create_task(self.writer(results))
+        await self.reader(todo, done)
+        for _ in workers:
+            await todo.put(None)
+        await asyncio.gather(*workers)
+        await results.put(None)
+        await writer
+
+        elapsed = time.perf_counter() - start
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "written": self.written,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "messages_per_s": round(self.written / elapsed, 1) if elapsed else 0.0,
+            "stages": {name: stats.report(elapsed) for name, stats in self.stage_stats.items()},
+        }
+
+    async def reader(self, todo: asyncio.Queue, done: Set[Tuple[str, int]]):
+        stats = self.stage_stats["read"]
+        for path in self.files:
+            source = os.path.abspath(path)
+            try:
+                messages = read_messages(path)
+                for index, message in messages:
+                    stats.calls += 1
+                    if (source, index) in done:
+                        self.skipped += 1
+                        continue
+                    if not isinstance(message, dict) or not str(message.get("transcript", "")).strip():
+                        continue
+                    await todo.put((source, index, message))
+            except (OSError, ValueError) as e:
+                stats.errors += 1
+                logger.error(f"Could not read {path}: {e}")
+
+    async def worker(self, todo: asyncio.Queue, results: asyncio.Queue):
+        while True:
+            item = await todo.get()
+            if item is None:
+                return
+            source, index, message = item
+            outcomes = await asyncio.gather(
+                *(self.run_stage(name, message) for name in self.stages),
+                return_exceptions=True,
+            )
+            errors = [o for o in outcomes if isinstance(o, BaseException)]
+            if errors:
+                self.failed += 1
+                logger.error(f"{source}:{index} failed: {errors[0]}")
+                continue
+            analysis = dict(message.get("analysis") or {})
+            for outcome in outcomes:
+                analysis.update(outcome)
+            await results.put({**message, "analysis": analysis, "source": source, "index": index})
+
+    async def run_stage(self, name: str, message: dict) -> dict:
+        stats = self.stage_stats[name]
+        started = time.perf_counter()
+        try:
+            return await STAGES[name](message)
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            stats.calls += 1
+            stats.latencies.append(time.perf_counter() - started)
+
+    async def writer(self, results: asyncio.Queue):
+        stats = self.stage_stats["write"]
+        with open(self.output, "a") as f:
+            while True:
+                record = await results.get()
+                if record is None:
+                    return
+                started = time.perf_counter()
+                f.write(json.dumps(record) + "\n")
+                # Flush each line so the checkpoint survives a crash
+                f.flush()
+                stats.calls += 1
+                stats.latencies.append(time.perf_counter() - started)
+                self.written += 1
+
+
+async def analyze_files(
+    files: List[str],
+    output: str,
+    concurrency: int = 16,
+    stages: Optional[List[str]] = None,
+    resume: bool = True,
+    base_url: Optional[str] = None,
+    llm_concurrency: int = BATCH_LLM_CONCURRENCY,
+) -> dict:
+    """Run a batch analysis with a dedicated LLM client and return its report."""
+    client_options = {"max_concurrency": llm_concurrency, "cache": get_response_cache()}
+    if base_url:
+        client_options["base_url"] = base_url
+    client = LLMClient(**client_options)
+    set_llm_client(client)
+    try:
+        analyzer = BatchAnalyzer(files, output, concurrency, stages or list(STAGES), resume)
+        report = await analyzer.run()
+        report["llm_requests"] = client.requests
+        report["llm_retries"] = client.retries
+        return report
+    finally:
+        await close_llm_client()
+        await get_response_cache().flush()
+
+
+def print_report(report: dict):
+    print(f"{report['written']} analyzed, {report['skipped']} already done, {report['failed']} failed "
+          f"in {report['elapsed_s']}s ({report['messages_per_s']} messages/s, "
+          f"{report['llm_requests']} LLM requests, {report['llm_retries']} retries)")
+    print(f"{'stage':<14} {'calls':>7} {'errors':>7} {'per s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, stats in report["stages"].items():
+        print(f"{name:<14} {stats['calls']:>7} {stats['errors']:>7} {stats['per_s']:>8} "
+              f"{str(stats['p50_ms']):>8} {str(stats['p99_ms']):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze transcript archives in parallel")
+    parser.add_argument("inputs", nargs="+", help="JSON/JSONL transcript files or directories")
+    parser.add_argument("-o", "--output", required=True, help="JSONL output file (also the checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=16, help="messages analyzed at once")
+    parser.add_argument("--llm-concurrency", type=int, default=BATCH_LLM_CONCURRENCY, help="LLM requests in flight")
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated subset of " + ",".join(STAGES))
+    parser.add_argument("--no-resume", action="store_true", help="start over instead of skipping finished messages")
+    parser.add_argument("--stub", action="store_true", help="run against a local stub LLM")
+    parser.add_argument("--latency-ms", type=float, default=200, help="stub LLM latency")
+    parser.add_argument("--port", type=int, default=9124, help="stub LLM port")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    stages = [name.strip() for name in args.stages.split(",") if name.strip()]
+    unknown = [name for name in stages if name not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    base_url = None
+    server = None
+    if args.stub:
+        import stub_llm
+
+        server = stub_llm.serve_in_background(args.port, latency_ms=args.latency_ms)
+        base_url = f"http://127.0.0.1:{args.port}/v1"
+    try:
+        report = asyncio.run(analyze_files(
+            input_files(args.inputs),
+            args.output,
+            concurrency=args.concurrency,
+            stages=stages,
+            resume=not args.no_resume,
+            base_url=base_url,
+            llm_concurrency=args.llm_concurrency,
+        ))
+    finally:
+        if server is not None:
+            server.should_exit = True
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
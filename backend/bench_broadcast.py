@@ -0,0 +1,212 @@
+# bench_broadcast.py
+#
+# Load test of WebSocket fan-out with hundreds of simulated clients, some of
+# them slow, comparing:
+#   - "sequential": the old pattern, encode per message and await send_text
+#     on each client in turn
+#   - the Broadcaster under each slow-consumer policy
+#
+# Clients are in-process fakes whose send_text sleeps, so the numbers measure
+# the fan-out itself rather than the network. Reports publish -> send latency
+# seen by the fast clients, messages shed for the slow ones and the bytes a
+# permessage-deflate connection would save.
+#
+#   python bench_broadcast.py --clients 500 --slow 0.05 --rate 200 --seconds 5
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import zlib
+from typing import List
+
+from starlette.websockets import WebSocketState
+
+from broadcaster import POLICIES, Broadcaster
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class FakeClient:
+    """Stands in for a WebSocket; `delay` is how long each send takes."""
+
+    def __init__(self, delay: float, measure: bool):
+        self.client_state = WebSocketState.CONNECTED
+        self.delay = delay
+        self.measure = measure
+        self.frames = 0
+        self.messages = 0
+        self.bytes = 0
+        self.deflated = 0
+        self.latencies: List[float] = []
+        self.compressor = zlib.compressobj(wbits=-15) if measure else None
+
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        else:
+            await asyncio.sleep(0)
+        self.frames += 1
+        if self.measure:
+            now = time.perf_counter()
+            frame = json.loads(text)
+            for message in frame if isinstance(frame, list) else [frame]:
+                self.latencies.append(now - message["sent_at"])
+                self.messages += 1
+            # Sizes as a permessage-deflate connection with context takeover would send them
+            data = text.encode()
+            self.bytes += len(data)
+            self.deflated += len(self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH))
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        self.client_state = WebSocketState.DISCONNECTED
+
+
+def make_message(i: int) -> dict:
+    """Roughly the live mix: mostly interim updates, some final segments and analysis."""
+    speaker = f"Speaker {i % 3 + 1}"
+    roll = i % 10
+    if roll < 7:
+        return {"type": "interim", "speaker": speaker, "name": speaker,
+                "transcript": "the password reset flow is still " * 2, "start": i * 0.3, "end": i * 0.3 + 2}
+    if roll < 9:
+        return {"type": "transcript", "seq": i, "speaker": speaker, "name": speaker,
+                "transcript": "we are seeing some inconsistent behavior in Safari " * 3,
+                "start": i * 0.3, "end": i * 0.3 + 4,
+                "analysis": {"info_density": 0.5, "sentiment": 0.0, "controversial": False, "fallacies": []}}
+    return {"type": "analysis", "kind": "sentiment", "transcript_length": i,
+            "data": [{"Speaker": speaker, "Sentiment": 0.2}]}
+
+
+def make_clients(count: int, slow_fraction: float, slow_delay: float, measured: int) -> List[FakeClient]:
+    slow = int(count * slow_fraction)
+    clients = [FakeClient(slow_delay, measure=False) for _ in range(slow)]
+    clients += [FakeClient(0.0, measure=i < measured) for i in range(count - slow)]
+    random.Random(0).shuffle(clients)
+    return clients
+
+
+async def publish_loop(publish, rate: float, seconds: float):
+    total = int(rate * seconds)
+    start = time.perf_counter()
+    for i in range(total):
+        delay = start + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        message = make_message(i)
+        message["sent_at"] = time.perf_counter()
+        await publish(message)
+    return total
+
+
+def report(name: str, clients: List[FakeClient], published: int, elapsed: float, extra: dict) -> dict:
+    fast = [c for c in clients if c.measure]
+    latencies = [l for c in fast for l in c.latencies]
+    raw = sum(c.bytes for c in fast)
+    return {
+        "scenario": name,
+        "published": published,
+        "elapsed_s": round(elapsed, 2),
+        "fast_p50_ms": round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        "fast_p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+        "fast_delivered_pct": round(100 * sum(c.messages for c in fast) / (published * len(fast)), 1) if fast else None,
+        "frames_per_client": round(statistics.mean(c.frames for c in clients), 1),
+        "deflate_ratio": round(sum(c.deflated for c in fast) / raw, 3) if raw else None,
+        **extra,
+    }
+
+
+async def sequential(args) -> dict:
+    clients = make_clients(args.clients, args.slow, args.slow_delay, args.measured)
+
+    async def publish(message: dict):
+        payload = json.dumps(message)
+        for ws in clients:
+            if ws.client_state == WebSocketState.CONNECTED:
+                await ws.send_text(payload)
+
+    # The old path scheduled one task per message from the Deepgram thread
+    tasks = []
+
+    async def publish_task(message: dict):
+        tasks.append(asyncio.create_task(publish(message)))
+
+    start = time.perf_counter()
+    published = await publish_loop(publish_task, args.rate, args.seconds)
+    await asyncio.wait_for(asyncio.gather(*tasks), timeout=args.drain)
+    elapsed = time.perf_counter() - start
+    return report("sequential", clients, published, elapsed, {"encodes": published, "dropped": 0, "disconnected": 0})
+
+
+async def broadcast(args, policy: str) -> dict:
+    loop = asyncio.get_running_loop()
+    clients = make_clients(args.clients, args.slow, args.slow_delay, args.measured)
+    broadcaster = Broadcaster(loop, queue_size=args.queue_size, tick_ms=args.tick_ms, policy=policy)
+    for ws in clients:
+        broadcaster.add(ws)
+
+    async def publish(message: dict):
+        broadcaster.publish(message)
+
+    start = time.perf_counter()
+    published = await publish_loop(publish, args.rate, args.seconds)
+    # Let the fast clients drain; slow ones are whatever the policy left them
+    deadline = time.perf_counter() + args.drain
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+        if all(s.depth == 0 for ws, s in broadcaster.subscribers.items() if ws.measure):
+            break
+    elapsed = time.perf_counter() - start
+    stats = broadcaster.stats()
+    await broadcaster.close()
+    extra = {
+        "encodes": stats["messages"],
+        "dropped": stats["dropped"],
+        "disconnected": stats["disconnected"],
+    }
+    return report(policy, clients, published, elapsed, extra)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test WebSocket broadcast fan-out")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--slow", type=float, default=0.05, help="fraction of slow clients")
+    parser.add_argument("--slow-delay", type=float, default=0.2, help="seconds per send for a slow client")
+    parser.add_argument("--measured", type=int, default=20, help="fast clients whose latency is recorded")
+    parser.add_argument("--rate", type=float, default=200, help="messages published per second")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--tick-ms", type=float, default=20)
+    parser.add_argument("--drain", type=float, default=30, help="seconds to wait for queues to drain")
+    parser.add_argument("--skip-sequential", action="store_true", help="the old pattern can take minutes with slow clients")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    rows = []
+    if not args.skip_sequential:
+        try:
+            rows.append(asyncio.run(sequential(args)))
+        except asyncio.TimeoutError:
+            rows.append({"scenario": "sequential", "published": int(args.rate * args.seconds),
+                         "elapsed_s": f">{args.seconds + args.drain:.0f}"})
+    for policy in POLICIES:
+        rows.append(asyncio.run(broadcast(args, policy)))
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'scenario':<14} {'p50 ms':>8} {'p99 ms':>8} {'deliv %':>8} {'frames':>7} {'encodes':>8} "
+          f"{'dropped':>8} {'disconn':>8} {'deflate':>8}")
+    for r in rows:
+        print(f"{r['scenario']:<14} {str(r.get('fast_p50_ms')):>8} {str(r.get('fast_p99_ms')):>8} "
+              f"{str(r.get('fast_delivered_pct')):>8} {str(r.get('frames_per_client')):>7} {str(r.get('encodes')):>8} "
+              f"{str(r.get('dropped')):>8} {str(r.get('disconnected')):>8} {str(r.get('deflate_ratio')):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# bench_bus.py
+#
+# What sharing sessions through the message bus costs. Sessions publish
+# events shaped like a live session's (a segment with its interim text) at
+# `--rate` per second each, and `--subscribers` processes follow every
+# session; each subscriber of the Redis bus has its own connections, as a
+# separate worker would. Reported per bus: events delivered per second,
+# publish -> deliver latency (p50/p99), events per pipelined write, and how
+# long a process joining afterwards takes to catch up on the history.
+#
+# The Redis bus runs against the local stub (stub_redis.py) unless
+# `--redis-url` points at a real server.
+#
+#   python bench_bus.py --sessions 20 --events 500 --subscribers 3
+#   python bench_bus.py --rate 0 --redis-url redis://localhost:6379/0
+#   python bench_bus.py --stub-latency-ms 1
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+from bus import InProcessBus, MessageBus, RedisStreamBus, session_stream
+
+SEGMENT = {
+    "type": "transcript",
+    "speaker": "Speaker 1",
+    "name": "Speaker 1",
+    "transcript": "I think we should move the launch to the second week of March so the team has time.",
+    "start": 12.3,
+    "end": 17.9,
+    "timestamp": "2024-01-01T12:00:00",
+    "analysis": {"sentiment": 0.2, "info_density": 0.61, "controversial": False, "fallacies": []},
+}
+INTERIM = {"type": "interim", "speaker": "Speaker 2", "name": "Speaker 2", "transcript": "Well the", "start": 18.1,
+           "end": 18.6, "timestamp": "2024-01-01T12:00:01"}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Follower:
+    """One subscribing process: records when each session's events arrive."""
+
+    def __init__(self, bus: MessageBus, sessions: int, expected: int):
+        self.bus = bus
+        self.latencies: List[float] = []
+        self.received = 0
+        self.expected = sessions * expected
+        self.done = asyncio.Event()
+        for i in range(sessions):
+            bus.subscribe(session_stream(f"bench-{i}"), self.on_event)
+
+    def on_event(self, event: dict, live: bool):
+        self.latencies.append(time.perf_counter() - event["sent"])
+        self.received += 1
+        if self.received >= self.expected:
+            self.done.set()
+
+
+async def publish(bus: MessageBus, session: int, events: int, rate: float):
+    stream = session_stream(f"bench-{session}")
+    for seq in range(events):
+        bus.publish(stream, {
+            "origin": "bench",
+            "messages": [dict(SEGMENT, seq=seq + 1), INTERIM],
+            "segments": [{"words": 18, "timings": [[12.3 + i * 0.3, 12.5 + i * 0.3] for i in range(18)],
+                          "complete": True, "stored_at": time.time()}],
+            "sent": time.perf_counter(),
+        })
+        if rate > 0:
+            await asyncio.sleep(1 / rate)
+        elif seq % 100 == 99:
+            await asyncio.sleep(0)
+
+
+async def run(name: str, make_bus, args) -> dict:
+    publisher = make_bus()
+    publisher.start()
+    followers = []
+    for _ in range(args.subscribers if publisher.shared else 1):
+        bus = publisher if not publisher.shared else make_bus()
+        if bus is not publisher:
+            bus.start()
+        followers.append(Follower(bus, args.sessions, args.events))
+    await asyncio.sleep(0.1)  # let the subscriptions settle
+
+    started = time.perf_counter()
+    await asyncio.gather(*(publish(publisher, i, args.events, args.rate) for i in range(args.sessions)))
+    await asyncio.wait_for(asyncio.gather(*(f.done.wait() for f in followers)), 120)
+    elapsed = time.perf_counter() - started
+
+    catch_up = None
+    if publisher.shared:
+        # A process joining now rebuilds every session from the streams
+        late = make_bus()
+        late.start()
+        caught_up = asyncio.Semaphore(0)
+        t0 = time.perf_counter()
+        for i in range(args.sessions):
+            late.subscribe(session_stream(f"bench-{i}"), lambda event, live: None, history=True,
+                           caught_up=caught_up.release)
+        for _ in range(args.sessions):
+            await caught_up.acquire()
+        catch_up = round(time.perf_counter() - t0, 3)
+        await late.close()
+
+    latencies = [latency for f in followers for latency in f.latencies]
+    stats = publisher.stats()
+    for f in followers:
+        if f.bus is not publisher:
+            await f.bus.close()
+    await publisher.close()
+    total = args.sessions * args.events
+    return {
+        "bus": name,
+        "events": total,
+        "delivered_per_s": round(total * len(followers) / elapsed),
+        "latency_p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "latency_p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "events_per_write": round(total / stats["write_batches"], 1) if stats.get("write_batches") else None,
+        "catch_up_s": catch_up,
+    }
+
+
+async def main_async(args):
+    results = [await run("memory", InProcessBus, args)]
+    stub = None
+    url = args.redis_url
+    if url is None:
+        import stub_redis
+
+        stub = stub_redis.serve_in_background(args.stub_port, latency_ms=args.stub_latency_ms)
+        url = f"redis://127.0.0.1:{args.stub_port}/0"
+    try:
+        prefix = f"bench-{int(time.time())}:"
+        results.append(await run("redis" if stub is None else "redis (stub)",
+                                 lambda: RedisStreamBus(url, prefix=prefix), args))
+    finally:
+        if stub is not None:
+            stub.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the in-process and Redis message buses")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--events", type=int, default=500, help="events per session")
+    parser.add_argument("--rate", type=float, default=50, help="events per second per session (0 = unthrottled)")
+    parser.add_argument("--subscribers", type=int, default=3, help="processes following every session")
+    parser.add_argument("--redis-url", help="a real Redis server instead of the stub")
+    parser.add_argument("--stub-port", type=int, default=6391)
+    parser.add_argument("--stub-latency-ms", type=float, default=0, help="delay the stub adds to every command")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    print(f"{args.sessions} sessions x {args.events} events at {args.rate:g}/s, {args.subscribers} subscribers")
+    print(f"{'bus':<14} {'delivered/s':>12} {'p50 ms':>8} {'p99 ms':>8} {'per write':>10} {'catch-up s':>11}")
+    for r in results:
+        print(f"{r['bus']:<14} {r['delivered_per_s']:>12} {r['latency_p50_ms']:>8} {r['latency_p99_ms']:>8} "
+              f"{r['events_per_write'] or '-':>10} {r['catch_up_s'] if r['catch_up_s'] is not None else '-':>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# bench_context.py
+#
+# Compares prompt size and latency of the full-transcript prompt against the
+# RollingContext prompt as a meeting grows.
+#
+#   python bench_context.py                 # offline, simulated LLM latency
+#   python bench_context.py --live          # real LLM calls (SAMBANOVA_API_KEY, or
+#                                           # LLM_BASE_URL pointing at stub_llm.py)
+
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+from analysis import TranscriptEntry, build_conversation_history, get_meeting_objective
+from context import RollingContext
+from sample_conversation import SAMPLE_CONVERSATION
+
+MEETING_LENGTHS = [20, 50, 100, 250, 500, 1000, 2000]
+
+# Simulated LLM latency: fixed overhead plus prefill time per prompt token
+SIM_BASE_MS = 300.0
+SIM_MS_PER_TOKEN = 0.25
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text with Llama-style tokenizers
+    return max(1, len(text) // 4)
+
+
+def synthetic_meeting(length: int) -> List[TranscriptEntry]:
+    return [
+        TranscriptEntry(
+            speaker=SAMPLE_CONVERSATION[i % len(SAMPLE_CONVERSATION)]["speaker"],
+            transcript=SAMPLE_CONVERSATION[i % len(SAMPLE_CONVERSATION)]["transcript"],
+        )
+        for i in range(length)
+    ]
+
+
+async def fake_summarize(previous_summary: str, transcript_entries: List[TranscriptEntry]) -> str:
+    # Stands in for the LLM: a summary that grows but stays within the cap
+    words = (previous_summary + " " + " ".join(e.transcript for e in transcript_entries)).split()
+    return " ".join(words[-150:])
+
+
+def simulated_latency_ms(prompt_tokens: int) -> float:
+    return SIM_BASE_MS + SIM_MS_PER_TOKEN * prompt_tokens
+
+
+async def run(live: bool):
+    rows = []
+    for length in MEETING_LENGTHS:
+        entries = synthetic_meeting(length)
+        context = RollingContext(summarize=fake_summarize)
+
+        # Replay the meeting one entry at a time, as the scheduler would
+        full_tokens_total = rolling_tokens_total = 0
+        build_ms = 0.0
+        for i in range(1, length + 1):
+            full_tokens_total += estimate_tokens(await build_conversation_history(entries[:i]))
+            start = time.perf_counter()
+            rolling_prompt = await build_conversation_history(entries[:i], context)
+            build_ms += (time.perf_counter() - start) * 1000
+            rolling_tokens_total += estimate_tokens(rolling_prompt)
+
+        full_tokens = estimate_tokens(await build_conversation_history(entries))
+        rolling_tokens = estimate_tokens(rolling_prompt)
+
+        if live:
+            start = time.perf_counter()
+            await get_meeting_objective(entries)
+            full_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            await get_meeting_objective(entries, context)
+            rolling_ms = (time.perf_counter() - start) * 1000
+        else:
+            full_ms = simulated_latency_ms(full_tokens)
+            rolling_ms = simulated_latency_ms(rolling_tokens)
+
+        rows.append({
+            "entries": length,
+            "full_prompt_tokens": full_tokens,
+            "rolling_prompt_tokens": rolling_tokens,
+            "full_latency_ms": round(full_ms, 1),
+            "rolling_latency_ms": round(rolling_ms, 1),
+            "full_meeting_tokens": full_tokens_total,
+            "rolling_meeting_tokens": rolling_tokens_total,
+            "rolling_build_us_per_call": round(build_ms * 1000 / length, 1),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full vs rolling prompt context")
+    parser.add_argument("--live", action="store_true", help="time real LLM calls instead of simulating")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    rows = asyncio.run(run(args.live))
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    latency = "live" if args.live else "simulated"
+    print(f"{'entries':>8} {'prompt tok (full/rolling)':>26} {latency + ' ms (full/rolling)':>28} {'meeting tok (full/rolling)':>28}")
+    for r in rows:
+        print(
+            f"{r['entries']:>8} "
+            f"{r['full_prompt_tokens']:>12}/{r['rolling_prompt_tokens']:<13} "
+            f"{r['full_latency_ms']:>13}/{r['rolling_latency_ms']:<14} "
+            f"{r['full_meeting_tokens']:>13}/{r['rolling_meeting_tokens']:<14}"
+        )
+
+
+if __name__ == "__main__":
+    main()
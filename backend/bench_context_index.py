@@ -0,0 +1,100 @@
+# bench_context_index.py
+#
+# Measures the local context index behind get_previous_transcripts: indexing
+# cost per snippet, top-k query latency (BM25 alone and with hashed
+# embeddings) and reload time from disk, as the number of past snippets grows.
+#
+#   python bench_context_index.py
+#   python bench_context_index.py --sizes 1000,100000 --embed-dim 512
+
+import argparse
+import json
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from context_index import ContextIndex
+from sample_conversation import SAMPLE_CONVERSATION
+
+QUERIES = 200
+
+
+def synthetic_snippets(count: int, seed: int = 7):
+    """Sample-conversation sentences, reshuffled and mixed so snippets differ."""
+    rng = random.Random(seed)
+    words = [m["transcript"].split() for m in SAMPLE_CONVERSATION]
+    for i in range(count):
+        a, b = rng.sample(words, 2)
+        text = a[: rng.randint(4, len(a))] + b[rng.randint(0, len(b) - 4):]
+        yield {
+            "session_id": f"s{i // 500}",
+            "seq": i % 500,
+            "speaker": f"Speaker {i % 4 + 1}",
+            "transcript": " ".join(text) + f" ticket-{rng.randint(0, count)}",
+            "timestamp": f"2024-01-01T00:00:{i:09d}",
+        }
+
+
+def percentile(latencies, q):
+    latencies = sorted(latencies)
+    return latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+
+
+def run(size: int, embed_dim: int) -> dict:
+    path = tempfile.mkdtemp(prefix="context_index_")
+    try:
+        snippets = list(synthetic_snippets(size))
+        index = ContextIndex(path, embed_dim=embed_dim)
+        started = time.perf_counter()
+        for snippet in snippets:
+            index.add_many([snippet])
+        add_us = (time.perf_counter() - started) / size * 1e6
+
+        queries = [s["transcript"] for s in random.Random(1).sample(snippets, min(QUERIES, size))]
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query, 10)
+            latencies.append(time.perf_counter() - started)
+        index.close()
+
+        started = time.perf_counter()
+        ContextIndex(path, embed_dim=embed_dim).close()
+        reload_s = time.perf_counter() - started
+        return {
+            "snippets": size,
+            "embed_dim": embed_dim,
+            "add_us": round(add_us, 1),
+            "query_p50_ms": round(statistics.median(latencies) * 1000, 3),
+            "query_p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+            "reload_s": round(reload_s, 3),
+        }
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local context index")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated snippet counts")
+    parser.add_argument("--embed-dim", type=int, default=256, help="embedding width for the hybrid runs")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = [
+        run(int(size), embed_dim)
+        for size in args.sizes.split(",")
+        for embed_dim in (0, args.embed_dim)
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'snippets':>9} {'embed':>6} {'add us':>8} {'p50 ms':>8} {'p99 ms':>8} {'reload s':>9}")
+    for r in results:
+        print(f"{r['snippets']:>9} {r['embed_dim']:>6} {r['add_us']:>8} {r['query_p50_ms']:>8} "
+              f"{r['query_p99_ms']:>8} {r['reload_s']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# bench_demo_replay.py
+#
+# Many concurrent demo viewers replaying the demo conversation through
+# DemoPlayer, sharing one pre-encoded DemoTimeline, against each viewer
+# serializing the messages itself as it plays them. Viewers are in-process
+# fakes, so the numbers are the replay engine's own CPU cost and how late
+# frames go out against their schedule.
+#
+#   python bench_demo_replay.py --viewers 500 --speed 50 --repeat 4
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from demo_replay import DemoPlayer, DemoTimeline
+
+
+class FakeViewer:
+    """Stands in for a viewer's WebSocket: records when frames arrive, never sends commands."""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+        self.arrivals: List[float] = []
+        self.closed = asyncio.Event()
+
+    async def send_text(self, text: str):
+        if text.startswith('{"type": "replay"'):
+            return  # playback status, not a frame
+        self.frames += 1
+        self.bytes += len(text)
+        self.arrivals.append(time.monotonic())
+
+    async def receive_text(self) -> str:
+        await self.closed.wait()
+        from fastapi import WebSocketDisconnect
+        raise WebSocketDisconnect()
+
+
+class EncodingPlayer(DemoPlayer):
+    """The naive alternative: every viewer JSON-encodes each message as it sends it."""
+
+    def __init__(self, messages: List[dict], *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.messages = messages
+
+    async def play(self):
+        timeline = self.timeline
+        while self.index < len(timeline):
+            delay = (timeline.offsets[self.index] - self.position) / self.speed
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self.websocket.send_text(json.dumps(self.messages[self.index]))
+            self.index += 1
+
+
+def long_meeting(messages: List[dict], repeat: int) -> List[dict]:
+    """The demo conversation played `repeat` times back to back."""
+    times = [datetime.fromisoformat(m["timestamp"].replace("Z", "+00:00")) for m in messages]
+    span = times[-1] - times[0] + timedelta(seconds=15)
+    return [
+        {**m, "timestamp": (t + span * k).isoformat()}
+        for k in range(repeat)
+        for m, t in zip(messages, times)
+    ]
+
+
+async def run(name: str, messages: List[dict], viewers: int, speed: float) -> dict:
+    timeline = DemoTimeline(messages)
+    clients = [FakeViewer() for _ in range(viewers)]
+    if name == "shared timeline":
+        players = [DemoPlayer(timeline, ws, speed) for ws in clients]
+    else:
+        players = [EncodingPlayer(messages, timeline, ws, speed) for ws in clients]
+    cpu, started = time.process_time(), time.monotonic()
+    tasks = [asyncio.create_task(p.play()) for p in players]
+    while any(p.index < len(timeline) for p in players):
+        await asyncio.sleep(0.05)
+    cpu, elapsed = time.process_time() - cpu, time.monotonic() - started
+    for task in tasks:
+        task.cancel()
+
+    # Lateness of each frame against the schedule of the viewer it went to
+    lateness = [
+        arrival - (p.anchor_time + offset / speed)
+        for p, ws in zip(players, clients)
+        for arrival, offset in zip(ws.arrivals, timeline.offsets)
+    ]
+    ordered = sorted(lateness)
+    return {
+        "scenario": name,
+        "viewers": viewers,
+        "frames": sum(ws.frames for ws in clients),
+        "elapsed_s": round(elapsed, 2),
+        "cpu_s": round(cpu, 3),
+        "cpu_us_per_frame": round(cpu / max(1, sum(ws.frames for ws in clients)) * 1e6, 1),
+        "late_p50_ms": round(statistics.median(ordered) * 1000, 2),
+        "late_p99_ms": round(ordered[int(len(ordered) * 0.99)] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark demo replay with many viewers")
+    parser.add_argument("--viewers", type=int, default=500)
+    parser.add_argument("--speed", type=float, default=50)
+    parser.add_argument("--repeat", type=int, default=4, help="times the demo conversation is played back to back")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "analyzed_conversation.json")
+    with open(path, "r") as f:
+        messages = long_meeting(json.load(f), args.repeat)
+
+    results = [
+        asyncio.run(run(name, messages, args.viewers, args.speed))
+        for name in ("per-viewer encoding", "shared timeline")
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'scenario':<20} {'viewers':>8} {'frames':>8} {'elapsed s':>10} {'cpu s':>7} {'us/frame':>9} "
+          f"{'late p50':>9} {'p99 ms':>7}")
+    for r in results:
+        print(f"{r['scenario']:<20} {r['viewers']:>8} {r['frames']:>8} {r['elapsed_s']:>10} {r['cpu_s']:>7} "
+              f"{r['cpu_us_per_frame']:>9} {r['late_p50_ms']:>9} {r['late_p99_ms']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+# bench_e2e.py
+#
+# End-to-end benchmark of the whole pipeline: a synthetic meeting of
+# configurable length and speaker count is scripted into the fake
+# transcription backend, fed by a silence source at `--speed` times real
+# time, and the FastAPI app is driven in-process through TestClient, with
+# WebSocket clients subscribed to the session and analysis answered by the
+# local stub LLM. Reports:
+#   - throughput: segments and messages delivered per second, real-time factor
+#   - latency (p50/p99): audio sent -> transcript/interim received by a client,
+#     and segment received -> first analysis covering it
+#   - memory: process RSS sampled along the meeting, and its growth per hour
+# and writes everything, tagged with the current commit, to a JSON file so
+# runs can be compared (`--baseline` prints the change against an earlier one).
+#
+#   python bench_e2e.py --minutes 120 --speakers 6 --speed 30 --output bench_e2e.json
+#   python bench_e2e.py --minutes 20 --clients 8 --llm-latency-ms 800 --baseline bench_e2e.json
+#
+# Rate-controller budgets are per wall-clock minute, so at --speed N the
+# analysis runs roughly N times less often per meeting minute than live.
+
+import argparse
+import importlib
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sample_conversation import SAMPLE_CONVERSATION
+
+SESSION_ID = "bench"
+WORDS_PER_SECOND = 2.5  # FakeTranscriptionBackend defaults
+GAP = 0.4
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def synthetic_meeting(minutes: float, speakers: int, seed: int = 7) -> List[dict]:
+    """
+    A script of {"speaker", "transcript"} messages lasting about `minutes`
+    when spoken by the fake backend: sentences of the sample conversation
+    recombined into turns of 1-4 sentences, with a few dominant speakers
+    and occasional quick back-and-forth, like a real meeting.
+    """
+    rng = random.Random(seed)
+    sentences = [
+        s.strip()
+        for message in SAMPLE_CONVERSATION
+        for s in re.split(r"(?<=[.!?])\s+", message["transcript"])
+        if s.strip()
+    ]
+    weights = [1 / (i + 1) for i in range(speakers)]  # Zipf-like share of the talking
+    script, elapsed, previous = [], 0.0, None
+    while elapsed < minutes * 60:
+        speaker = rng.choices(range(speakers), weights)[0]
+        if speaker == previous and speakers > 1:
+            speaker = (speaker + 1) % speakers
+        previous = speaker
+        turn = " ".join(rng.choice(sentences) for _ in range(rng.choice((1, 1, 2, 2, 3, 4))))
+        script.append({"speaker": f"Speaker {speaker + 1}", "transcript": turn})
+        elapsed += len(turn.split()) / WORDS_PER_SECOND + GAP
+    return script
+
+
+def rss_mb() -> float:
+    """Current resident set size; peak RSS where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.realpath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class BenchClient(threading.Thread):
+    """A WebSocket subscriber that timestamps every message it receives."""
+
+    def __init__(self, client, session_getter, measure_insights: bool):
+        super().__init__(daemon=True)
+        self.client = client
+        self.session_getter = session_getter
+        self.measure_insights = measure_insights
+        self.connected = threading.Event()
+        self.messages = 0
+        self.frames = 0
+        self.counts: Dict[str, int] = {}
+        self.latencies: Dict[str, List[float]] = {"transcript": [], "interim": []}
+        self.received_at: Dict[int, float] = {}  # seq -> when its transcript arrived
+        self.insights: Dict[str, List[float]] = {}
+        self.seen_insights = set()
+        self.error: Optional[str] = None
+
+    def run(self):
+        try:
+            with self.client.websocket_connect(f"/real-time/{SESSION_ID}/ws") as ws:
+                self.connected.set()
+                while True:
+                    frame = json.loads(ws.receive_text())
+                    now = time.perf_counter()
+                    self.frames += 1
+                    for message in frame if isinstance(frame, list) else [frame]:
+                        if message["type"] == "bench_end":
+                            return
+                        self.observe(message, now)
+        except Exception as e:
+            self.error = str(e)
+            self.connected.set()
+
+    def observe(self, message: dict, now: float):
+        kind = message["type"]
+        self.messages += 1
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        if kind in self.latencies:
+            clock = self.session_getter().audio_clock
+            sent = clock.sent_at(message["end"]) if clock is not None else None
+            if sent is not None:
+                self.latencies[kind].append(now - sent)
+            if kind == "transcript":
+                self.received_at[message["seq"]] = now
+        elif kind == "analysis" and self.measure_insights:
+            # Streamed results arrive in parts; time the first one covering each transcript version
+            key = (message["kind"], message["transcript_length"])
+            received = self.received_at.get(message["transcript_length"])
+            if key not in self.seen_insights and received is not None:
+                self.seen_insights.add(key)
+                self.insights.setdefault(message["kind"], []).append(now - received)
+
+
+def summarize_ms(values: List[float]) -> dict:
+    return {
+        "count": len(values),
+        "p50_ms": round(statistics.median(values) * 1000, 2) if values else None,
+        "p99_ms": round(percentile(values, 99) * 1000, 2) if values else None,
+        "max_ms": round(max(values) * 1000, 2) if values else None,
+    }
+
+
+def run(args) -> dict:
+    script = synthetic_meeting(args.minutes, args.speakers, args.seed)
+    script_seconds = sum(len(m["transcript"].split()) / WORDS_PER_SECOND + GAP for m in script)
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    with open(os.path.join(workdir, "meeting.json"), "w") as f:
+        json.dump(script, f)
+
+    # The app reads its configuration at import time
+    os.environ.update({
+        "LLM_BASE_URL": f"http://127.0.0.1:{args.llm_port}/v1",
+        "AUDIO_FILE_DIR": workdir,
+        "CONTEXT_INDEX_DIR": "",
+        "PERSIST_ENABLED": "false",
+    })
+    import logging
+    import stub_llm
+    from fastapi.testclient import TestClient
+
+    stub = stub_llm.serve_in_background(
+        args.llm_port, latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms, token_ms=args.llm_token_ms,
+    )
+    server = importlib.import_module("main")
+    logging.getLogger().setLevel(logging.WARNING)
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "config": {
+            "minutes": args.minutes, "speakers": args.speakers, "speed": args.speed, "clients": args.clients,
+            "llm_latency_ms": args.llm_latency_ms, "llm_token_ms": args.llm_token_ms, "seed": args.seed,
+            "script_messages": len(script),
+            "script_words": sum(len(m["transcript"].split()) for m in script),
+        },
+    }
+    try:
+        with TestClient(server.app) as client:
+            session_getter = lambda: server.session_manager.get(SESSION_ID)  # noqa: E731
+            client.post("/sessions", params={"session_id": SESSION_ID}).raise_for_status()
+            clients = [BenchClient(client, session_getter, measure_insights=i == 0) for i in range(args.clients)]
+            for c in clients:
+                c.start()
+                c.connected.wait(10)
+
+            rss_start = rss_mb()
+            samples = [(0.0, round(rss_start, 1))]
+            started = time.perf_counter()
+            response = client.post(f"/real-time/{SESSION_ID}/start", json={
+                "source": "silence", "duration": script_seconds + 2, "speed": args.speed,
+                "backend": "fake", "script": "meeting.json",
+            })
+            response.raise_for_status()
+
+            # Sample memory by meeting time until the recording ends
+            session = session_getter()
+            next_sample = args.sample_minutes
+            while session.recording:
+                time.sleep(0.2)
+                clock = session.audio_clock
+                meeting_minutes = clock.sent_seconds / 60 if clock is not None else 0.0
+                if meeting_minutes >= next_sample:
+                    samples.append((round(meeting_minutes, 1), round(rss_mb(), 1)))
+                    next_sample += args.sample_minutes
+            elapsed = time.perf_counter() - started
+            time.sleep(args.drain)  # let in-flight analysis land
+            samples.append((round(script_seconds / 60, 1), round(rss_mb(), 1)))
+            info = client.get(f"/sessions/{SESSION_ID}").json()
+
+            session.broadcaster.publish_threadsafe([{"type": "bench_end"}])
+            for c in clients:
+                c.join(10)
+            client.post(f"/real-time/{SESSION_ID}/stop")
+    finally:
+        stub.should_exit = True
+
+    errors = [c.error for c in clients if c.error]
+    measured = clients[0]
+    transcripts = info["transcript_entries"]
+    warm = next((mb for minute, mb in samples if minute >= args.minutes * 0.1), samples[0][1])
+    hours = args.minutes * 0.9 / 60
+    result.update({
+        "throughput": {
+            "elapsed_s": round(elapsed, 2),
+            "realtime_factor": round(script_seconds / elapsed, 2),
+            "segments": transcripts,
+            "segments_per_s": round(transcripts / elapsed, 2),
+            "messages_per_client": round(statistics.mean(c.messages for c in clients), 1),
+            "messages_per_s": round(sum(c.messages for c in clients) / elapsed, 1),
+            "frames_per_client": round(statistics.mean(c.frames for c in clients), 1),
+            "received": measured.counts,
+        },
+        "latency": {
+            "transcript": summarize_ms([l for c in clients for l in c.latencies["transcript"]]),
+            "interim": summarize_ms([l for c in clients for l in c.latencies["interim"]]),
+            **{f"insight_{kind}": summarize_ms(values) for kind, values in sorted(measured.insights.items())},
+        },
+        "memory": {
+            "rss_start_mb": round(rss_start, 1),
+            "rss_end_mb": samples[-1][1],
+            "growth_mb": round(samples[-1][1] - rss_start, 1),
+            # From 10% into the meeting on, past imports and warm-up
+            "growth_mb_per_hour": round((samples[-1][1] - warm) / hours, 1) if hours else None,
+            "samples": samples,
+        },
+        "server": {
+            "analysis": info["analysis"],
+            "broadcast": info["broadcast"],
+            "llm": dict(stub_llm.stats),
+        },
+        "client_errors": errors,
+    })
+    return result
+
+
+def flatten(data: dict, prefix: str = "") -> Dict[str, float]:
+    """Numeric leaves of a result as dotted keys, for comparing runs."""
+    out = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            out.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[name] = value
+    return out
+
+
+def compare(result: dict, baseline: dict):
+    keys = ("throughput.", "latency.", "memory.")
+    current, previous = flatten(result), flatten(baseline)
+    print(f"\nversus {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    if baseline.get("config") != result["config"]:
+        print("  (different configuration; counts are not comparable)")
+    for key, value in current.items():
+        if key.startswith(keys) and key in previous and previous[key]:
+            change = 100 * (value - previous[key]) / abs(previous[key])
+            print(f"  {key:<40} {previous[key]:>10} -> {value:<10} {change:+.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark over a synthetic meeting")
+    parser.add_argument("--minutes", type=float, default=120, help="meeting length")
+    parser.add_argument("--speakers", type=int, default=6)
+    parser.add_argument("--speed", type=float, default=30, help="audio pace, multiple of real time")
+    parser.add_argument("--clients", type=int, default=4, help="WebSocket subscribers")
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="stub time to first token")
+    parser.add_argument("--llm-jitter-ms", type=float, default=100)
+    parser.add_argument("--llm-token-ms", type=float, default=5, help="stub time per generated token")
+    parser.add_argument("--llm-port", type=int, default=9127)
+    parser.add_argument("--sample-minutes", type=float, default=5, help="meeting minutes between memory samples")
+    parser.add_argument("--drain", type=float, default=3, help="seconds to wait for analysis after the audio ends")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="bench_e2e.json", help="where to write the results")
+    parser.add_argument("--baseline", default="", help="earlier results to compare against")
+    args = parser.parse_args()
+
+    result = run(args)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    t, latency, memory = result["throughput"], result["latency"], result["memory"]
+    print(f"{args.minutes:g} min meeting, {args.speakers} speakers, {args.clients} clients at {args.speed:g}x: "
+          f"{t['elapsed_s']} s ({t['realtime_factor']}x real time)")
+    print(f"throughput: {t['segments']} segments ({t['segments_per_s']}/s), {t['messages_per_s']} messages/s delivered")
+    print(f"{'latency':<22} {'count':>7} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, s in latency.items():
+        print(f"{name:<22} {s['count']:>7} {str(s['p50_ms']):>9} {str(s['p99_ms']):>9} {str(s['max_ms']):>9}")
+    print(f"memory: {memory['rss_start_mb']} -> {memory['rss_end_mb']} MB RSS "
+          f"({memory['growth_mb_per_hour']} MB/hour after warm-up)")
+    if result["client_errors"]:
+        print(f"client errors: {result['client_errors']}")
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            compare(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
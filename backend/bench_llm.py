@@ -0,0 +1,132 @@
+# bench_llm.py
+#
+# Throughput and latency of analysis LLM calls against the local stub server:
+#   - "per-request client": the old pattern, a new openai.OpenAI client per call
+#   - "pooled": the shared LLMClient connection pool, one request per analysis
+#   - "pooled batched": one combined objective + sentiment request per pass
+#
+#   python bench_llm.py --passes 200 --concurrency 16 --latency-ms 200
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import openai
+
+import stub_llm
+from analysis import TranscriptEntry, get_combined_analysis, get_meeting_objective, score_speaker_delta
+from llm_client import LLMClient, close_llm_client, set_llm_client
+from sample_conversation import SAMPLE_CONVERSATION
+
+ENTRIES = [
+    TranscriptEntry(speaker=m["speaker"], transcript=m["transcript"])
+    for m in SAMPLE_CONVERSATION
+]
+LATEST = ENTRIES[-1]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(name: str, passes: int, requests: int, elapsed: float, latencies: List[float]) -> dict:
+    return {
+        "scenario": name,
+        "passes": passes,
+        "requests": requests,
+        "elapsed_s": round(elapsed, 2),
+        "passes_per_s": round(passes / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def per_request_client(base_url: str, passes: int, concurrency: int) -> dict:
+    """One analysis pass = objective + sentiment, each on a freshly built client."""
+    messages = [{"role": "user", "content": "\n".join(f"{e.speaker}: {e.transcript}" for e in ENTRIES)}]
+
+    def call(system_prompt: str):
+        client = openai.OpenAI(api_key="unused", base_url=base_url, max_retries=0)
+        client.chat.completions.create(
+            model="stub",
+            messages=[{"role": "system", "content": system_prompt}] + messages,
+            response_format={"type": "json_object"},
+        )
+        client.close()
+
+    def one_pass(_):
+        start = time.perf_counter()
+        call("objective of the conversation")
+        call("sentiment score per speaker")
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one_pass, range(passes)))
+    return report("per-request client", passes, passes * 2, time.perf_counter() - start, latencies)
+
+
+async def pooled(base_url: str, passes: int, concurrency: int, batched: bool) -> dict:
+    client = LLMClient(base_url=base_url, max_concurrency=concurrency)
+    set_llm_client(client)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_pass(i: int):
+        # A distinct snippet per pass, so single-flight doesn't merge the requests
+        latest = TranscriptEntry(speaker=LATEST.speaker, transcript=f"{LATEST.transcript} ({i})")
+        entries = ENTRIES[:-1] + [latest]
+        async with semaphore:
+            start = time.perf_counter()
+            if batched:
+                json.loads(await get_combined_analysis(entries, [(latest.speaker, latest.transcript, 0.1)]))
+            else:
+                await asyncio.gather(
+                    get_meeting_objective(entries),
+                    score_speaker_delta(latest.speaker, latest.transcript, 0.1),
+                )
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one_pass(i) for i in range(passes)))
+    elapsed = time.perf_counter() - start
+    requests = client.requests
+    await close_llm_client()
+    name = "pooled batched" if batched else "pooled"
+    return report(name, passes, requests, elapsed, list(latencies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark analysis LLM client strategies")
+    parser.add_argument("--passes", type=int, default=200, help="analysis passes per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--port", type=int, default=9123)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    server = stub_llm.serve_in_background(args.port, latency_ms=args.latency_ms)
+    base_url = f"http://127.0.0.1:{args.port}/v1"
+    try:
+        rows = [
+            per_request_client(base_url, args.passes, args.concurrency),
+            asyncio.run(pooled(base_url, args.passes, args.concurrency, batched=False)),
+            asyncio.run(pooled(base_url, args.passes, args.concurrency, batched=True)),
+        ]
+    finally:
+        server.should_exit = True
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'scenario':<20} {'passes/s':>9} {'requests':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for r in rows:
+        print(f"{r['scenario']:<20} {r['passes_per_s']:>9} {r['requests']:>9} {r['p50_ms']:>8} {r['p99_ms']:>8}")
+
+
+if __name__ == "__main__":
+    main()
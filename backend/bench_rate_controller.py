@@ -0,0 +1,114 @@
+# bench_rate_controller.py
+#
+# Offline simulation of the adaptive analysis rate controller over a long
+# meeting: the sample conversation replayed at speaking pace against a
+# simulated LLM whose latency and error rate spike for a while mid-meeting.
+# Compares the old one-call-per-segment behaviour with the default and a
+# custom policy: LLM calls made and saved, and how stale results got.
+#
+#   python bench_rate_controller.py --minutes 60
+#   python bench_rate_controller.py --policy '{"sentiment": {"min_new_words": 60}}'
+
+import argparse
+import json
+import random
+from typing import Dict, List, Tuple
+
+from rate_controller import DEFAULT_POLICIES, RateController, TriggerPolicy, load_policies
+from sample_conversation import SAMPLE_CONVERSATION
+
+WORDS_PER_SECOND = 2.5
+TICK = 0.1  # simulation step, seconds
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def segments(minutes: float, seed: int = 3) -> List[Tuple[float, int, str]]:
+    """(time, words, speaker) of each finalized segment, utterances cut at ~12 words."""
+    rng = random.Random(seed)
+    out, now = [], 0.0
+    while now < minutes * 60:
+        for message in SAMPLE_CONVERSATION:
+            words = len(message["transcript"].split())
+            while words > 0:
+                chunk = min(words, 12)
+                now += chunk / WORDS_PER_SECOND
+                out.append((now, chunk, message["speaker"]))
+                words -= chunk
+            now += rng.uniform(0.2, 1.5)
+    return [s for s in out if s[0] < minutes * 60]
+
+
+def llm_call(now: float, minutes: float, rng: random.Random) -> Tuple[float, bool]:
+    """Latency and success of a call: slow and flaky through the middle fifth of the meeting."""
+    spike = 0.4 * minutes * 60 <= now < 0.6 * minutes * 60
+    latency = rng.uniform(6.0, 12.0) if spike else rng.uniform(0.8, 2.0)
+    ok = rng.random() > (0.3 if spike else 0.01)
+    return latency, ok
+
+
+def simulate(policies: Dict[str, TriggerPolicy], minutes: float) -> dict:
+    clock = FakeClock()
+    controller = RateController(policies, clock)
+    rng = random.Random(11)
+    timeline = segments(minutes)
+    in_flight: List[Tuple[float, str, float, bool]] = []
+    i = 0
+    while clock.now < minutes * 60 or in_flight:
+        clock.now += TICK
+        while i < len(timeline) and timeline[i][0] <= clock.now:
+            _, words, speaker = timeline[i]
+            controller.observe(words, [speaker])
+            i += 1
+        for call in [c for c in in_flight if c[0] <= clock.now]:
+            in_flight.remove(call)
+            controller.finish([call[1]], call[2], call[3])
+        if clock.now >= minutes * 60:
+            continue
+        for kind, reason in controller.due_kinds().items():
+            controller.start({kind: reason})
+            latency, ok = llm_call(clock.now, minutes, rng)
+            in_flight.append((clock.now + latency, kind, latency, ok))
+    return controller.stats()
+
+
+def every_segment() -> Dict[str, TriggerPolicy]:
+    """The old behaviour: a call for every finalized segment, whenever the previous one is done."""
+    return {
+        kind: TriggerPolicy(min_new_words=0, max_staleness=0, min_interval=0, budget_per_minute=1e9,
+                            burst=10 ** 9, latency_target=1e9, max_backoff=1.0)
+        for kind in DEFAULT_POLICIES
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the analysis rate controller")
+    parser.add_argument("--minutes", type=float, default=120)
+    parser.add_argument("--policy", default="", help="ANALYSIS_POLICY-style overrides to compare as 'custom'")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    scenarios = {"every segment": every_segment(), "default policy": load_policies("")}
+    if args.policy:
+        scenarios["custom policy"] = load_policies(args.policy)
+    results = {name: simulate(policies, args.minutes) for name, policies in scenarios.items()}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'scenario':<16} {'kind':<10} {'segments':>9} {'calls':>6} {'saved':>6} {'errors':>7} "
+          f"{'stale p50':>10} {'p95':>6} {'max':>6}")
+    for name, kinds in results.items():
+        for kind, s in kinds.items():
+            print(f"{name:<16} {kind:<10} {s['segments']:>9} {s['calls']:>6} {s['calls_saved']:>6} {s['errors']:>7} "
+                  f"{str(s['staleness_p50_s']):>10} {str(s['staleness_p95_s']):>6} {str(s['staleness_max_s']):>6}")
+
+
+if __name__ == "__main__":
+    main()
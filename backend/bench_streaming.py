@@ -0,0 +1,114 @@
+# bench_streaming.py
+#
+# Time to first insight of analysis passes with and without streaming, against
+# the local stub LLM with per-token generation time. For each mode it reports
+# when the first result reached `publish`, when the last speaker's sentiment
+# did, and when the pass finished, plus how many malformed answers were
+# repaired.
+#
+#   python bench_streaming.py --passes 20 --token-ms 20 --speakers 12
+#   python bench_streaming.py --malformed-rate 0.3
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import List
+
+import stub_llm
+from analysis import TranscriptEntry
+from llm_client import LLMClient, close_llm_client, set_llm_client
+from sample_conversation import SAMPLE_CONVERSATION
+from scheduler import AnalysisScheduler
+from sentiment import SentimentTracker
+
+
+def meeting(speakers: int) -> List[TranscriptEntry]:
+    """The sample conversation, spread over `speakers` distinct speakers."""
+    return [
+        TranscriptEntry(speaker=f"Speaker {i % speakers + 1}", transcript=m["transcript"])
+        for i, m in enumerate(SAMPLE_CONVERSATION * (1 + speakers // len(SAMPLE_CONVERSATION)))
+    ]
+
+
+async def run_pass(entries: List[TranscriptEntry], mode: str, streaming: bool) -> dict:
+    speakers = {entry.speaker for entry in entries}
+    started = time.perf_counter()
+    times = {}
+
+    async def publish(message: dict):
+        now = time.perf_counter() - started
+        times.setdefault("first", now)
+        times.setdefault(message["kind"], now)
+        if message["kind"] == "sentiment" and len(message["data"]) == len(speakers):
+            times.setdefault("all_sentiment", now)
+
+    scheduler = AnalysisScheduler(lambda: entries, publish, SentimentTracker(), mode=mode, streaming=streaming)
+    await scheduler.run_once()
+    times["done"] = time.perf_counter() - started
+    return times
+
+
+def summarize(name: str, passes: List[dict]) -> dict:
+    def median_ms(key):
+        values = [p[key] for p in passes if key in p]
+        return round(statistics.median(values) * 1000, 1) if values else None
+
+    return {
+        "scenario": name,
+        "first_insight_ms": median_ms("first"),
+        "objective_ms": median_ms("objective"),
+        "all_sentiment_ms": median_ms("all_sentiment"),
+        "done_ms": median_ms("done"),
+        "failed": sum("objective" not in p for p in passes),
+    }
+
+
+async def run(base_url: str, passes: int, speakers: int) -> List[dict]:
+    client = LLMClient(base_url=base_url, max_concurrency=32)  # no cache: every pass hits the LLM
+    set_llm_client(client)
+    entries = meeting(speakers)
+    results = []
+    try:
+        for mode in ("batched", "separate"):
+            for streaming in (False, True):
+                name = f"{mode} {'streaming' if streaming else 'blocking'}"
+                requests = client.requests
+                outcomes = [await run_pass(entries, mode, streaming) for _ in range(passes)]
+                results.append({**summarize(name, outcomes), "llm_requests": client.requests - requests})
+    finally:
+        await close_llm_client()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streamed vs blocking analysis passes")
+    parser.add_argument("--passes", type=int, default=20)
+    parser.add_argument("--speakers", type=int, default=12)
+    parser.add_argument("--latency-ms", type=float, default=300, help="stub time to first token")
+    parser.add_argument("--token-ms", type=float, default=20, help="stub time per generated token")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="share of truncated stub answers")
+    parser.add_argument("--port", type=int, default=9125)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    server = stub_llm.serve_in_background(
+        args.port, latency_ms=args.latency_ms, token_ms=args.token_ms, malformed_rate=args.malformed_rate,
+    )
+    try:
+        results = asyncio.run(run(f"http://127.0.0.1:{args.port}/v1", args.passes, args.speakers))
+    finally:
+        server.should_exit = True
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'scenario':<20} {'first ms':>9} {'objective':>10} {'all sent.':>10} {'done ms':>9} {'failed':>7} {'requests':>9}")
+    for r in results:
+        print(f"{r['scenario']:<20} {str(r['first_insight_ms']):>9} {str(r['objective_ms']):>10} "
+              f"{str(r['all_sentiment_ms']):>10} {str(r['done_ms']):>9} {r['failed']:>7} {r['llm_requests']:>9}")
+
+
+if __name__ == "__main__":
+    main()
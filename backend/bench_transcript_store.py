@@ -0,0 +1,93 @@
+# bench_transcript_store.py
+#
+# Memory held by the transcript store over a long meeting, with everything in
+# memory versus a hot tail plus compressed spill chunks, and what reads cost
+# once most of the transcript is on disk: the tail the analysis reads, a
+# sequence range, an audio-time range and a full streamed export.
+#
+#   python bench_transcript_store.py --entries 200000
+#   python bench_transcript_store.py --hot 500 --batch 250
+
+import argparse
+import json
+import random
+import statistics
+import time
+import tracemalloc
+
+from sample_conversation import SAMPLE_CONVERSATION
+from transcript_store import TRANSCRIPT_COMPRESSION, TranscriptStore
+
+
+def fill(store: TranscriptStore, entries: int) -> float:
+    rng = random.Random(5)
+    texts = [m["transcript"] for m in SAMPLE_CONVERSATION]
+    started = time.perf_counter()
+    offset = 0.0
+    for i in range(entries):
+        text = f"{rng.choice(texts)} ({i})"  # distinct strings, like a real transcript
+        duration = len(text.split()) / 2.5
+        store.append(f"Speaker {rng.randint(1, 6)}", text, start=offset, end=offset + duration)
+        offset += duration + 0.4
+    return (time.perf_counter() - started) / entries
+
+
+def timed_ms(fn, repeat: int = 20) -> float:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return round(statistics.median(times) * 1000, 3)
+
+
+def run(name: str, entries: int, hot: int, batch: int) -> dict:
+    tracemalloc.start()
+    store = TranscriptStore(hot_entries=hot, spill_batch=batch)
+    append_s = fill(store, entries)
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    view = store.snapshot()
+    middle = store.first_seq + entries // 2
+    end = store.read(store.last_seq).__next__()["end"]
+    result = {
+        "scenario": name,
+        "entries": entries,
+        "held_mb": round(held / 2 ** 20, 1),
+        "append_us": round(append_s * 1e6, 2),
+        "tail_read_ms": timed_ms(lambda: view[len(view) - 50:]),
+        "seq_range_ms": timed_ms(lambda: list(store.read(middle, middle + 99))),
+        "time_range_ms": timed_ms(lambda: list(store.between(end / 2, end / 2 + 60))),
+        "export_s": round(timed_ms(lambda: sum(1 for _ in store.export()), repeat=1) / 1000, 2),
+        **{k: v for k, v in store.stats().items() if k in ("in_memory", "chunks", "spill_bytes", "compression_ratio")},
+    }
+    store.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark transcript retention with spill-to-disk")
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--hot", type=int, default=2000, help="entries kept in memory")
+    parser.add_argument("--batch", type=int, default=500, help="entries per spilled chunk")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = [
+        run("all in memory", args.entries, args.entries + 1, args.batch),
+        run(f"hot {args.hot} + {TRANSCRIPT_COMPRESSION}", args.entries, args.hot, args.batch),
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'scenario':<18} {'held MB':>8} {'append us':>10} {'tail ms':>8} {'seq ms':>7} {'time ms':>8} "
+          f"{'export s':>9} {'disk MB':>8} {'ratio':>6}")
+    for r in results:
+        print(f"{r['scenario']:<18} {r['held_mb']:>8} {r['append_us']:>10} {r['tail_read_ms']:>8} "
+              f"{r['seq_range_ms']:>7} {r['time_range_ms']:>8} {r['export_s']:>9} "
+              f"{round(r['spill_bytes'] / 2 ** 20, 1):>8} {str(r['compression_ratio']):>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+# broadcaster.py
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Hashable, Iterable, List, Optional
+
+from fastapi import WebSocket
+from starlette.websockets import WebSocketState
+
+from metrics import SEGMENT_BROADCAST_LATENCY, TRACER
+
+logger = logging.getLogger(__name__)
+
+# Frames a subscriber may have queued before the slow-consumer policy kicks in
+BROADCAST_QUEUE_SIZE = int(os.getenv("BROADCAST_QUEUE_SIZE", "64"))
+# Messages published within one tick go out as a single frame
+BROADCAST_TICK_MS = float(os.getenv("BROADCAST_TICK_MS", "20"))
+# What to do when a subscriber's queue is full:
+#   drop_interim - merge its queue into one frame without any interim updates
+#   coalesce     - merge its queue into one frame, keeping only the latest interim/analysis per key
+# either way a client whose merged frame exceeds COALESCE_MAX_MESSAGES is disconnected
+#   disconnect   - close the connection
+SLOW_CONSUMER_POLICY = os.getenv("SLOW_CONSUMER_POLICY", "drop_interim")
+# A merged frame holding more messages than this means the client is hopelessly behind
+COALESCE_MAX_MESSAGES = int(os.getenv("COALESCE_MAX_MESSAGES", "1000"))
+# Negotiate permessage-deflate on WebSocket connections (passed to uvicorn)
+BROADCAST_COMPRESS = os.getenv("BROADCAST_COMPRESS", "true").lower() in ("1", "true", "yes")
+
+POLICIES = ("drop_interim", "coalesce", "disconnect")
+
+# Close code for subscribers disconnected for falling behind ("try again later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class Encoded:
+    """A message JSON-encoded once and shared by every subscriber."""
+
+    __slots__ = ("text", "interim", "key", "type", "created", "trace_id")
+
+    def __init__(self, data: dict, created: Optional[float] = None):
+        self.text = json.dumps(data)
+        self.type = data.get("type")
+        self.interim = self.type == "interim"
+        # When the message was produced (perf_counter), for the broadcast latency
+        self.created = created if created is not None else time.perf_counter()
+        self.trace_id: Optional[str] = data.get("trace_id")
+        # Messages with the same key supersede each other when coalescing
+        self.key: Optional[Hashable] = None
+        if self.interim:
+            self.key = ("interim", data.get("speaker"))
+        elif data.get("type") == "analysis":
+            # Segment records each describe a different segment, so only a
+            # newer record for the same segment supersedes one
+            if data.get("kind") == "segment":
+                self.key = ("analysis", "segment", data.get("seq"))
+            else:
+                self.key = ("analysis", data.get("kind"))
+
+
+class Frame:
+    """
+    One WebSocket frame: a single message as-is, or several as a JSON array.
+    The text is built on first send, so a frame shared by all subscribers is
+    serialized once.
+    """
+
+    __slots__ = ("messages", "_text")
+
+    def __init__(self, messages: List[Encoded]):
+        self.messages = messages
+        self._text: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            if len(self.messages) == 1:
+                self._text = self.messages[0].text
+            else:
+                self._text = "[" + ",".join(m.text for m in self.messages) + "]"
+        return self._text
+
+    @property
+    def interim_only(self) -> bool:
+        return all(m.interim for m in self.messages)
+
+
+def coalesce(frames: Iterable[Frame]) -> Frame:
+    """Merge frames into one, keeping only the newest message for each key."""
+    messages = [m for frame in frames for m in frame.messages]
+    latest: Dict[Hashable, int] = {}
+    for i, m in enumerate(messages):
+        if m.key is not None:
+            latest[m.key] = i
+    return Frame([
+        m for i, m in enumerate(messages)
+        if m.key is None or latest[m.key] == i
+    ])
+
+
+class Subscriber:
+    """A connected client with its own bounded frame queue and sender task."""
+
+    def __init__(self, websocket: WebSocket, max_frames: int):
+        self.websocket = websocket
+        self.max_frames = max_frames
+        self.frames: Deque[Frame] = deque()
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.dropped = 0  # messages discarded by the slow-consumer policy
+        self.coalesced = 0  # times the queue was merged into one frame
+
+    def offer(self, frame: Frame, policy: str) -> bool:
+        """Queue a frame. Returns False if the subscriber should be disconnected."""
+        if len(self.frames) >= self.max_frames:
+            if policy == "disconnect":
+                return False
+            # Shed load by merging the whole queue into one frame; the
+            # messages keep their encoded text, so nothing is re-serialized
+            queued = list(self.frames) + [frame]
+            if policy == "coalesce":
+                frame = coalesce(queued)
+            else:
+                frame = Frame([m for f in queued for m in f.messages if not m.interim])
+            self.dropped += sum(len(f.messages) for f in queued) - len(frame.messages)
+            self.coalesced += 1
+            self.frames.clear()
+            if len(frame.messages) > COALESCE_MAX_MESSAGES:
+                return False
+            if not frame.messages:
+                return True
+        self.frames.append(frame)
+        self.ready.set()
+        return True
+
+    async def run(self):
+        ws = self.websocket
+        try:
+            while True:
+                await self.ready.wait()
+                while self.frames:
+                    frame = self.frames.popleft()
+                    if ws.client_state != WebSocketState.CONNECTED:
+                        return
+                    await ws.send_text(frame.text)
+                    self.sent += 1
+                    self.observe(frame)
+                self.ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error broadcasting to client: {e}")
+
+    @staticmethod
+    def observe(frame: Frame):
+        now = time.perf_counter()
+        for m in frame.messages:
+            if m.interim or m.type == "transcript":
+                SEGMENT_BROADCAST_LATENCY.labels(m.type).observe(now - m.created)
+            if m.trace_id is not None:
+                # The first subscriber to receive a segment completes its trace
+                TRACER.finish(m.trace_id, now)
+                m.trace_id = None
+
+    @property
+    def depth(self) -> int:
+        return len(self.frames)
+
+
+class Broadcaster:
+    """
+    Fans messages out to a session's WebSocket subscribers.
+
+    Publishing never waits on a client: each message is encoded once,
+    messages published within BROADCAST_TICK_MS are grouped into one frame,
+    and the frame is handed to every subscriber's bounded queue. A sender
+    task per subscriber drains its queue, so a slow client only delays
+    itself; when its queue fills up SLOW_CONSUMER_POLICY decides what to
+    shed.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        queue_size: int = BROADCAST_QUEUE_SIZE,
+        tick_ms: float = BROADCAST_TICK_MS,
+        policy: str = SLOW_CONSUMER_POLICY,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown slow-consumer policy {policy!r}, expected one of {POLICIES}")
+        self.loop = loop
+        self.queue_size = queue_size
+        self.tick = tick_ms / 1000
+        self.policy = policy
+        self.subscribers: Dict[WebSocket, Subscriber] = {}
+        self.pending: List[Encoded] = []
+        self.flush_handle: Optional[asyncio.Handle] = None
+        self.messages = 0
+        self.frames = 0
+        self.disconnected = 0
+
+    def __len__(self) -> int:
+        return len(self.subscribers)
+
+    def add(self, websocket: WebSocket) -> Subscriber:
+        subscriber = Subscriber(websocket, self.queue_size)
+        subscriber.task = self.loop.create_task(subscriber.run())
+        self.subscribers[websocket] = subscriber
+        return subscriber
+
+    def remove(self, websocket: WebSocket):
+        subscriber = self.subscribers.pop(websocket, None)
+        if subscriber is not None and subscriber.task is not None:
+            subscriber.task.cancel()
+
+    def publish(self, data: dict):
+        """Queue a message for the next frame. Must be called on the event loop."""
+        self.publish_many([data])
+
+    def publish_many(self, messages: List[dict], created: Optional[float] = None):
+        if not self.subscribers:
+            return
+        self.pending.extend(Encoded(data, created) for data in messages)
+        self.messages += len(messages)
+        if self.flush_handle is None:
+            if self.tick > 0:
+                self.flush_handle = self.loop.call_later(self.tick, self.flush)
+            else:
+                self.flush_handle = self.loop.call_soon(self.flush)
+
+    def publish_threadsafe(self, messages: List[dict]):
+        """Queue messages from another thread (e.g. the transcription callback)."""
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.publish_many, messages, time.perf_counter())
+
+    def flush(self):
+        self.flush_handle = None
+        if not self.pending:
+            return
+        frame = Frame(self.pending)
+        self.pending = []
+        self.frames += 1
+        for websocket, subscriber in list(self.subscribers.items()):
+            if not subscriber.offer(frame, self.policy):
+                self._disconnect(websocket, subscriber)
+
+    def _disconnect(self, websocket: WebSocket, subscriber: Subscriber):
+        logger.warning(f"Disconnecting slow client ({subscriber.depth} frames queued)")
+        self.remove(websocket)
+        self.disconnected += 1
+        self.loop.create_task(self._close(websocket))
+
+    @staticmethod
+    async def _close(websocket: WebSocket):
+        try:
+            await websocket.close(code=SLOW_CONSUMER_CLOSE_CODE, reason="Client too slow")
+        except Exception:
+            pass
+
+    async def close(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        for websocket in list(self.subscribers):
+            self.remove(websocket)
+            try:
+                await websocket.close()
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        subscribers = list(self.subscribers.values())
+        return {
+            "subscribers": len(subscribers),
+            "policy": self.policy,
+            "messages": self.messages,
+            "frames": self.frames,
+            "max_queue_depth": max((s.depth for s in subscribers), default=0),
+            "dropped": sum(s.dropped for s in subscribers),
+            "coalesced": sum(s.coalesced for s in subscribers),
+            "disconnected": self.disconnected,
+        }
@@ -0,0 +1,426 @@
+# bus.py
+
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from collections import deque
+from itertools import islice
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# How sessions share state between processes: "memory" (this process only) or
+# "redis" (Redis streams, so several workers or pods can serve one meeting)
+MESSAGE_BUS = os.getenv("MESSAGE_BUS", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Prefix of every key the bus uses, so deployments can share a Redis server
+BUS_PREFIX = os.getenv("BUS_PREFIX", "meeting:")
+# Entries kept per stream (approximately); a process that joins a session
+# late rebuilds its state from them
+BUS_STREAM_MAXLEN = int(os.getenv("BUS_STREAM_MAXLEN", "10000"))
+# Longest a blocking read waits, which is also how long a newly subscribed
+# stream can wait to join the read
+BUS_BLOCK_MS = int(os.getenv("BUS_BLOCK_MS", "250"))
+# Seconds a process holds a session's analysis lease without renewing it
+BUS_LEASE_TTL = float(os.getenv("BUS_LEASE_TTL", "15"))
+BUS_BACKOFF_BASE = 0.2  # seconds
+BUS_BACKOFF_MAX = 5.0
+# Entries per read and per pipelined write
+BUS_BATCH = 500
+
+# What this process does: "ingest" (audio and transcription), "analysis" (LLM
+# analysis) and "fanout" (WebSocket subscribers). All three by default; with a
+# shared bus each can run in its own, separately scaled processes.
+ROLES = ("ingest", "analysis", "fanout")
+PROCESS_ROLES = frozenset(
+    role.strip() for role in os.getenv("PROCESS_ROLES", ",".join(ROLES)).split(",") if role.strip()
+)
+
+# Identifies this process in bus events and leases
+PROCESS_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+# Stream announcing the sessions created and removed in any process
+REGISTRY_STREAM = "sessions"
+
+# Lease scripts, so checking the holder and renewing or deleting the key is one
+# atomic step: a lease that expires in between can't be renewed or released for
+# its new holder. KEYS[1] is the lease key, ARGV[1] the owner, ARGV[2] the TTL in ms.
+LEASE_CLAIM_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("PEXPIRE", KEYS[1], ARGV[2])
+end
+if redis.call("SET", KEYS[1], ARGV[1], "NX", "PX", ARGV[2]) then
+    return 1
+end
+return 0
+"""
+LEASE_RELEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+# Called on the event loop with each event and whether it is live (False
+# while a subscriber catches up on the stream's history)
+Handler = Callable[[dict, bool], None]
+
+
+def session_stream(session_id: str) -> str:
+    return f"session:{session_id}"
+
+
+class MessageBus:
+    """
+    Ordered publish/subscribe of JSON events on named streams, shared by the
+    processes serving sessions, plus leases that hand a piece of work (a
+    session's analysis) to exactly one of them.
+
+    `publish` never waits and must be called on the event loop; each
+    stream's events reach its subscriber in publish order, on the loop.
+    """
+
+    # Whether other processes see what is published here
+    shared = False
+
+    def start(self):
+        """Bind to the running event loop. Must be called from it (app startup)."""
+
+    def publish(self, stream: str, event: dict):
+        raise NotImplementedError
+
+    def subscribe(
+        self,
+        stream: str,
+        handler: Handler,
+        history: bool = False,
+        caught_up: Optional[Callable[[], None]] = None,
+    ):
+        """
+        Deliver the stream's events to `handler`. With `history`, the events
+        already on the stream come first (with live=False); `caught_up` is
+        called once they have all been delivered.
+        """
+        raise NotImplementedError
+
+    def unsubscribe(self, stream: str):
+        raise NotImplementedError
+
+    def drop(self, stream: str):
+        """Delete a stream's history once everything published to it has gone out."""
+
+    async def claim(self, name: str, owner: str, ttl: float = BUS_LEASE_TTL) -> bool:
+        """Take or renew the lease `name` for `ttl` seconds. Returns whether `owner` holds it."""
+        raise NotImplementedError
+
+    async def release(self, name: str, owner: str):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+class InProcessBus(MessageBus):
+    """Delivers events straight to this process's subscribers; the default for a single process."""
+
+    def __init__(self):
+        self.handlers: Dict[str, Handler] = {}
+        self.leases: Dict[str, Tuple[str, float]] = {}
+        self.published = 0
+
+    def publish(self, stream: str, event: dict):
+        self.published += 1
+        handler = self.handlers.get(stream)
+        if handler is None:
+            return
+        try:
+            handler(event, True)
+        except Exception as e:
+            logger.error(f"Error handling {stream} event: {e}")
+
+    def subscribe(self, stream, handler, history=False, caught_up=None):
+        # Nothing to catch up on: every event was handled when it was published
+        self.handlers[stream] = handler
+        if caught_up is not None:
+            caught_up()
+
+    def unsubscribe(self, stream: str):
+        self.handlers.pop(stream, None)
+
+    async def claim(self, name: str, owner: str, ttl: float = BUS_LEASE_TTL) -> bool:
+        now = time.monotonic()
+        holder = self.leases.get(name)
+        if holder is not None and holder[0] != owner and holder[1] > now:
+            return False
+        self.leases[name] = (owner, now + ttl)
+        return True
+
+    async def release(self, name: str, owner: str):
+        if self.leases.get(name, (None,))[0] == owner:
+            del self.leases[name]
+
+    def stats(self) -> dict:
+        return {"kind": "memory", "published": self.published, "streams": len(self.handlers)}
+
+
+class Subscription:
+    __slots__ = ("handler", "last")
+
+    def __init__(self, handler: Handler):
+        self.handler = handler
+        # Id of the last entry delivered; None while catching up
+        self.last: Optional[bytes] = None
+
+
+class RedisStreamBus(MessageBus):
+    """
+    A bus on Redis streams, one stream per session, so any number of
+    processes can publish and subscribe to it.
+
+    Published events are queued and written by one task in pipelined XADD
+    batches, in order, with jittered backoff while Redis is unreachable
+    (delivery is at least once). One reader task per process follows every
+    subscribed stream with a single blocking XREAD, and a subscriber with
+    `history` first pages through what is already on the stream, so a
+    process that joins mid-meeting can rebuild the session. Streams are
+    trimmed to about `maxlen` entries. Leases are keys set with NX and a
+    TTL, renewed and released by their holder through Lua scripts that
+    check the holder in the same step.
+
+    `client` replaces the connection made from `url`, e.g. with a fake.
+    """
+
+    shared = True
+
+    def __init__(
+        self,
+        url: str = REDIS_URL,
+        prefix: str = BUS_PREFIX,
+        maxlen: int = BUS_STREAM_MAXLEN,
+        block_ms: int = BUS_BLOCK_MS,
+        client=None,
+    ):
+        if client is None and aioredis is None:
+            raise RuntimeError("MESSAGE_BUS=redis needs the redis package (pip install redis)")
+        self.url = url
+        self.prefix = prefix
+        self.maxlen = maxlen
+        self.block_ms = block_ms
+        self.client = client
+        self.redis = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # (key, encoded event), or (key, None) to delete the stream
+        self.outgoing: Deque[Tuple[str, Optional[str]]] = deque()
+        self.streams: Dict[str, Subscription] = {}
+        self.tasks: List[asyncio.Task] = []
+        self.wakeup: Optional[asyncio.Event] = None
+        self.subscribed: Optional[asyncio.Event] = None
+        self.closing = False
+        self.published = 0
+        self.delivered = 0
+        self.write_batches = 0
+        self.errors = 0
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        # RESP2 replies (lists of [id, fields]) whatever the client library defaults to
+        self.redis = self.client if self.client is not None else aioredis.from_url(self.url, protocol=2)
+        self.wakeup = asyncio.Event()
+        self.subscribed = asyncio.Event()
+        self.tasks = [self.loop.create_task(self._write()), self.loop.create_task(self._read())]
+        logger.info(f"Message bus on Redis streams at {self.url} ({PROCESS_ID})")
+
+    def _key(self, stream: str) -> str:
+        return self.prefix + stream
+
+    def publish(self, stream: str, event: dict):
+        self.outgoing.append((self._key(stream), json.dumps(event, default=str)))
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    def drop(self, stream: str):
+        self.outgoing.append((self._key(stream), None))
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    async def _write(self):
+        failures = 0
+        while not self.closing:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            while self.outgoing:
+                batch = list(islice(self.outgoing, BUS_BATCH))
+                try:
+                    await self._send(batch)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    failures += 1
+                    self.errors += 1
+                    delay = min(BUS_BACKOFF_MAX, BUS_BACKOFF_BASE * 2 ** (failures - 1)) * random.uniform(0.5, 1.0)
+                    logger.warning(f"Publishing to Redis failed ({e}); {len(self.outgoing)} events queued, "
+                                   f"retrying in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+                    continue
+                failures = 0
+                for _ in batch:
+                    self.outgoing.popleft()
+
+    async def _send(self, batch: List[Tuple[str, Optional[str]]]):
+        pipe = self.redis.pipeline(transaction=False)
+        for key, payload in batch:
+            if payload is None:
+                pipe.delete(key)
+            else:
+                pipe.xadd(key, {"e": payload}, maxlen=self.maxlen, approximate=True)
+        await pipe.execute()
+        self.published += sum(payload is not None for _, payload in batch)
+        self.write_batches += 1
+
+    def subscribe(self, stream, handler, history=False, caught_up=None):
+        key = self._key(stream)
+        subscription = self.streams[key] = Subscription(handler)
+        self.loop.create_task(self._position(key, subscription, history, caught_up))
+
+    def unsubscribe(self, stream: str):
+        self.streams.pop(self._key(stream), None)
+
+    async def _position(self, key: str, subscription: Subscription, history: bool,
+                        caught_up: Optional[Callable[[], None]]):
+        """Deliver the stream's history if asked, then hand the subscription to the reader from there."""
+        last = b"0-0"
+        try:
+            if history:
+                start = "-"
+                while self.streams.get(key) is subscription:
+                    entries = await self.redis.xrange(key, min=start, max="+", count=BUS_BATCH)
+                    for entry_id, fields in entries:
+                        self._deliver(key, subscription, fields, False)
+                        last = entry_id
+                    if len(entries) < BUS_BATCH:
+                        break
+                    start = b"(" + last
+            else:
+                entries = await self.redis.xrevrange(key, max="+", min="-", count=1)
+                if entries:
+                    last = entries[0][0]
+        except Exception as e:
+            # Follow from the last entry seen; anything older is lost to this subscriber
+            self.errors += 1
+            logger.warning(f"Could not read the history of {key}: {e}")
+        if caught_up is not None:
+            try:
+                caught_up()
+            except Exception as e:
+                logger.error(f"Error handling {key} catch-up: {e}")
+        subscription.last = last
+        self.subscribed.set()
+
+    async def _read(self):
+        failures = 0
+        while not self.closing:
+            streams = {key: sub.last for key, sub in self.streams.items() if sub.last is not None}
+            if not streams:
+                self.subscribed.clear()
+                await self.subscribed.wait()
+                continue
+            try:
+                response = await self.redis.xread(streams, count=BUS_BATCH, block=self.block_ms)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                self.errors += 1
+                delay = min(BUS_BACKOFF_MAX, BUS_BACKOFF_BASE * 2 ** (failures - 1)) * random.uniform(0.5, 1.0)
+                logger.warning(f"Reading from Redis failed ({e}); retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            failures = 0
+            for key, entries in response or []:
+                key = key.decode() if isinstance(key, bytes) else key
+                subscription = self.streams.get(key)
+                # Unsubscribed, or resubscribed and catching up again, meanwhile
+                if subscription is None or subscription.last is None:
+                    continue
+                for entry_id, fields in entries:
+                    subscription.last = entry_id
+                    self._deliver(key, subscription, fields, True)
+
+    def _deliver(self, key: str, subscription: Subscription, fields: dict, live: bool):
+        try:
+            event = json.loads(fields[b"e"] if b"e" in fields else fields["e"])
+            subscription.handler(event, live)
+            self.delivered += 1
+        except Exception as e:
+            logger.error(f"Error handling {key} event: {e}")
+
+    async def claim(self, name: str, owner: str, ttl: float = BUS_LEASE_TTL) -> bool:
+        key = self._key(f"lease:{name}")
+        return bool(await self.redis.eval(LEASE_CLAIM_SCRIPT, 1, key, owner, int(ttl * 1000)))
+
+    async def release(self, name: str, owner: str):
+        await self.redis.eval(LEASE_RELEASE_SCRIPT, 1, self._key(f"lease:{name}"), owner)
+
+    async def close(self, timeout: float = 5.0):
+        """Stop reading, and send what is still queued (best effort)."""
+        # On Python 3.11 a cancellation can be lost inside the Redis client
+        # (asyncio.wait_for drops one that arrives as the awaited write
+        # completes), leaving a task polling XREAD. The closing flag ends the
+        # loops after their current command, and the wait is bounded either way.
+        self.closing = True
+        for event in (self.wakeup, self.subscribed):
+            if event is not None:
+                event.set()
+        for task in self.tasks:
+            task.cancel()
+        if self.tasks:
+            _, running = await asyncio.wait(self.tasks, timeout=timeout)
+            if running:
+                logger.warning(f"{len(running)} bus tasks still running after {timeout}s; closing anyway")
+        if self.redis is None:
+            return
+        try:
+            while self.outgoing:
+                batch = list(islice(self.outgoing, BUS_BATCH))
+                await asyncio.wait_for(self._send(batch), timeout)
+                for _ in batch:
+                    self.outgoing.popleft()
+        except Exception as e:
+            logger.warning(f"Final publish failed ({e}); {len(self.outgoing)} events not sent")
+        finally:
+            if self.client is None:
+                await self.redis.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "kind": "redis",
+            "process": PROCESS_ID,
+            "streams": len(self.streams),
+            "queued": len(self.outgoing),
+            "published": self.published,
+            "delivered": self.delivered,
+            "write_batches": self.write_batches,
+            "errors": self.errors,
+        }
+
+
+def make_message_bus(kind: str = MESSAGE_BUS) -> MessageBus:
+    """The bus for MESSAGE_BUS: in-process unless sessions are shared through Redis."""
+    if kind == "memory":
+        return InProcessBus()
+    if kind == "redis":
+        return RedisStreamBus()
+    raise ValueError(f"Unknown message bus {kind!r}, expected 'memory' or 'redis'")
@@ -0,0 +1,81 @@
+# context.py
+
+import asyncio
+from typing import Awaitable, Callable, List
+
+from analysis import TranscriptEntry, format_entries, summarize_conversation
+
+# Number of most recent entries sent verbatim with every prompt
+CONTEXT_WINDOW = 20
+# Entries older than the window are folded into the summary this many at a time
+FOLD_BATCH = 10
+# Hard cap on the rolling summary, in case the LLM ignores its length limit
+MAX_SUMMARY_CHARS = 1500
+
+
+class RollingContext:
+    """
+    Incrementally maintained prompt context for a growing transcript.
+
+    Keeps a compact rolling summary of everything older than the last
+    `window` entries plus those entries verbatim. Entries leaving the window
+    are folded into the summary in batches of `fold_batch`, so each prompt
+    holds at most `window + fold_batch - 1` raw entries and a summary of at
+    most `max_summary_chars`, however long the meeting runs.
+    """
+
+    def __init__(
+        self,
+        window: int = CONTEXT_WINDOW,
+        fold_batch: int = FOLD_BATCH,
+        max_summary_chars: int = MAX_SUMMARY_CHARS,
+        summarize: Callable[[str, List[TranscriptEntry]], Awaitable[str]] = summarize_conversation,
+    ):
+        self.window = window
+        self.fold_batch = fold_batch
+        self.max_summary_chars = max_summary_chars
+        self.summarize = summarize
+        self.summary = ""
+        self.folded = 0  # number of leading entries already in the summary
+        self.recent: List[TranscriptEntry] = []
+        self.generation = 0  # bumped by reset() to discard in-flight summaries
+        # Serializes folding, so concurrent analyses don't summarize a batch twice
+        self.lock = asyncio.Lock()
+
+    def reset(self):
+        self.summary = ""
+        self.folded = 0
+        self.recent = []
+        self.generation += 1
+
+    async def update(self, transcript_entries: List[TranscriptEntry]):
+        """
+        Bring the context up to date with `transcript_entries`, the full
+        transcript so far. Only entries not yet folded are looked at.
+        """
+        async with self.lock:
+            if len(transcript_entries) < self.folded:
+                # The transcript was cleared and restarted underneath us
+                self.summary = ""
+                self.folded = 0
+
+            while len(transcript_entries) - self.folded >= self.window + self.fold_batch:
+                batch = transcript_entries[self.folded:self.folded + self.fold_batch]
+                generation = self.generation
+                summary = await self.summarize(self.summary, batch)
+                if generation != self.generation:
+                    return  # reset() ran while we were summarizing
+                self.summary = summary.strip()[:self.max_summary_chars]
+                self.folded += self.fold_batch
+
+            self.recent = list(transcript_entries[self.folded:])
+
+    def render(self) -> str:
+        """Return the prompt text: the rolling summary followed by recent entries."""
+        recent = format_entries(self.recent)
+        if not self.summary:
+            return recent
+        return (
+            f"Summary of the earlier conversation:\n{self.summary}\n\n"
+            f"Most recent conversation:\n{recent}"
+        )
@@ -0,0 +1,372 @@
+# context_index.py
+
+import json
+import logging
+import math
+import os
+import threading
+import zlib
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from speaker_stats import STOPWORDS, WORD_RE
+
+logger = logging.getLogger(__name__)
+
+# Directory holding the index (docs.jsonl + embeddings.npy), e.g. "context_index";
+# "" (the default) keeps it in memory only
+CONTEXT_INDEX_DIR = os.getenv("CONTEXT_INDEX_DIR", "")
+CONTEXT_TOP_K = int(os.getenv("CONTEXT_TOP_K", "10"))
+# Most snippets kept; past it the oldest are evicted (from disk too)
+CONTEXT_INDEX_MAX_SNIPPETS = int(os.getenv("CONTEXT_INDEX_MAX_SNIPPETS", "50000"))
+# Eviction drops down to this share of the limit, so the index is rebuilt
+# once per many additions rather than on every one
+CONTEXT_EVICT_TO = 0.9
+
+# BM25 parameters (the usual Okapi defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Width of the optional hashed embedding vectors; 0 = BM25 only
+CONTEXT_EMBED_DIM = int(os.getenv("CONTEXT_EMBED_DIM", "0"))
+# Share of the score coming from embedding similarity when embeddings are on
+CONTEXT_EMBED_WEIGHT = float(os.getenv("CONTEXT_EMBED_WEIGHT", "0.3"))
+
+# Fields kept per indexed snippet, matching the transcripts table
+DOC_FIELDS = ("session_id", "seq", "speaker", "transcript", "timestamp")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased content words of `text`."""
+    return [t for t in WORD_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class HashingEmbedder:
+    """
+    Dependency-free text embedding: signed feature hashing of content words
+    and word bigrams into `dim` buckets, L2-normalized. Stable across
+    processes (crc32, not Python's salted hash) so stored vectors stay valid.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def __call__(self, text: str) -> np.ndarray:
+        tokens = tokenize(text)
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            h = zlib.crc32(feature.encode())
+            vector[h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class ContextIndex:
+    """
+    Local relevance index over past transcript snippets, used for
+    fact-check context instead of fetching the latest rows from Supabase.
+
+    An inverted index (term -> doc ids and term frequencies, in growable
+    arrays) answers BM25 queries; optionally every snippet also gets an
+    embedding row in a memory-mapped float32 matrix, blended into the score
+    by cosine similarity. `add` updates both incrementally as segments
+    finalize and, with a `path`, appends the snippet to docs.jsonl, so the
+    index is rebuilt from disk on restart. Past `max_snippets` the oldest
+    snippets are evicted and the index and log are rebuilt from the rest.
+    Remote storage is only used to `sync` in snippets this process hasn't
+    seen.
+    """
+
+    def __init__(
+        self,
+        path: str = CONTEXT_INDEX_DIR,
+        embed_dim: int = CONTEXT_EMBED_DIM,
+        embedder: Optional[Callable[[str], np.ndarray]] = None,
+        embed_weight: float = CONTEXT_EMBED_WEIGHT,
+        max_snippets: int = CONTEXT_INDEX_MAX_SNIPPETS,
+    ):
+        self.path = path
+        self.max_snippets = max_snippets
+        self.embed_dim = embed_dim
+        self.embedder = embedder or (HashingEmbedder(embed_dim) if embed_dim else None)
+        self.embed_weight = embed_weight
+        self.lock = threading.Lock()
+
+        self.docs: List[dict] = []
+        self.keys: set = set()
+        self.doc_lengths = array("f")
+        self.total_length = 0.0
+        # term -> (doc ids, term frequencies); numpy reads them without copying
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.embeddings: Optional[np.ndarray] = None
+        self.log = None
+
+        self.sync_watermark: Optional[str] = None
+        self.queries = 0
+        self.synced = 0
+        self.evicted = 0
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._load()
+            if len(self.docs) > self.max_snippets:
+                self._evict()
+            self.log = open(os.path.join(path, "docs.jsonl"), "a")
+        if self.embedder is not None:
+            self._open_embeddings()
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    # -------------------
+    # Persistence
+    # -------------------
+    def _load(self):
+        docs_path = os.path.join(self.path, "docs.jsonl")
+        if os.path.exists(docs_path):
+            valid_end = 0
+            with open(docs_path, "rb") as f:
+                for line in f:
+                    try:
+                        doc = json.loads(line)
+                    except ValueError:
+                        break
+                    self._index(doc)
+                    valid_end += len(line)
+            if valid_end < os.path.getsize(docs_path):
+                logger.warning(f"Truncating incomplete context index log after byte {valid_end}")
+                with open(docs_path, "r+b") as f:
+                    f.truncate(valid_end)
+
+        if self.docs:
+            logger.info(f"Loaded context index with {len(self.docs)} snippets")
+
+    def _open_embeddings(self):
+        """Map the embedding matrix, embedding any snippets the file is missing."""
+        path = os.path.join(self.path, "embeddings.npy") if self.path else None
+        count = len(self.docs)
+        valid = 0
+        if path and os.path.exists(path):
+            stored = np.load(path, mmap_mode="r+")
+            if stored.ndim == 2 and stored.shape[1] == self.embed_dim:
+                self.embeddings = stored
+                valid = min(count, stored.shape[0])
+            else:
+                logger.warning(f"Embedding width changed to {self.embed_dim}; re-embedding the index")
+        if self.embeddings is None or self.embeddings.shape[0] < count:
+            self._grow_embeddings(max(1024, 2 * count))
+        for row in range(valid, count):
+            self.embeddings[row] = self.embedder(self.docs[row]["transcript"])
+
+    def _grow_embeddings(self, capacity: int):
+        old = self.embeddings
+        if self.path:
+            path = os.path.join(self.path, "embeddings.npy")
+            tmp = path + ".tmp"
+            grown = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(capacity, self.embed_dim))
+            if old is not None:
+                grown[: old.shape[0]] = old
+                del old
+            grown.flush()
+            del grown
+            os.replace(tmp, path)
+            self.embeddings = np.load(path, mmap_mode="r+")
+        else:
+            grown = np.zeros((capacity, self.embed_dim), dtype=np.float32)
+            if old is not None:
+                grown[: old.shape[0]] = old
+            self.embeddings = grown
+
+    def close(self):
+        with self.lock:
+            if self.log is not None:
+                self.log.close()
+                self.log = None
+            if isinstance(self.embeddings, np.memmap):
+                self.embeddings.flush()
+
+    def _evict(self):
+        """Drop the oldest snippets and rebuild the postings (and log) from the rest."""
+        keep = self.docs[len(self.docs) - int(self.max_snippets * CONTEXT_EVICT_TO):]
+        dropped = len(self.docs) - len(keep)
+        self.docs = []
+        self.keys = set()
+        self.doc_lengths = array("f")
+        self.total_length = 0.0
+        self.postings = {}
+        for doc in keep:
+            self._index(doc)
+        if self.embeddings is not None:
+            self.embeddings[: len(keep)] = self.embeddings[dropped : dropped + len(keep)]
+        if self.path:
+            docs_path = os.path.join(self.path, "docs.jsonl")
+            reopen = self.log is not None
+            if reopen:
+                self.log.close()
+            with open(docs_path + ".tmp", "w") as f:
+                for doc in keep:
+                    f.write(json.dumps(doc) + "\n")
+            os.replace(docs_path + ".tmp", docs_path)
+            if reopen:
+                self.log = open(docs_path, "a")
+        self.evicted += dropped
+        logger.info(f"Evicted the {dropped} oldest snippets from the context index")
+
+    # -------------------
+    # Updates
+    # -------------------
+    def _index(self, doc: dict) -> bool:
+        key = (doc.get("session_id"), doc.get("seq"))
+        if doc.get("seq") is not None and key in self.keys:
+            return False
+        self.keys.add(key)
+        doc_id = len(self.docs)
+        self.docs.append(doc)
+        tokens = tokenize(doc.get("transcript", ""))
+        self.doc_lengths.append(len(tokens))
+        self.total_length += len(tokens)
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, tf in counts.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = (array("i"), array("f"))
+            posting[0].append(doc_id)
+            posting[1].append(tf)
+        return True
+
+    def add(self, session_id: str, seq: Optional[int], speaker: str, transcript: str, timestamp: str = "") -> bool:
+        """
+        Index one finalized snippet. Returns False if (session_id, seq) is
+        already indexed. Safe to call from any thread.
+        """
+        return self.add_many([{
+            "session_id": session_id,
+            "seq": seq,
+            "speaker": speaker,
+            "transcript": transcript,
+            "timestamp": timestamp,
+        }]) == 1
+
+    def add_many(self, rows: Iterable[dict]) -> int:
+        """Index rows shaped like the transcripts table; returns how many were new."""
+        added = 0
+        with self.lock:
+            for row in rows:
+                if not str(row.get("transcript") or "").strip():
+                    continue
+                doc = {field: row.get(field) for field in DOC_FIELDS}
+                if not self._index(doc):
+                    continue
+                added += 1
+                if self.embedder is not None:
+                    if len(self.docs) > self.embeddings.shape[0]:
+                        self._grow_embeddings(2 * self.embeddings.shape[0])
+                    self.embeddings[len(self.docs) - 1] = self.embedder(doc["transcript"])
+                if self.log is not None:
+                    self.log.write(json.dumps(doc) + "\n")
+            if added and self.log is not None:
+                self.log.flush()
+            if len(self.docs) > self.max_snippets:
+                self._evict()
+        return added
+
+    def sync(self, fetch: Callable[[Optional[str]], List[dict]]) -> int:
+        """
+        Pull snippets from remote storage that aren't indexed yet.
+        `fetch(since)` returns transcript rows with a timestamp after `since`
+        (None = all); the first sync of a process fetches everything and
+        relies on (session_id, seq) to skip known rows. Local segments reach
+        remote storage through the persister, so this only ever reads.
+        """
+        rows = fetch(self.sync_watermark)
+        added = self.add_many(rows)
+        self.synced += added
+        # Only remote rows move the watermark: live rows from this process can
+        # be newer than rows other processes haven't stored yet
+        self.sync_watermark = max(
+            [r["timestamp"] for r in rows if r.get("timestamp")] + [self.sync_watermark or ""]
+        ) or None
+        if added:
+            logger.info(f"Synced {added} snippets into the context index")
+        return added
+
+    # -------------------
+    # Queries
+    # -------------------
+    def search(
+        self,
+        query: str,
+        k: int = CONTEXT_TOP_K,
+        exclude: Optional[Tuple[str, int]] = None,
+    ) -> List[dict]:
+        """
+        The `k` snippets most relevant to `query`, best first, each with a
+        "score". `exclude` skips one (session_id, seq), e.g. the segment
+        being checked.
+        """
+        with self.lock:
+            self.queries += 1
+            count = len(self.docs)
+            if not count:
+                return []
+            scores = np.zeros(count, dtype=np.float32)
+            lengths = np.frombuffer(self.doc_lengths, dtype=np.float32, count=count)
+            average = self.total_length / count or 1.0
+            for term in set(tokenize(query)):
+                posting = self.postings.get(term)
+                if posting is None:
+                    continue
+                ids = np.frombuffer(posting[0], dtype=np.int32)
+                tfs = np.frombuffer(posting[1], dtype=np.float32)
+                idf = math.log(1 + (count - len(ids) + 0.5) / (len(ids) + 0.5))
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[ids] / average)
+                scores[ids] += idf * tfs * (BM25_K1 + 1) / (tfs + norm)
+
+            if self.embedder is not None:
+                best = scores.max()
+                if best > 0:
+                    scores /= best
+                similarity = np.asarray(self.embeddings[:count]) @ self.embedder(query)
+                scores = (1 - self.embed_weight) * scores + self.embed_weight * np.maximum(similarity, 0)
+
+            if exclude is not None and exclude in self.keys:
+                for i in np.flatnonzero(scores > 0):
+                    doc = self.docs[i]
+                    if (doc["session_id"], doc["seq"]) == exclude:
+                        scores[i] = 0
+                        break
+
+            k = min(k, count)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [{**self.docs[i], "score": round(float(scores[i]), 4)} for i in top if scores[i] > 0]
+
+    def recent(self, k: int = CONTEXT_TOP_K) -> List[dict]:
+        """The `k` most recently indexed snippets, newest first."""
+        with self.lock:
+            return list(reversed(self.docs[-k:])) if k else []
+
+    def stats(self) -> dict:
+        return {
+            "snippets": len(self.docs),
+            "terms": len(self.postings),
+            "embeddings": self.embed_dim if self.embedder is not None else 0,
+            "queries": self.queries,
+            "synced": self.synced,
+            "evicted": self.evicted,
+        }
+
+
+_index: Optional[ContextIndex] = None
+
+
+def get_context_index() -> ContextIndex:
+    """The process-wide context index, created (and loaded from disk) on first use."""
+    global _index
+    if _index is None:
+        _index = ContextIndex()
+    return _index
@@ -0,0 +1,216 @@
+# demo_replay.py
+
+import asyncio
+import bisect
+import json
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+# Assumed length of the last message, which has no successor to end it
+LAST_MESSAGE_SECONDS = 5.0
+SPEED_RANGE = (0.1, 100.0)
+
+
+def _parse_time(timestamp: str) -> float:
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp()
+
+
+class DemoTimeline:
+    """
+    The demo conversation, indexed once for replay: each message becomes a
+    `transcript` message of the real-time protocol, JSON-encoded up front,
+    at its offset from the first message's timestamp. Messages sharing a
+    timestamp form one frame. Every viewer replays from the same encoded
+    frames, so nothing is serialized per viewer.
+    """
+
+    def __init__(self, messages: List[dict]):
+        times = []
+        for message in messages:
+            try:
+                times.append(_parse_time(message["timestamp"]))
+            except (KeyError, TypeError, ValueError):
+                # Untimed messages follow the previous one closely
+                times.append(times[-1] + 1.0 if times else 0.0)
+        origin = times[0] if times else 0.0
+        offsets = [t - origin for t in times]
+
+        self.offsets: List[float] = []  # offset of each frame, ascending
+        self.texts: List[List[str]] = []  # encoded messages of each frame
+        for i, (message, offset) in enumerate(zip(messages, offsets)):
+            end = offsets[i + 1] if i + 1 < len(offsets) else offset + LAST_MESSAGE_SECONDS
+            text = json.dumps({
+                "type": "transcript",
+                "seq": i + 1,
+                "speaker": message.get("speaker"),
+                "name": message.get("name", message.get("speaker")),
+                "transcript": message.get("transcript", ""),
+                "start": offset,
+                "end": end,
+                "timestamp": message.get("timestamp"),
+                "analysis": message.get("analysis", {}),
+            })
+            if self.offsets and self.offsets[-1] == offset:
+                self.texts[-1].append(text)
+            else:
+                self.offsets.append(offset)
+                self.texts.append([text])
+        self.frames = [texts[0] if len(texts) == 1 else "[" + ",".join(texts) + "]" for texts in self.texts]
+        self.duration = self.offsets[-1] + LAST_MESSAGE_SECONDS if self.offsets else 0.0
+        self.messages = len(messages)
+        # The whole conversation as served by /demo/conversation, encoded once
+        self.conversation_json = json.dumps(messages)
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def index_at(self, position: float) -> int:
+        """Index of the first frame at or after `position` seconds."""
+        return bisect.bisect_left(self.offsets, position)
+
+    def catch_up(self, index: int) -> Optional[str]:
+        """One frame holding every message before frame `index`, for a viewer seeking forward."""
+        texts = [text for frame in self.texts[:index] for text in frame]
+        if not texts:
+            return None
+        return "[" + ",".join(texts) + "]"
+
+
+class DemoPlayer:
+    """
+    Plays a DemoTimeline to one WebSocket at the recorded spacing, scaled by
+    `speed`. The viewer can send commands as JSON text:
+        {"command": "seek", "position": 90}   jump to 90 s into the meeting
+        {"command": "speed", "speed": 4}
+        {"command": "pause"} / {"command": "resume"}
+    Each change is acknowledged with a {"type": "replay", ...} status message;
+    on seek the status is followed by one frame with every message before
+    the new position, so the viewer can rebuild its state.
+    """
+
+    def __init__(self, timeline: DemoTimeline, websocket: WebSocket, speed: float = 1.0,
+                 position: float = 0.0, loop: bool = False):
+        self.timeline = timeline
+        self.websocket = websocket
+        self.speed = self._clamp(speed)
+        self.loop = loop
+        self.paused = False
+        self.index = 0
+        # Playback position is anchor_position at anchor_time, advancing at `speed`
+        self.anchor_time = time.monotonic()
+        self.anchor_position = 0.0
+        self.changed = asyncio.Event()
+        self.pending_seek: Optional[float] = position if position > 0 else None
+        self.events: List[str] = []  # status updates owed to the viewer
+        self.sent = 0
+
+    @staticmethod
+    def _clamp(speed: float) -> float:
+        return min(SPEED_RANGE[1], max(SPEED_RANGE[0], float(speed)))
+
+    @property
+    def position(self) -> float:
+        if self.paused:
+            return self.anchor_position
+        return self.anchor_position + (time.monotonic() - self.anchor_time) * self.speed
+
+    def _anchor(self, position: float):
+        self.anchor_time = time.monotonic()
+        self.anchor_position = position
+
+    async def _status(self, event: str):
+        await self.websocket.send_text(json.dumps({
+            "type": "replay",
+            "event": event,
+            "position": round(self.position, 3),
+            "speed": self.speed,
+            "paused": self.paused,
+            "duration": self.timeline.duration,
+        }))
+
+    async def _seek(self, position: float):
+        position = min(max(0.0, position), self.timeline.duration)
+        self.index = self.timeline.index_at(position)
+        self._anchor(position)
+        await self._status("seek")
+        catch_up = self.timeline.catch_up(self.index)
+        if catch_up is not None:
+            await self.websocket.send_text(catch_up)
+
+    async def play(self):
+        timeline = self.timeline
+        await self._status("start")
+        while True:
+            # All sends happen here, so status messages never interleave with frames
+            while self.events:
+                await self._status(self.events.pop(0))
+            if self.pending_seek is not None:
+                position, self.pending_seek = self.pending_seek, None
+                await self._seek(position)
+            if self.index >= len(timeline):
+                if self.loop and not self.paused:
+                    self.pending_seek = 0.0
+                    continue
+                await self._status("end")
+                await self.changed.wait()
+                self.changed.clear()
+                continue
+            if self.paused:
+                await self.changed.wait()
+                self.changed.clear()
+                continue
+            delay = (timeline.offsets[self.index] - self.position) / self.speed
+            if delay > 0:
+                # Wake on whichever comes first, the frame's time or a command;
+                # a timer handle is much cheaper per frame than wait_for's task
+                timer = asyncio.get_running_loop().call_later(delay, self.changed.set)
+                await self.changed.wait()
+                timer.cancel()
+                self.changed.clear()
+                continue  # re-plan: the frame is due now, or a command changed the schedule
+            await self.websocket.send_text(timeline.frames[self.index])
+            self.index += 1
+            self.sent += 1
+
+    def command(self, data: dict):
+        """Apply a viewer command; the playback task picks it up."""
+        command = data.get("command")
+        if command == "seek":
+            self.pending_seek = float(data.get("position", 0.0))
+        elif command == "speed":
+            self._anchor(self.position)
+            self.speed = self._clamp(data.get("speed", 1.0))
+        elif command == "pause" and not self.paused:
+            self._anchor(self.position)
+            self.paused = True
+        elif command == "resume" and self.paused:
+            self.paused = False
+            self._anchor(self.anchor_position)
+        else:
+            return
+        if command != "seek":
+            self.events.append(command)
+        self.changed.set()
+
+    async def run(self):
+        """Play until the viewer disconnects, handling its commands."""
+        player = asyncio.create_task(self.play())
+        try:
+            while True:
+                try:
+                    data = json.loads(await self.websocket.receive_text())
+                    if isinstance(data, dict):
+                        self.command(data)
+                except (ValueError, TypeError):
+                    continue
+        except WebSocketDisconnect:
+            pass
+        finally:
+            player.cancel()
+            try:
+                await player
+            except (asyncio.CancelledError, Exception):
+                pass
@@ -1,50 +1,47 @@
+import asyncio
 import json
-from sample_conversation import SAMPLE_CONVERSATION
-from analysis import analyze_info_density, analyze_sentiment, analyze_controversy, analyze_fallacies
 import logging
+import os
+import sys
+import tempfile
+
+from batch_analyze import analyze_files
+from sample_conversation import SAMPLE_CONVERSATION
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def analyze_conversation():
+def analyze_conversation(output_file: str = "analyzed_conversation.json", base_url: str = None):
     """Analyze the sample conversation and save results to a file"""
     logger.info("Analyzing conversation...")
-    analyzed_conversation = []
-    
-    try:
-        for message in SAMPLE_CONVERSATION:
-            # Analyze the message
-            logger.info(f"Analyzing message: {message['transcript'][:50]}...")
-            info_density = analyze_info_density(message["transcript"])
-            sentiment = analyze_sentiment(message["transcript"])
-            is_controversial = analyze_controversy(message["transcript"])
-            fallacies = analyze_fallacies(message["transcript"])
-            
-            # Add analysis to the message
-            analyzed_message = {
-                **message,
-                "analysis": {
-                    "info_density": info_density,
-                    "sentiment": sentiment,
-                    "controversial": is_controversial,
-                    "fallacies": fallacies.get("fallacies", [])
-                }
-            }
-            analyzed_conversation.append(analyzed_message)
-            logger.info(f"Analysis complete for message. Found {len(fallacies.get('fallacies', []))} fallacies")
-        
-        # Save to file
-        output_file = "analyzed_conversation.json"
-        with open(output_file, "w") as f:
-            json.dump(analyzed_conversation, f, indent=2)
-        
-        logger.info(f"Analysis complete. Results saved to {output_file}")
-        return analyzed_conversation
-        
-    except Exception as e:
-        logger.error(f"Error analyzing conversation: {str(e)}", exc_info=True)
-        raise
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "sample_conversation.json")
+        results_file = os.path.join(tmp, "analyzed.jsonl")
+        with open(input_file, "w") as f:
+            json.dump(SAMPLE_CONVERSATION, f)
+
+        report = asyncio.run(analyze_files([input_file], results_file, base_url=base_url))
+        if report["failed"]:
+            raise RuntimeError(f"{report['failed']} messages could not be analyzed")
+
+        # Results stream in completion order; restore the conversation order
+        with open(results_file, "r") as f:
+            records = sorted((json.loads(line) for line in f), key=lambda r: r["index"])
+
+    analyzed_conversation = [
+        {key: value for key, value in record.items() if key not in ("source", "index")}
+        for record in records
+    ]
+
+    # Save to file
+    with open(output_file, "w") as f:
+        json.dump(analyzed_conversation, f, indent=2)
+
+    logger.info(f"Analysis complete. Results saved to {output_file} ({report['elapsed_s']}s)")
+    return analyzed_conversation
 
 if __name__ == "__main__":
-    analyze_conversation() 
\ No newline at end of file
+    # Optional: an OpenAI-compatible base URL, e.g. the local stub
+    analyze_conversation(base_url=sys.argv[1] if len(sys.argv) > 1 else None)
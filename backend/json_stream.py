@@ -0,0 +1,136 @@
+# json_stream.py
+
+import json
+from typing import Any, List, NamedTuple, Optional
+
+WHITESPACE = " \t\r\n"
+
+
+class JsonEvent(NamedTuple):
+    """
+    A value completed while streaming. `kind` is "item" for an element of an
+    array (at any depth; `key` is the member name the array sits under, None
+    for a top-level array) or "member" for a member of a top-level object.
+    """
+    kind: str
+    key: Optional[str]
+    value: Any
+
+
+class _Frame:
+    __slots__ = ("container", "key", "value_start", "after_colon")
+
+    def __init__(self, container: str, key: Optional[str]):
+        self.container = container  # "{" or "["
+        self.key = key  # object: current member name; array: name it sits under
+        self.value_start: Optional[int] = None
+        self.after_colon = False
+
+
+class JsonStreamParser:
+    """
+    Incremental parser for one JSON document arriving in chunks, e.g. LLM
+    tokens. `feed` returns the values that completed within the chunk, so
+    each array element or top-level member can be used before the rest of
+    the document has been generated. Text before the first "{" or "[" (such
+    as a code fence) is skipped. Completed values are decoded with
+    json.loads, so malformed elements raise ValueError from `feed`.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.pos = 0
+        self.stack: List[_Frame] = []
+        self.root_start: Optional[int] = None
+        self.root_end: Optional[int] = None
+        self.string_start: Optional[int] = None
+        self.escaped = False
+        self.scalar = False
+
+    @property
+    def done(self) -> bool:
+        return self.root_end is not None
+
+    def value(self) -> Any:
+        """The whole document; raises ValueError if it hasn't completed."""
+        if not self.done:
+            raise ValueError("Incomplete JSON document")
+        return json.loads(self.text[self.root_start:self.root_end])
+
+    def feed(self, chunk: str) -> List[JsonEvent]:
+        self.text += chunk
+        events: List[JsonEvent] = []
+        text = self.text
+        pos = self.pos
+        while pos < len(text) and not self.done:
+            char = text[pos]
+            if self.string_start is not None:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self._end_string(pos + 1, events)
+                pos += 1
+                continue
+
+            if not self.stack:
+                if char in "{[":
+                    self.root_start = pos
+                    self.stack.append(_Frame(char, None))
+                pos += 1
+                continue
+
+            frame = self.stack[-1]
+            if self.scalar and (char in WHITESPACE or char in ",]}"):
+                self.scalar = False
+                self._complete(frame, pos, events)
+            if char in WHITESPACE:
+                pass
+            elif char == '"':
+                self.string_start = pos
+                if not self._is_key(frame):
+                    frame.value_start = pos
+            elif char in "{[":
+                frame.value_start = pos
+                self.stack.append(_Frame(char, frame.key))
+            elif char in "}]":
+                self.stack.pop()
+                if self.stack:
+                    self._complete(self.stack[-1], pos + 1, events)
+                else:
+                    self.root_end = pos + 1
+            elif char == ":":
+                frame.after_colon = True
+            elif char == ",":
+                frame.value_start = None
+                if frame.container == "{":
+                    frame.after_colon = False
+            elif frame.value_start is None:
+                self.scalar = True
+                frame.value_start = pos
+            pos += 1
+        self.pos = pos
+        return events
+
+    @staticmethod
+    def _is_key(frame: _Frame) -> bool:
+        return frame.container == "{" and not frame.after_colon
+
+    def _end_string(self, end: int, events: List[JsonEvent]):
+        start, self.string_start = self.string_start, None
+        frame = self.stack[-1]
+        if self._is_key(frame):
+            frame.key = json.loads(self.text[start:end])
+        else:
+            self._complete(frame, end, events)
+
+    def _complete(self, frame: _Frame, end: int, events: List[JsonEvent]):
+        if frame.value_start is None:
+            return
+        value = json.loads(self.text[frame.value_start:end])
+        frame.value_start = None
+        if frame.container == "[":
+            events.append(JsonEvent("item", frame.key, value))
+        elif len(self.stack) == 1:
+            events.append(JsonEvent("member", frame.key, value))
@@ -0,0 +1,212 @@
+# llm_cache.py
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))  # seconds
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+# Optional SQLite file backing the in-memory cache, e.g. "llm_cache.sqlite3".
+# Lets restarts and demo replays reuse answers for identical transcripts.
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "")
+
+
+def normalize_content(text: str) -> str:
+    """Collapse whitespace so formatting-only differences share a cache entry."""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def make_cache_key(kind: str, model: str, content: str, *settings) -> str:
+    """
+    Key of one request. `settings` are the request parameters that change the
+    answer (JSON mode, sampling), so answers to different settings don't mix.
+    """
+    digest = hashlib.sha256()
+    for part in (kind, model, *map(repr, settings), normalize_content(content)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    Content-addressed cache of LLM responses.
+
+    Entries live in an LRU-ordered dict bounded by the total size of the
+    cached responses in bytes, and expire `ttl` seconds after they were
+    stored. With `db_path` set, every entry is also written to SQLite and
+    memory misses fall back to it (`lookup`), so the cache survives restarts.
+
+    SQLite is only touched by one background thread, in order: `put` queues
+    the write and returns, and `lookup` awaits the read, so a slow disk never
+    blocks the event loop. Only the in-memory LRU is used on the caller's
+    thread.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = LLM_CACHE_MAX_BYTES,
+        ttl: float = LLM_CACHE_TTL,
+        db_path: Optional[str] = LLM_CACHE_DB or None,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()  # key -> (value, stored_at)
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.db: Optional[sqlite3.Connection] = None
+        self.disk: Optional[ThreadPoolExecutor] = None
+        if db_path:
+            self.disk = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-cache")
+            self.disk.submit(self._open, db_path)
+
+    def get(self, key: str) -> Optional[str]:
+        """The entry held in memory, without falling back to disk."""
+        with self.lock:
+            value = self._get_memory(key)
+            if value is not None:
+                self.hits += 1
+            elif self.disk is None:
+                self.misses += 1
+            return value
+
+    async def lookup(self, key: str) -> Optional[str]:
+        """The entry from memory or, on a miss, from SQLite (read on the disk thread)."""
+        value = self.get(key)
+        if value is not None or self.disk is None:
+            return value
+        row = await asyncio.get_running_loop().run_in_executor(self.disk, self._read, key)
+        with self.lock:
+            if row is not None and time.time() - row[1] < self.ttl:
+                self._insert(key, row[0], row[1])
+                self.hits += 1
+                self.disk_hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: str):
+        stored_at = time.time()
+        with self.lock:
+            self._insert(key, value, stored_at)
+        if self.disk is not None:
+            self.disk.submit(self._write, key, value, stored_at)
+
+    async def flush(self):
+        """Wait until every queued disk write has been committed."""
+        if self.disk is not None:
+            await asyncio.get_running_loop().run_in_executor(self.disk, lambda: None)
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        item = self.entries.get(key)
+        if item is None:
+            return None
+        value, stored_at = item
+        if time.time() - stored_at >= self.ttl:
+            self._remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    # Disk thread only
+
+    def _open(self, db_path: str):
+        try:
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self.db.execute("DELETE FROM llm_cache WHERE stored_at < ?", (time.time() - self.ttl,))
+            self.db.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error opening LLM cache database {db_path}: {e}")
+            self.db = None
+
+    def _read(self, key: str) -> Optional[Tuple[str, float]]:
+        if self.db is None:
+            return None
+        try:
+            return self.db.execute("SELECT value, stored_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading LLM cache entry from disk: {e}")
+            return None
+
+    def _write(self, key: str, value: str, stored_at: float):
+        if self.db is None:
+            return
+        try:
+            self.db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, value, stored_at),
+            )
+            self.db.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error writing LLM cache entry to disk: {e}")
+
+    def _clear_disk(self):
+        if self.db is not None:
+            self.db.execute("DELETE FROM llm_cache")
+            self.db.commit()
+
+    def _insert(self, key: str, value: str, stored_at: float):
+        if key in self.entries:
+            self._remove(key)
+        value_size = len(value.encode("utf-8"))
+        if value_size > self.max_bytes:
+            return
+        self.entries[key] = (value, stored_at)
+        self.size += value_size
+        while self.size > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        value, _ = self.entries.pop(key)
+        self.size -= len(value.encode("utf-8"))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+        if self.disk is not None:
+            self.disk.submit(self._clear_disk)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide response cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache()
+    return _cache
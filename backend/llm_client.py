@@ -0,0 +1,288 @@
+# llm_client.py
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from typing import AsyncIterator, List, Optional
+
+import httpx
+import openai
+
+from llm_cache import ResponseCache, get_response_cache, make_cache_key
+from metrics import LLM_CACHE_LOOKUPS, LLM_REQUEST_DURATION, LLM_TOKENS
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Any OpenAI-compatible endpoint works, e.g. the local stub in stub_llm.py:
+#   LLM_BASE_URL=http://localhost:9000/v1
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.sambanova.ai/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "Meta-Llama-3.3-70B-Instruct")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))  # seconds per attempt
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))  # seconds
+
+# Errors worth retrying; anything else (bad request, auth) fails immediately
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,  # includes APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class LLMClient:
+    """
+    Long-lived async client for the analysis LLM.
+
+    Owns a single AsyncOpenAI client and therefore one keep-alive HTTP
+    connection pool, so requests reuse connections instead of paying a new
+    TLS handshake each time. At most `max_concurrency` requests are in flight
+    at once; failed attempts are retried with jittered exponential backoff.
+    Responses are looked up in and stored to the content-addressed
+    ResponseCache first, and concurrent identical prompts share one in-flight
+    request, so identical prompts never reach the LLM twice.
+    """
+
+    def __init__(
+        self,
+        base_url: str = LLM_BASE_URL,
+        api_key: Optional[str] = None,
+        model: str = LLM_MODEL,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        timeout: float = LLM_TIMEOUT,
+        max_retries: int = LLM_MAX_RETRIES,
+        backoff_base: float = LLM_BACKOFF_BASE,
+        cache: Optional[ResponseCache] = None,
+    ):
+        self.model = model
+        self.cache = cache
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.client = openai.AsyncOpenAI(
+            api_key=api_key or os.environ.get("SAMBANOVA_API_KEY") or "unused",
+            base_url=base_url,
+            timeout=timeout,
+            max_retries=0,  # retries are handled here, with backoff
+            http_client=openai.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=max_concurrency,
+                    max_keepalive_connections=max_concurrency,
+                ),
+            ),
+        )
+        self.flights = SingleFlight()
+        self.requests = 0
+        self.retries = 0
+
+    async def complete(
+        self,
+        kind: str,
+        messages: List[dict],
+        json_mode: bool = True,
+        temperature: float = 0.1,
+        top_p: float = 0.1,
+    ) -> str:
+        """
+        Run one chat completion and return the message content. `kind` names
+        the analysis (e.g. "objective") and is part of the cache key.
+        """
+        content = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        cache_key = make_cache_key(kind, self.model, content, json_mode, temperature, top_p)
+        cached = await self._lookup(kind, cache_key)
+        if cached is not None:
+            return cached
+
+        async def fetch():
+            llm_content = await self._create(kind, messages, json_mode, temperature, top_p)
+            if self.cache is not None and self._cacheable(llm_content, json_mode):
+                self.cache.put(cache_key, llm_content)
+            return llm_content
+
+        return await self.flights.do(cache_key, fetch)
+
+    @staticmethod
+    def _cacheable(llm_content: Optional[str], json_mode: bool) -> bool:
+        # Don't pin an empty or malformed answer for the whole TTL
+        return bool(llm_content) and LLMClient._outcome(llm_content, json_mode) == "ok"
+
+    @staticmethod
+    def _outcome(llm_content: Optional[str], json_mode: bool) -> str:
+        """"ok", or "invalid_json" for a JSON-mode answer that doesn't decode."""
+        if not json_mode:
+            return "ok"
+        try:
+            json.loads(llm_content or "")
+            return "ok"
+        except ValueError:
+            return "invalid_json"
+
+    async def stream(
+        self,
+        kind: str,
+        messages: List[dict],
+        json_mode: bool = True,
+        temperature: float = 0.1,
+        top_p: float = 0.1,
+    ) -> AsyncIterator[str]:
+        """
+        Like `complete`, but yield the content in chunks as the LLM generates
+        it. A cached answer is yielded whole. Failed attempts are retried only
+        until the first chunk has been yielded.
+        """
+        content = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        cache_key = make_cache_key(kind, self.model, content, json_mode, temperature, top_p)
+        cached = await self._lookup(kind, cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts: List[str] = []
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            async with self.semaphore:
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        self.requests += 1
+                        response = await self.client.chat.completions.create(
+                            model=self.model,
+                            messages=messages,
+                            temperature=temperature,
+                            top_p=top_p,
+                            stream=True,
+                            **self._format(json_mode),
+                        )
+                        async for chunk in response:
+                            text = chunk.choices[0].delta.content if chunk.choices else None
+                            if text:
+                                parts.append(text)
+                                yield text
+                        break
+                    except RETRYABLE_ERRORS as e:
+                        if parts or attempt == self.max_retries:
+                            raise
+                        await self._backoff(attempt, e)
+            outcome = self._outcome("".join(parts), json_mode)
+        except (asyncio.CancelledError, GeneratorExit):
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            logger.warning(f"LLM {kind} stream failed: {e!r}")
+            raise
+        finally:
+            self._record(kind, started, outcome, content, "".join(parts))
+
+        llm_content = "".join(parts)
+        if self.cache is not None and self._cacheable(llm_content, json_mode):
+            self.cache.put(cache_key, llm_content)
+
+    async def _lookup(self, kind: str, cache_key: str) -> Optional[str]:
+        if self.cache is None:
+            return None
+        cached = await self.cache.lookup(cache_key)
+        LLM_CACHE_LOOKUPS.labels(kind, "miss" if cached is None else "hit").inc()
+        return cached
+
+    @staticmethod
+    def _record(kind: str, started: float, outcome: str, prompt: str, llm_content: Optional[str], usage=None):
+        """
+        Latency and token metrics of one request, whatever its outcome (ok,
+        invalid_json, error or cancelled); tokens are estimated when the API
+        reports no usage, and counted for every answer that arrived.
+        """
+        LLM_REQUEST_DURATION.labels(kind, outcome).observe(time.perf_counter() - started)
+        if outcome in ("error", "cancelled") and not llm_content:
+            return
+        prompt_tokens = getattr(usage, "prompt_tokens", None) or len(prompt) // 4
+        completion_tokens = getattr(usage, "completion_tokens", None) or len(llm_content or "") // 4
+        LLM_TOKENS.labels(kind, "prompt").inc(prompt_tokens)
+        LLM_TOKENS.labels(kind, "completion").inc(completion_tokens)
+        if llm_content and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("LLM %s response (%d chars): %.200s", kind, len(llm_content), llm_content)
+
+    @staticmethod
+    def _format(json_mode: bool) -> dict:
+        return {"response_format": {"type": "json_object"}} if json_mode else {}
+
+    async def _backoff(self, attempt: int, error: Exception):
+        self.retries += 1
+        delay = self.backoff_base * (2 ** attempt) * (0.5 + random.random())
+        logger.warning(f"LLM request failed ({error}); retrying in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+    async def _create(self, kind: str, messages: List[dict], json_mode: bool, temperature: float, top_p: float) -> str:
+        prompt = "".join(m["content"] for m in messages)
+        started = time.perf_counter()
+        outcome, llm_content, usage = "error", None, None
+        try:
+            async with self.semaphore:
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        self.requests += 1
+                        response = await self.client.chat.completions.create(
+                            model=self.model,
+                            messages=messages,
+                            temperature=temperature,
+                            top_p=top_p,
+                            **self._format(json_mode),
+                        )
+                        # A refusal or an empty choice has no content; callers get "" so
+                        # JSON callers see a ValueError and ask for a repair
+                        choice = response.choices[0] if response.choices else None
+                        llm_content = (choice.message.content if choice else None) or ""
+                        usage = response.usage
+                        break
+                    except RETRYABLE_ERRORS as e:
+                        if attempt == self.max_retries:
+                            raise
+                        await self._backoff(attempt, e)
+            outcome = self._outcome(llm_content, json_mode)
+            return llm_content
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            logger.warning(f"LLM {kind} request failed: {e!r}")
+            raise
+        finally:
+            self._record(kind, started, outcome, prompt, llm_content, usage)
+
+    async def close(self):
+        await self.client.close()
+
+
+_client: Optional[LLMClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_llm_client() -> LLMClient:
+    """
+    Return the shared client, creating it on first use. The connection pool
+    belongs to the running event loop, so a new loop gets a new client.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = LLMClient(cache=get_response_cache())
+        _client_loop = loop
+    return _client
+
+
+def set_llm_client(client: LLMClient):
+    """Install `client` as the shared client for the running event loop."""
+    global _client, _client_loop
+    _client = client
+    _client_loop = asyncio.get_running_loop()
+
+
+async def close_llm_client():
+    global _client, _client_loop
+    if _client is not None:
+        await _client.close()
+    _client = None
+    _client_loop = None
@@ -1,53 +1,74 @@
 # main.py
 
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.routing import APIRouter
+import asyncio
 import logging
 import json
 import os
-import threading
-import asyncio
-import pyaudio
-from datetime import datetime
-from deepgram import DeepgramClient, LiveTranscriptionEvents, LiveOptions
-from starlette.websockets import WebSocketState
-from typing import Optional, Set, List
-
-# Import the analysis functions & model
-from analysis import TranscriptEntry, get_meeting_objective, get_speaker_sentiment
+from pydantic import BaseModel
+from typing import Optional
+
+from analysis import get_analysis_executor
+from audio_sources import PushSource, make_audio_source
+from broadcaster import BROADCAST_COMPRESS
+from bus import PROCESS_ROLES, make_message_bus
+from context_index import CONTEXT_TOP_K
+from demo_replay import DemoPlayer, DemoTimeline
+from llm_cache import get_response_cache
+from llm_client import close_llm_client
+from metrics import REGISTRY, TRACE_SEGMENTS, TRACER, render as render_metrics
+from session_log import RECORD_SESSIONS
+from sessions import DEFAULT_SESSION_ID, Session, SessionLimitError, SessionManager
+from supabase_client import (
+    CONTEXT_SYNC_INTERVAL,
+    SUPABASE_CONFIGURED,
+    check_schema,
+    make_context_index,
+    make_persister,
+    sync_context_index,
+)
+from transcription import make_backend
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 demo_router = APIRouter(prefix="/demo", tags=["demo"])
 realtime_router = APIRouter(prefix="/real-time", tags=["real-time"])
-
-# Environment variables
-DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
-
-# PyAudio settings
-CHUNK = 1024
-RATE = 16000
-CHANNELS = 1
-FORMAT = pyaudio.paInt16
-
-# In-memory transcript storage
-TRANSCRIPT_MEMORY: List[TranscriptEntry] = []
-
-# Global state
-connected_clients: Set[WebSocket] = set()
-stop_event = threading.Event()
-audio_thread = None
-loop = None
-
-# Track partial transcripts so we can broadcast new text without repeating
-speaker_partial = {}  # Maps speaker label -> last partial transcript text
-
-# Cache for objective to prevent too frequent LLM calls
-last_objective_update = None
-cached_objective = None
-OBJECTIVE_CACHE_DURATION = 5  # seconds
+sessions_router = APIRouter(prefix="/sessions", tags=["sessions"])
+
+# Transcripts and analysis are written to Supabase behind the live pipeline
+persister = make_persister()
+# Past snippets, searchable locally for fact-check context (None unless
+# persistence is on or CONTEXT_INDEX_DIR is set)
+context_index = make_context_index()
+# Sessions publish through the bus; a shared one lets other processes serve them too
+bus = make_message_bus()
+# Every meeting's recording state lives in its own Session
+session_manager = SessionManager(persister=persister, context_index=context_index, bus=bus)
+
+# Defaults for /real-time/start; the request body can override them per session
+AUDIO_SOURCE = os.getenv("AUDIO_SOURCE", "microphone")  # microphone | file | silence | websocket
+TRANSCRIPTION_BACKEND = os.getenv("TRANSCRIPTION_BACKEND", "deepgram")  # deepgram | fake
+
+class StartOptions(BaseModel):
+    """
+    Where a recording takes its audio from and how it is transcribed.
+    `path` and `script` are relative to AUDIO_FILE_DIR; `speed` replays file
+    and silence sources at that multiple of real time (0 = unthrottled).
+    `record` logs the recording's audio and transcription events for replay
+    (default: RECORD_SESSIONS).
+    """
+    source: str = AUDIO_SOURCE
+    path: Optional[str] = None
+    speed: float = 1.0
+    duration: float = 60.0
+    backend: str = TRANSCRIPTION_BACKEND
+    script: Optional[str] = None
+    repeat: bool = False
+    record: bool = RECORD_SESSIONS
 
 app = FastAPI()
 
@@ -72,240 +93,351 @@ try:
     logger.info(f"Loaded {len(DEMO_CONVERSATION)} demo messages")
 except Exception as e:
     logger.error(f"Error loading demo conversation: {e}")
+# Indexed and encoded once; every demo viewer replays the same frames
+demo_timeline = DemoTimeline(DEMO_CONVERSATION)
 
 @demo_router.get("/conversation")
 async def get_demo_conversation():
     if not DEMO_CONVERSATION:
         raise HTTPException(status_code=500, detail="No demo conversation data available")
-    return DEMO_CONVERSATION
+    return Response(content=demo_timeline.conversation_json, media_type="application/json")
 
-@demo_router.get("/transcript-memory")
-async def get_transcript_memory():
+@demo_router.websocket("/ws")
+async def demo_websocket(websocket: WebSocket, speed: float = 1.0, position: float = 0.0, loop: bool = False):
     """
-    Returns the current list of transcript entries from in-memory storage.
+    Replay the demo conversation in the /real-time/ws message format, at
+    the recorded timestamp spacing times `speed`, starting `position`
+    seconds in. Viewers can seek, change speed and pause (see DemoPlayer).
     """
-    return TRANSCRIPT_MEMORY
+    await websocket.accept()
+    if not len(demo_timeline):
+        await websocket.close(code=1011, reason="No demo conversation data available")
+        return
+    await DemoPlayer(demo_timeline, websocket, speed, position, loop).run()
 
 # -------------------
-# Objective Endpoint
+# Session Helpers
 # -------------------
-@demo_router.get("/objective")
-async def get_objective():
+def get_session(session_id: str) -> Session:
+    session = session_manager.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Unknown session {session_id}")
+    return session
+
+def get_or_create_session(session_id: str) -> Session:
+    try:
+        return session_manager.get_or_create(session_id)
+    except SessionLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+def require_role(role: str):
+    """Refuse a request for work this process was not started to do (PROCESS_ROLES)."""
+    if role not in PROCESS_ROLES:
+        raise HTTPException(status_code=503, detail=f"This process does not run {role}")
+
+def transcript_response(session: Session, request: Request, since: int) -> Response:
     """
-    Return the LLM's textual response for the conversation objective.
-    Uses caching to prevent too frequent LLM calls.
+    Returns the session's transcript entries with a sequence number greater
+    than `since` (all of them by default). Pollers pass the last `seq` they
+    saw to receive only new entries, and get a 304 when the transcript hasn't
+    changed since their last ETag.
     """
-    global last_objective_update, cached_objective
-    current_time = datetime.utcnow()
-    
-    # If we have a cached result that's still fresh, return it
-    if (last_objective_update and cached_objective and 
-        (current_time - last_objective_update).total_seconds() < OBJECTIVE_CACHE_DURATION):
-        return {"objective_response": cached_objective}
-    
-    # If no transcripts, return default message
-    if not TRANSCRIPT_MEMORY:
-        return {"objective_response": json.dumps([{"Objective": "Real-time transcription with analysis"}])}
-    
-    # Otherwise, get fresh objective
-    try:
-        llm_response = get_meeting_objective(TRANSCRIPT_MEMORY)
-        # Validate JSON format
-        json.loads(llm_response)  # This will raise an exception if invalid JSON
-        cached_objective = llm_response
-        last_objective_update = current_time
-        return {"objective_response": llm_response}
-    except Exception as e:
-        logger.error(f"Error getting objective: {e}")
-        # Return last cached objective if available, otherwise default
-        if cached_objective:
-            return {"objective_response": cached_objective}
-        return {"objective_response": json.dumps([{"Objective": "Real-time transcription with analysis"}])}
+    store = session.transcript_store
+    etag = store.etag
+    headers = {"ETag": etag, "X-First-Seq": str(store.first_seq)}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=json.dumps(store.since(since)),
+        media_type="application/json",
+        headers=headers,
+    )
+
+def sentiment_response(session: Session) -> dict:
+    """
+    Return the cached per-speaker sentiment, in the same JSON format the LLM
+    produces. The scores are kept up to date by the analysis scheduler, so
+    this does not call the LLM.
+    """
+    return {"sentiment_response": json.dumps(session.sentiment.snapshot())}
 
 # -------------------
-# Sentiment Endpoint
+# Demo Endpoints (default session)
 # -------------------
+@demo_router.get("/transcript-memory")
+async def get_transcript_memory(request: Request, since: int = 0):
+    return transcript_response(get_or_create_session(DEFAULT_SESSION_ID), request, since)
+
+@demo_router.get("/objective")
+async def get_objective():
+    session = get_or_create_session(DEFAULT_SESSION_ID)
+    return {"objective_response": await session.get_objective()}
+
 @demo_router.get("/sentiment")
 async def get_sentiment():
+    return sentiment_response(get_or_create_session(DEFAULT_SESSION_ID))
+
+@demo_router.get("/stats")
+async def get_stats():
+    """Talk time, turn-taking and info density per speaker, computed without the LLM."""
+    return get_or_create_session(DEFAULT_SESSION_ID).stats.summary()
+
+# -------------------
+# Session Routes
+# -------------------
+@sessions_router.get("")
+async def list_sessions():
+    return [session.info() for session in session_manager.sessions.values()]
+
+@sessions_router.post("")
+async def create_session(session_id: Optional[str] = None):
+    try:
+        session = session_manager.create(session_id)
+    except SessionLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return session.info()
+
+@sessions_router.get("/{session_id}")
+async def get_session_info(session_id: str):
+    return get_session(session_id).info()
+
+@sessions_router.delete("/{session_id}")
+async def delete_session(session_id: str):
+    if not await session_manager.remove(session_id):
+        raise HTTPException(status_code=404, detail=f"Unknown session {session_id}")
+    return {"message": "Session removed"}
+
+@sessions_router.get("/{session_id}/transcript")
+async def get_session_transcript(session_id: str, request: Request, since: int = 0):
+    return transcript_response(get_session(session_id), request, since)
+
+@sessions_router.get("/{session_id}/transcript/range")
+async def get_session_transcript_range(
+    session_id: str,
+    from_seq: int = 0,
+    to_seq: Optional[int] = None,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+):
     """
-    Return the LLM's textual response for the per-speaker sentiment analysis.
+    Entries by sequence number (from_seq..to_seq, inclusive) or by audio
+    time (those overlapping start..end seconds). Older entries are read
+    back from the compressed spill chunks that cover the range.
     """
-    sentiment_response = get_speaker_sentiment(TRANSCRIPT_MEMORY)
-    return {"sentiment_response": sentiment_response}
+    store = get_session(session_id).transcript_store
+    if start is not None or end is not None:
+        entries = store.between(start or 0.0, float("inf") if end is None else end)
+        return [entry for entry in entries if entry["seq"] >= from_seq and (to_seq is None or entry["seq"] <= to_seq)]
+    return list(store.read(from_seq, to_seq))
+
+@sessions_router.get("/{session_id}/transcript/export")
+async def export_session_transcript(session_id: str):
+    """The full transcript as JSON lines, streamed without loading it into memory."""
+    store = get_session(session_id).transcript_store
+    return StreamingResponse(store.export(), media_type="application/x-ndjson")
+
+@sessions_router.get("/{session_id}/objective")
+async def get_session_objective(session_id: str):
+    return {"objective_response": await get_session(session_id).get_objective()}
+
+@sessions_router.get("/{session_id}/sentiment")
+async def get_session_sentiment(session_id: str):
+    return sentiment_response(get_session(session_id))
+
+@sessions_router.get("/{session_id}/stats")
+async def get_session_stats(session_id: str):
+    return get_session(session_id).stats.summary()
 
 # -------------------
-# Broadcasting Helper
+# Context Routes
 # -------------------
-async def broadcast_transcript(data: dict):
-    payload = json.dumps(data)
-    for ws in list(connected_clients):
-        if ws.client_state == WebSocketState.CONNECTED:
-            try:
-                await ws.send_text(payload)
-            except Exception as e:
-                logger.error(f"Error broadcasting to client: {e}")
+@app.get("/context/search")
+async def search_context(q: str, k: int = CONTEXT_TOP_K):
+    if context_index is None:
+        raise HTTPException(status_code=503, detail="The context index is off; set PERSIST_ENABLED or CONTEXT_INDEX_DIR")
+    return {"results": context_index.search(q, k), "index": context_index.stats()}
 
 # -------------------
-# Deepgram Callback
+# Metrics
 # -------------------
-def on_transcript(connection, result, **kwargs):
-    alt = result.channel.alternatives[0]
-    transcript_text = alt.transcript
-    if not transcript_text:
-        return
-
-    # Identify speaker if diarization is enabled
-    speaker_label = "Unknown"
-    if alt.words and alt.words[0].speaker is not None:
-        # Add 1 to speaker index to start from 1 instead of 0
-        speaker_num = alt.words[0].speaker + 1
-        speaker_label = f"Speaker {speaker_num}"
-
-    old_partial = speaker_partial.get(speaker_label, "")
-    i = 0
-    min_len = min(len(old_partial), len(transcript_text))
-    while i < min_len and old_partial[i] == transcript_text[i]:
-        i += 1
-    new_str = transcript_text[i:].strip()
-
-    if new_str:
-        transcript_data = {
-            "speaker": speaker_label,
-            "name": speaker_label,
-            "transcript": new_str,
-            "timestamp": datetime.utcnow().isoformat(),
-            "analysis": {
-                "info_density": 0.5,
-                "sentiment": 0.0,
-                "controversial": False,
-                "fallacies": []
-            }
-        }
-
-        # --- Store new snippet ---
-        TRANSCRIPT_MEMORY.append(
-            TranscriptEntry(speaker=speaker_label, transcript=new_str)
-        )
-
-        # --- Call LLM for objective ---
-        llm_objective = get_meeting_objective(TRANSCRIPT_MEMORY)
-        logger.info(f"LLM objective response: {llm_objective}")
-
-        # --- Call LLM for sentiment ---
-        llm_sentiment = get_speaker_sentiment(TRANSCRIPT_MEMORY)
-        logger.info(f"LLM speaker sentiment response: {llm_sentiment}")
-        
-        # Parse and update sentiment scores
-        try:
-            sentiment_data = json.loads(llm_sentiment)
-            if isinstance(sentiment_data, list):
-                for speaker_sentiment in sentiment_data:
-                    if speaker_sentiment["Speaker"] == speaker_label:
-                        transcript_data["analysis"]["sentiment"] = speaker_sentiment["Sentiment"]
-                        break
-        except Exception as e:
-            logger.error(f"Error parsing sentiment response: {e}")
-
-        # --- Broadcast only the new transcript ---
-        global loop
-        if loop and loop.is_running():
-            loop.call_soon_threadsafe(
-                lambda: asyncio.create_task(broadcast_transcript(transcript_data))
-            )
-
-    speaker_partial[speaker_label] = transcript_text
+def collect_metrics():
+    """Gauges and counters read from the live sessions and shared components at scrape time."""
+    sessions = list(session_manager.sessions.values())
+    yield "sessions", "gauge", "Live sessions", [({}, len(sessions))]
+    yield "sessions_recording", "gauge", "Sessions with a running audio worker", [
+        ({}, sum(session.recording for session in sessions))
+    ]
+    broadcasts = [({"session_id": session.id}, session.broadcaster.stats()) for session in sessions]
+    yield "websocket_clients", "gauge", "Connected WebSocket subscribers", [
+        (labels, stats["subscribers"]) for labels, stats in broadcasts
+    ]
+    yield "broadcast_queue_depth_max", "gauge", "Deepest subscriber frame queue", [
+        (labels, stats["max_queue_depth"]) for labels, stats in broadcasts
+    ]
+    yield "broadcast_dropped_messages_total", "counter", "Messages shed by the slow-consumer policy", [
+        (labels, stats["dropped"]) for labels, stats in broadcasts
+    ]
+    yield "sessions_analysing", "gauge", "Sessions whose analysis lease this process holds", [
+        ({}, sum(session.analysing for session in sessions))
+    ]
+    bus_stats = bus.stats()
+    yield "bus_published_total", "counter", "Events written to the message bus", [({}, bus_stats["published"])]
+    if bus.shared:
+        yield "bus_delivered_total", "counter", "Events read from the message bus", [({}, bus_stats["delivered"])]
+        yield "bus_queued_events", "gauge", "Events waiting to be written to the message bus", [
+            ({}, bus_stats["queued"])
+        ]
+        yield "bus_errors_total", "counter", "Failed message bus reads and writes", [({}, bus_stats["errors"])]
+    analysis = [
+        ({"session_id": session.id, "kind": kind}, stats)
+        for session in sessions
+        for kind, stats in session.scheduler.controller.stats().items()
+    ]
+    yield "analysis_pending_words", "gauge", "Words not yet covered by an analysis run", [
+        (labels, stats["pending_words"]) for labels, stats in analysis
+    ]
+    yield "analysis_calls_total", "counter", "Analysis runs started", [
+        (labels, stats["calls"]) for labels, stats in analysis
+    ]
+    yield "analysis_calls_saved_total", "counter", "Segments that did not need an analysis run of their own", [
+        (labels, stats["calls_saved"]) for labels, stats in analysis
+    ]
+    executor = get_analysis_executor().stats()
+    yield "segment_analysis_running", "gauge", "Segment analyzer LLM requests in flight", [({}, executor["running"])]
+    yield "segment_analysis_waiting", "gauge", "Segment analyzer runs waiting for the shared budget", [
+        ({}, executor["waiting"])
+    ]
+    cache = get_response_cache().stats()
+    yield "llm_cache_entries", "gauge", "LLM responses held in memory", [({}, cache["entries"])]
+    yield "llm_cache_hit_ratio", "gauge", "LLM response cache hits per lookup", [({}, cache["hit_rate"])]
+    if persister is not None:
+        stats = persister.stats()
+        yield "persister_pending_rows", "gauge", "Rows spooled and not yet written to Supabase", [({}, stats["pending"])]
+        yield "persister_dead_lettered_total", "counter", "Rows Supabase rejected permanently", [
+            ({}, stats["dead_lettered"])
+        ]
+    if context_index is not None:
+        yield "context_index_snippets", "gauge", "Snippets in the local context index", [
+            ({}, context_index.stats()["snippets"])
+        ]
+
+REGISTRY.add_collector(collect_metrics)
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/traces")
+async def get_traces(limit: int = 50):
+    """Recently completed segment traces, newest first (TRACE_SEGMENTS=true)."""
+    return {"enabled": TRACE_SEGMENTS, "traces": TRACER.recent(limit)}
 
 # -------------------
-# Audio Thread
+# Real-time Routes
 # -------------------
-def audio_worker():
-    logger.info("Audio worker starting...")
-
-    dg = DeepgramClient(DEEPGRAM_API_KEY)
-    dg_connection = dg.listen.websocket.v("1")
-    dg_connection.on(LiveTranscriptionEvents.Transcript, on_transcript)
-
-    options = LiveOptions(
-        model="enhanced-meeting",
-        encoding="linear16",
-        sample_rate=RATE,
-        channels=CHANNELS,
-        punctuate=True,
-        interim_results=True,
-        diarize=True,
-    )
-
-    if not dg_connection.start(options):
-        logger.error("Failed to start Deepgram connection")
+async def start_session_recording(session_id: str, options: Optional[StartOptions]):
+    require_role("ingest")
+    options = options or StartOptions()
+    session = get_or_create_session(session_id)
+    if session.recording:
+        return {"message": "Already recording", "session_id": session_id}
+    try:
+        source = make_audio_source(options.source, options.path, options.speed, options.duration)
+        backend = make_backend(options.backend, options.script, options.repeat)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not session.start_recording(source, backend, record=options.record):
+        return {"message": "Already recording", "session_id": session_id}
+    return {"message": "Recording started", "session_id": session_id}
+
+async def stop_session_recording(session_id: str):
+    session = session_manager.get(session_id)
+    if session is not None and await session.stop_recording():
+        return {"message": "Recording stopped", "session_id": session_id}
+    if session is not None and bus.shared:
+        # The audio worker may be running in another process
+        session.request_stop()
+        return {"message": "Stop requested", "session_id": session_id}
+    return {"message": "Not currently recording", "session_id": session_id}
+
+async def session_websocket(websocket: WebSocket, session_id: str):
+    await websocket.accept()
+    if "fanout" not in PROCESS_ROLES:
+        await websocket.close(code=1013, reason="This process does not serve subscribers")
+        return
+    try:
+        session = session_manager.get_or_create(session_id)
+        session.subscribe(websocket)
+    except SessionLimitError as e:
+        logger.warning(f"Rejecting client: {e}")
+        await websocket.close(code=1013, reason=str(e))
         return
+    logger.info(f"Client connected to session {session_id}. Total clients: {len(session.subscribers)}")
 
-    p = pyaudio.PyAudio()
-    stream = p.open(
-        format=FORMAT,
-        channels=CHANNELS,
-        rate=RATE,
-        input=True,
-        frames_per_buffer=CHUNK
-    )
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        logger.info("Client disconnected")
+    finally:
+        session.unsubscribe(websocket)
+        logger.info(f"Client removed from session {session_id}. Total clients: {len(session.subscribers)}")
 
-    logger.info("Recording started")
+async def session_audio(websocket: WebSocket, session_id: str, backend: str):
+    """
+    Ingest audio pushed by a client (e.g. a browser) as binary linear16
+    frames, starting the session's recording on first connect.
+    """
+    await websocket.accept()
+    if "ingest" not in PROCESS_ROLES:
+        await websocket.close(code=1013, reason="This process does not ingest audio")
+        return
+    try:
+        session = session_manager.get_or_create(session_id)
+        if not isinstance(session.audio_source, PushSource) or not session.recording:
+            await session.stop_recording()
+            session.start_recording(PushSource(), make_backend(backend))
+    except (SessionLimitError, ValueError) as e:
+        await websocket.close(code=1013, reason=str(e))
+        return
+    source = session.audio_source
+    logger.info(f"Audio client connected to session {session_id}")
 
     try:
-        while not stop_event.is_set():
-            data = stream.read(CHUNK, exception_on_overflow=False)
-            dg_connection.send(data)
-    except Exception as e:
-        logger.error(f"Audio worker error: {e}")
+        while True:
+            source.push(await websocket.receive_bytes())
+    except WebSocketDisconnect:
+        logger.info("Audio client disconnected")
     finally:
-        logger.info("Cleaning up audio worker...")
-        dg_connection.finish()
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
+        source.end()
 
-# -------------------
-# Real-time Routes
-# -------------------
 @realtime_router.post("/start")
-async def start_recording():
-    global audio_thread, speaker_partial, TRANSCRIPT_MEMORY
-    if audio_thread and audio_thread.is_alive():
-        return {"message": "Already recording"}
-
-    # Reset partial transcripts & store
-    speaker_partial.clear()
-    TRANSCRIPT_MEMORY.clear()
-
-    stop_event.clear()
-    audio_thread = threading.Thread(target=audio_worker, daemon=True)
-    audio_thread.start()
-    return {"message": "Recording started"}
+async def start_recording(options: Optional[StartOptions] = None):
+    return await start_session_recording(DEFAULT_SESSION_ID, options)
 
 @realtime_router.post("/stop")
 async def stop_recording():
-    global audio_thread
-    if not audio_thread or not audio_thread.is_alive():
-        return {"message": "Not currently recording"}
-
-    stop_event.set()
-    audio_thread.join()
-    audio_thread = None
-    return {"message": "Recording stopped"}
+    return await stop_session_recording(DEFAULT_SESSION_ID)
 
 @realtime_router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    connected_clients.add(websocket)
-    logger.info(f"Client connected. Total clients: {len(connected_clients)}")
+    await session_websocket(websocket, DEFAULT_SESSION_ID)
 
-    try:
-        while True:
-            await websocket.receive_text()
-    except WebSocketDisconnect:
-        logger.info("Client disconnected")
-    finally:
-        connected_clients.remove(websocket)
-        logger.info(f"Client removed. Total clients: {len(connected_clients)}")
+@realtime_router.post("/{session_id}/start")
+async def start_session(session_id: str, options: Optional[StartOptions] = None):
+    return await start_session_recording(session_id, options)
+
+@realtime_router.post("/{session_id}/stop")
+async def stop_session(session_id: str):
+    return await stop_session_recording(session_id)
+
+@realtime_router.websocket("/{session_id}/ws")
+async def session_websocket_endpoint(websocket: WebSocket, session_id: str):
+    await session_websocket(websocket, session_id)
+
+@realtime_router.websocket("/{session_id}/audio")
+async def session_audio_endpoint(websocket: WebSocket, session_id: str, backend: str = TRANSCRIPTION_BACKEND):
+    await session_audio(websocket, session_id, backend)
 
 # -------------------
 # Health Check
@@ -319,13 +451,70 @@ async def health_check():
 # -------------------
 app.include_router(demo_router)
 app.include_router(realtime_router)
+app.include_router(sessions_router)
+
+# Startup work that keeps running in the background; cancelled at shutdown
+background_tasks = set()
 
 @app.on_event("startup")
 async def startup_event():
-    global loop
+    bus.start()
+    session_manager.start()
+    if persister is not None:
+        background_tasks.add(asyncio.get_running_loop().create_task(start_persister()))
+    # Catch up on snippets other processes stored, without delaying startup,
+    # and keep catching up while the server runs
+    if context_index is not None and SUPABASE_CONFIGURED:
+        background_tasks.add(asyncio.get_running_loop().create_task(keep_context_index_synced()))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in background_tasks:
+        task.cancel()
+    await session_manager.close()
+    await bus.close()
+    await close_llm_client()
+    await get_response_cache().flush()
+    if persister is not None:
+        await persister.close()
+    if context_index is not None:
+        context_index.close()
+
+async def start_persister():
+    """
+    Start sending spooled rows once Supabase has the columns they need. Until
+    the tables are migrated, rows stay in the spool rather than being rejected
+    and dead-lettered.
+    """
+    try:
+        problems = await asyncio.get_running_loop().run_in_executor(None, check_schema)
+    except Exception as e:
+        logger.warning(f"Could not check the Supabase schema ({e}); persisting anyway")
+        problems = []
+    if problems:
+        logger.error(
+            "Supabase tables lack the persisted columns (see Persistence in the README); "
+            f"rows stay spooled until they are migrated and the server restarts: {'; '.join(problems)}"
+        )
+        return
+    persister.start()
+
+async def keep_context_index_synced():
     loop = asyncio.get_running_loop()
+    while True:
+        await loop.run_in_executor(None, sync_context_index_quietly)
+        if CONTEXT_SYNC_INTERVAL <= 0:
+            return
+        await asyncio.sleep(CONTEXT_SYNC_INTERVAL)
+
+def sync_context_index_quietly():
+    try:
+        sync_context_index()
+    except Exception as e:
+        logger.warning(f"Could not sync the context index: {e}")
 
 if __name__ == "__main__":
     import uvicorn
     logger.info("Starting server at http://localhost:8000")
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
+    # permessage-deflate shrinks the JSON frames sent to subscribers at some CPU cost
+    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info", ws_per_message_deflate=BROADCAST_COMPRESS)
@@ -0,0 +1,314 @@
+# metrics.py
+#
+# Process-wide pipeline metrics in the Prometheus text exposition format,
+# served at /metrics, plus optional per-segment tracing. Dependency-free:
+# counters and histograms are a few lines each, gauges and values that
+# already live elsewhere (queue depths, cache stats) are read by collectors
+# at scrape time instead of being mirrored on the hot path.
+
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Record per-segment stage timestamps and tag transcript messages with a trace_id
+TRACE_SEGMENTS = os.getenv("TRACE_SEGMENTS", "false").lower() in ("1", "true", "yes")
+# Completed traces slower than this end to end are logged with their breakdown
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "2000"))
+# Completed traces kept for /traces
+TRACE_BUFFER = 1000
+
+# Latency buckets in seconds: pipeline stages are milliseconds, LLM calls seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# (labels, value) samples of one metric family
+Samples = List[Tuple[Dict[str, str], float]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Registry:
+    """Metric families and scrape-time collectors, rendered by `render`."""
+
+    def __init__(self):
+        self.metrics: List["Metric"] = []
+        self.collectors: List[Callable[[], Iterable[Tuple[str, str, str, Samples]]]] = []
+
+    def register(self, metric: "Metric"):
+        self.metrics.append(metric)
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, Samples]]]):
+        """`collector()` yields (name, type, help, samples) for values read at scrape time."""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                logger.error(f"Metrics collector failed: {e}")
+                continue
+            for name, kind, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    """A metric family; `labels(...)` returns the child for one label combination."""
+
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), registry: Registry = REGISTRY):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.children: Dict[Tuple[str, ...], object] = {}
+        registry.register(self)
+
+    def labels(self, *values, **labels):
+        key = tuple(str(v) for v in values) or tuple(str(labels[name]) for name in self.labelnames)
+        child = self.children.get(key)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in list(self.children.items()):
+            lines.extend(self._render_child(dict(zip(self.labelnames, key)), child))
+        return lines
+
+    def _render_child(self, labels: Dict[str, str], child) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {_format_value(child.value)}"]
+
+
+class _Value:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self.lock:
+            self.value += amount
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count", "lock")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS, registry: Registry = REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _render_child(self, labels: Dict[str, str], child: _HistogramValue) -> List[str]:
+        with child.lock:
+            counts, total, count = list(child.counts), child.sum, child.count
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+# -------------------
+# Pipeline metrics
+# -------------------
+AUDIO_CALLBACK_LATENCY = Histogram(
+    "audio_callback_latency_seconds",
+    "Time from sending the end of a result's audio to the transcription backend to its callback",
+    ["result"],
+)
+SEGMENT_BROADCAST_LATENCY = Histogram(
+    "segment_broadcast_latency_seconds",
+    "Time from a transcript message being produced to its frame being sent to a client",
+    ["type"],
+)
+SEGMENTS = Counter("transcript_segments_total", "Finalized transcript segments", ["complete"])
+AUDIO_BYTES = Counter(
+    "audio_bytes_total",
+    "Audio bytes captured, sent to the transcription backend, and lost to capture overruns",
+    ["stage"],
+)
+AUDIO_SEND_DELAY = Histogram(
+    "audio_send_delay_seconds",
+    "Time from capturing the first byte of a send to sending it (batching plus ring buffer wait)",
+)
+LLM_REQUEST_DURATION = Histogram(
+    "llm_request_duration_seconds",
+    "LLM request latency per analysis kind and outcome: ok, invalid_json, error, cancelled (streamed: until the last chunk)",
+    ["kind", "outcome"],
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "LLM tokens per analysis kind (estimated at 4 characters per token when the API reports no usage)",
+    ["kind", "direction"],
+)
+LLM_CACHE_LOOKUPS = Counter("llm_cache_lookups_total", "LLM response cache lookups per analysis kind", ["kind", "result"])
+SEGMENT_ANALYSES = Counter(
+    "segment_analyses_total",
+    "Segment analyzer runs per analyzer and outcome (ok, error, skipped_short, skipped_late)",
+    ["analyzer", "outcome"],
+)
+
+
+# -------------------
+# Tracing
+# -------------------
+class AudioClock:
+    """
+    Maps audio time (seconds into the captured audio) to the wall-clock
+    time that audio was handed to the transcription backend, so a result's
+    latency can be measured from when its last audio left.
+    """
+
+    def __init__(self, bytes_per_second: float):
+        self.bytes_per_second = bytes_per_second
+        self.lock = threading.Lock()
+        self.sent_seconds = 0.0
+        self.offsets: List[float] = []
+        self.times: List[float] = []
+
+    def sent(self, nbytes: int, end: Optional[float] = None):
+        """
+        `nbytes` of audio were handed to the backend. `end` is the audio time
+        they end at, when silence before them was withheld.
+        """
+        now = time.perf_counter()
+        with self.lock:
+            self.sent_seconds = self.sent_seconds + nbytes / self.bytes_per_second if end is None else end
+            self.offsets.append(self.sent_seconds)
+            self.times.append(now)
+            if len(self.offsets) > 8192:
+                del self.offsets[:4096], self.times[:4096]
+
+    def sent_at(self, offset: float) -> Optional[float]:
+        """When the audio at stream time `offset` was sent, or None if unknown."""
+        with self.lock:
+            i = bisect.bisect_left(self.offsets, offset)
+            if i == len(self.offsets):
+                return None
+            return self.times[i]
+
+
+class Tracer:
+    """
+    Stage timestamps of traced segments: audio sent, backend callback,
+    segment published, first frame sent. Completed traces are kept in a
+    ring buffer for /traces, and slow ones are logged with their breakdown.
+    """
+
+    STAGES = ("audio_sent", "callback", "published", "broadcast")
+
+    def __init__(self, slow_ms: float = TRACE_SLOW_MS, size: int = TRACE_BUFFER):
+        self.slow = slow_ms / 1000
+        self.lock = threading.Lock()
+        self.open: Dict[str, dict] = {}
+        self.completed: Deque[dict] = deque(maxlen=size)
+
+    def start(self, trace_id: str, **fields):
+        with self.lock:
+            self.open[trace_id] = fields
+            if len(self.open) > 10 * self.completed.maxlen:
+                # Segments nobody was subscribed to never reach "broadcast"
+                for stale in list(self.open)[: len(self.open) // 2]:
+                    del self.open[stale]
+
+    def finish(self, trace_id: str, at: float):
+        with self.lock:
+            trace = self.open.pop(trace_id, None)
+        if trace is None:
+            return
+        trace["broadcast"] = at
+        stamps = [(stage, trace.get(stage)) for stage in self.STAGES if trace.get(stage) is not None]
+        record = {key: value for key, value in trace.items() if key not in self.STAGES}
+        record["trace_id"] = trace_id
+        record["stages_ms"] = {
+            f"{a}->{b}": round((tb - ta) * 1000, 2) for (a, ta), (b, tb) in zip(stamps, stamps[1:])
+        }
+        record["total_ms"] = round((stamps[-1][1] - stamps[0][1]) * 1000, 2)
+        with self.lock:
+            self.completed.append(record)
+        if record["total_ms"] > self.slow * 1000:
+            logger.warning(f"Slow segment {trace_id}: {record['stages_ms']}")
+
+    def recent(self, limit: int = 50) -> List[dict]:
+        with self.lock:
+            return list(self.completed)[-limit:][::-1]
+
+
+TRACER = Tracer()
+
+
+def render() -> str:
+    return REGISTRY.render()
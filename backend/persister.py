@@ -0,0 +1,293 @@
+# persister.py
+
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Rows per bulk insert, and the longest a row waits before a flush
+PERSIST_BATCH_SIZE = int(os.getenv("PERSIST_BATCH_SIZE", "100"))
+PERSIST_FLUSH_INTERVAL = float(os.getenv("PERSIST_FLUSH_INTERVAL", "1.0"))  # seconds
+# Local spool rows are written to before they are sent, so an outage or a
+# restart loses nothing
+PERSIST_SPOOL = os.getenv(
+    "PERSIST_SPOOL",
+    os.path.join(os.path.dirname(os.path.realpath(__file__)), "persist_spool.sqlite3"),
+)
+PERSIST_TIMEOUT = float(os.getenv("PERSIST_TIMEOUT", "10"))  # seconds per request
+PERSIST_BACKOFF_BASE = float(os.getenv("PERSIST_BACKOFF_BASE", "0.5"))  # seconds
+PERSIST_BACKOFF_MAX = float(os.getenv("PERSIST_BACKOFF_MAX", "30"))
+
+# Responses that will fail the same way on retry; those rows are set aside
+# in the spool's dead-letter table instead of blocking everything behind them
+PERMANENT_STATUS = {400, 401, 403, 404, 409, 413, 422}
+
+
+class WriteBehindPersister:
+    """
+    Buffers rows for PostgREST tables (e.g. Supabase) and writes them in
+    bulk inserts off the hot path.
+
+    `enqueue` can be called from any thread and only appends the row to an
+    in-memory queue. One background thread owns the local SQLite spool: it
+    commits whatever has queued up in one transaction, and does the reads
+    and deletes the flusher asks for, so spool I/O never runs on the event
+    loop. A flusher task on the loop sends the spooled rows per table,
+    `batch_size` at a time, once a batch is full or `flush_interval` has
+    passed, over one keep-alive HTTP connection pool. Rows leave the spool
+    only after the server accepted them; failed sends are retried with
+    jittered exponential backoff, so rows survive outages and restarts.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        headers: Optional[Dict[str, str]] = None,
+        spool_path: str = PERSIST_SPOOL,
+        batch_size: int = PERSIST_BATCH_SIZE,
+        flush_interval: float = PERSIST_FLUSH_INTERVAL,
+        timeout: float = PERSIST_TIMEOUT,
+        backoff_base: float = PERSIST_BACKOFF_BASE,
+        backoff_max: float = PERSIST_BACKOFF_MAX,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.headers = {
+            **(headers or {}),
+            "Content-Type": "application/json",
+            "Prefer": "return=minimal",
+        }
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.lock = threading.Lock()
+        # (table, encoded row) not yet committed to the spool
+        self.incoming: Deque[Tuple[str, str]] = deque()
+        self.commit_queued = False
+        self.pending = 0
+        self.db: Optional[sqlite3.Connection] = None
+        self.disk = ThreadPoolExecutor(max_workers=1, thread_name_prefix="persist-spool")
+        self.disk.submit(self._open, spool_path).result()
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.wakeup: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+        self.client: Optional[httpx.AsyncClient] = None
+
+        self.enqueued = 0
+        self.flushed = 0
+        self.batches = 0
+        self.retries = 0
+        self.dead_lettered = 0
+
+    def start(self):
+        """Start the flusher. Must be called from the event loop."""
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        self.client = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=4, max_keepalive_connections=4),
+        )
+        self.task = self.loop.create_task(self._run())
+        if self.pending:
+            logger.info(f"Resuming with {self.pending} spooled rows")
+
+    def enqueue(self, table: str, row: dict):
+        """Spool a row for `table`. Safe to call from any thread; never blocks on the network."""
+        self.enqueue_many(table, [row])
+
+    def enqueue_many(self, table: str, rows: List[dict]):
+        if not rows:
+            return
+        encoded = [(table, json.dumps(row, default=str)) for row in rows]
+        with self.lock:
+            self.incoming.extend(encoded)
+            self.pending += len(rows)
+            self.enqueued += len(rows)
+            full = self.pending >= self.batch_size
+            # One commit in the disk thread's queue at a time picks up every
+            # row queued until it runs
+            queue_commit = not self.commit_queued
+            self.commit_queued = True
+        if queue_commit:
+            self.disk.submit(self._commit)
+        if full:
+            self._wake()
+
+    def _wake(self):
+        if self.loop is None or self.wakeup is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self.wakeup.set()
+        elif self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+
+    async def _run(self):
+        failures = 0
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            try:
+                while await self.flush_batch():
+                    failures = 0
+                    # Full batches go out back to back; a partial one waits for the interval
+                    if self.pending < self.batch_size:
+                        break
+            except Exception as e:
+                failures += 1
+                self.retries += 1
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (failures - 1))
+                delay *= random.uniform(0.5, 1.0)
+                logger.warning(f"Persisting failed ({e}); {self.pending} rows spooled, retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _on_disk(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.disk, fn, *args)
+
+    # Disk thread only
+
+    def _open(self, spool_path: str):
+        self.db = sqlite3.connect(spool_path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS spool "
+            "(id INTEGER PRIMARY KEY AUTOINCREMENT, tbl TEXT NOT NULL, row TEXT NOT NULL)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS dead_letter "
+            "(id INTEGER PRIMARY KEY, tbl TEXT NOT NULL, row TEXT NOT NULL, error TEXT)"
+        )
+        self.db.commit()
+        self.pending = self.db.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def _commit(self):
+        with self.lock:
+            self.commit_queued = False
+            encoded = list(self.incoming)
+            self.incoming.clear()
+        if not encoded:
+            return
+        try:
+            self.db.executemany("INSERT INTO spool (tbl, row) VALUES (?, ?)", encoded)
+            self.db.commit()
+        except sqlite3.Error as e:
+            # Keep the rows queued in memory and try again with the next commit
+            logger.error(f"Error writing {len(encoded)} rows to the spool: {e}")
+            with self.lock:
+                self.incoming.extendleft(reversed(encoded))
+
+    def _next_batch(self) -> Tuple[Optional[str], List[Tuple[int, str]]]:
+        # Rows queued since the last commit go to the spool first, so the
+        # batch is the oldest rows
+        self._commit()
+        first = self.db.execute("SELECT tbl FROM spool ORDER BY id LIMIT 1").fetchone()
+        if first is None:
+            return None, []
+        rows = self.db.execute(
+            "SELECT id, row FROM spool WHERE tbl = ? ORDER BY id LIMIT ?",
+            (first[0], self.batch_size),
+        ).fetchall()
+        return first[0], rows
+
+    def _remove(self, ids: List[int], error: Optional[str] = None):
+        if error is not None:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO dead_letter (id, tbl, row, error) "
+                "SELECT id, tbl, row, ? FROM spool WHERE id = ?",
+                [(error, i) for i in ids],
+            )
+        self.db.executemany("DELETE FROM spool WHERE id = ?", [(i,) for i in ids])
+        self.db.commit()
+        with self.lock:
+            self.pending -= len(ids)
+
+    def _close_db(self):
+        self._commit()
+        self.db.close()
+
+    async def flush_batch(self) -> bool:
+        """
+        Send the oldest spooled rows of one table in a single insert.
+        Returns False when the spool is empty; raises if the send failed.
+        """
+        table, batch = await self._on_disk(self._next_batch)
+        if not batch:
+            return False
+        await self._send(table, batch)
+        return True
+
+    async def _send(self, table: str, batch: List[Tuple[int, str]]):
+        ids = [row_id for row_id, _ in batch]
+        body = "[" + ",".join(row for _, row in batch) + "]"
+        response = await self.client.post(f"{self.base_url}/{table}", content=body)
+        if response.status_code in PERMANENT_STATUS:
+            if len(batch) > 1:
+                # Bisect so one bad row doesn't take the rest of the batch with it
+                half = len(batch) // 2
+                await self._send(table, batch[:half])
+                await self._send(table, batch[half:])
+                return
+            error = f"{response.status_code}: {response.text[:500]}"
+            logger.error(f"Rejected row for {table}, moved to dead_letter ({error})")
+            await self._on_disk(self._remove, ids, error)
+            self.dead_lettered += len(ids)
+            return
+        if response.is_error:
+            raise RuntimeError(f"{table}: HTTP {response.status_code}")
+        await self._on_disk(self._remove, ids)
+        self.flushed += len(ids)
+        self.batches += 1
+
+    async def flush(self):
+        """Send everything spooled so far. Raises if the server can't be reached."""
+        while await self.flush_batch():
+            pass
+
+    async def close(self, timeout: float = 5.0):
+        """Stop the flusher after a last best-effort flush; unsent rows stay spooled."""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        if self.client is not None:
+            try:
+                await asyncio.wait_for(self.flush(), timeout)
+            except Exception as e:
+                logger.warning(f"Final flush failed ({e}); {self.pending} rows stay spooled")
+            await self.client.aclose()
+        # Rows still queued in memory are committed before the spool closes
+        await self._on_disk(self._close_db)
+        self.disk.shutdown()
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "retries": self.retries,
+            "dead_lettered": self.dead_lettered,
+        }
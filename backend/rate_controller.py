@@ -0,0 +1,271 @@
+# rate_controller.py
+
+import json
+import logging
+import os
+import time
+from collections import Counter, deque
+from dataclasses import asdict, dataclass, fields
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Per-kind overrides of the default trigger policies, as JSON or a path to a
+# JSON file, e.g. {"objective": {"min_new_words": 40, "max_staleness": 15}}
+ANALYSIS_POLICY = os.getenv("ANALYSIS_POLICY", "")
+
+# Weight of the newest call in the latency moving average
+LATENCY_ALPHA = 0.3
+# Staleness samples kept per kind for the percentiles in stats()
+STALENESS_SAMPLES = 1000
+
+
+@dataclass
+class TriggerPolicy:
+    """
+    When one analysis kind re-runs. A run is triggered by `min_new_words`
+    new words, by a speaker heard for the first time (`on_new_speaker`), or
+    by any unanalyzed change once it is `max_staleness` seconds old; runs are
+    at least `min_interval` seconds apart and limited to `budget_per_minute`
+    (token bucket holding up to `burst` runs). While the latency average is
+    above `latency_target`, or after errors, the word, staleness and
+    interval thresholds are stretched by a backoff factor of up to
+    `max_backoff`, which relaxes again as calls succeed quickly.
+    """
+    min_new_words: int = 30
+    on_new_speaker: bool = True
+    max_staleness: float = 15.0  # seconds
+    min_interval: float = 2.0  # seconds
+    budget_per_minute: float = 20.0
+    burst: int = 3
+    latency_target: float = 5.0  # seconds
+    max_backoff: float = 4.0
+
+
+DEFAULT_POLICIES: Dict[str, TriggerPolicy] = {
+    # The objective drifts slowly; re-running it on every sentence buys nothing
+    "objective": TriggerPolicy(min_new_words=60, on_new_speaker=False, max_staleness=20.0,
+                               min_interval=5.0, budget_per_minute=6.0, burst=2),
+    "sentiment": TriggerPolicy(min_new_words=20, on_new_speaker=True, max_staleness=8.0,
+                               min_interval=2.0, budget_per_minute=20.0, burst=3),
+}
+
+
+def load_policies(spec: str = ANALYSIS_POLICY) -> Dict[str, TriggerPolicy]:
+    """
+    The default policies with the overrides in `spec` (JSON, or a path to a
+    JSON file) applied. Raises ValueError for unknown kinds or settings.
+    """
+    policies = {kind: TriggerPolicy(**asdict(policy)) for kind, policy in DEFAULT_POLICIES.items()}
+    if not spec:
+        return policies
+    if not spec.lstrip().startswith("{"):
+        with open(spec, "r") as f:
+            spec = f.read()
+    names = {field.name for field in fields(TriggerPolicy)}
+    for kind, overrides in json.loads(spec).items():
+        if kind not in policies:
+            raise ValueError(f"Unknown analysis kind in ANALYSIS_POLICY: {kind}")
+        unknown = set(overrides) - names
+        if unknown:
+            raise ValueError(f"Unknown {kind} policy settings: {', '.join(sorted(unknown))}")
+        for name, value in overrides.items():
+            setattr(policies[kind], name, value)
+    return policies
+
+
+class KindController:
+    """Trigger state, budget, backoff and metrics of one analysis kind."""
+
+    def __init__(self, kind: str, policy: TriggerPolicy, clock: Callable[[], float] = time.monotonic):
+        self.kind = kind
+        self.policy = policy
+        self.clock = clock
+        self.tokens = float(policy.burst)
+        self.refilled_at = clock()
+        self.backoff = 1.0
+        self.latency: Optional[float] = None
+        self.in_flight = False
+        self.last_start: Optional[float] = None
+        self.clear_pending()
+
+        self.segments = 0
+        self.calls = 0
+        self.errors = 0
+        self.triggers: Counter = Counter()
+        self.staleness: deque = deque(maxlen=STALENESS_SAMPLES)
+
+    def clear_pending(self):
+        self.pending_segments = 0
+        self.pending_words = 0
+        self.new_speaker = False
+        self.first_pending: Optional[float] = None
+
+    def observe(self, words: int, new_speaker: bool, now: float):
+        self.segments += 1
+        self.pending_segments += 1
+        self.pending_words += words
+        self.new_speaker |= new_speaker
+        if self.first_pending is None:
+            self.first_pending = now
+
+    def _refill(self, now: float):
+        rate = self.policy.budget_per_minute / 60
+        self.tokens = min(self.policy.burst, self.tokens + (now - self.refilled_at) * rate)
+        self.refilled_at = now
+
+    def _ready_at(self) -> float:
+        """Earliest time the interval and the budget allow another run."""
+        ready = self.last_start + self.policy.min_interval * self.backoff if self.last_start is not None else 0.0
+        if self.tokens < 1:
+            rate = self.policy.budget_per_minute / 60
+            ready = max(ready, self.refilled_at + (1 - self.tokens) / rate if rate > 0 else float("inf"))
+        return ready
+
+    def _reason(self, now: float) -> Optional[str]:
+        """Why the pending changes warrant a run now (ignoring interval and budget)."""
+        if not self.pending_segments:
+            return None
+        if self.new_speaker and self.policy.on_new_speaker:
+            return "speaker"
+        if self.pending_words >= self.policy.min_new_words * self.backoff:
+            return "words"
+        if now - self.first_pending >= self.policy.max_staleness * self.backoff:
+            return "staleness"
+        return None
+
+    def due(self, now: float) -> Optional[str]:
+        """The trigger reason if this kind should run now, else None."""
+        if self.in_flight:
+            return None
+        self._refill(now)
+        if now < self._ready_at():
+            return None
+        return self._reason(now)
+
+    def allowed(self, now: float) -> bool:
+        """Whether a run may start now, due or not: there are pending changes and the interval and budget permit."""
+        if self.in_flight or not self.pending_segments:
+            return False
+        self._refill(now)
+        return now >= self._ready_at()
+
+    def next_check(self, now: float) -> Optional[float]:
+        """When a run could next become due without new changes (None = only on change)."""
+        if self.in_flight or not self.pending_segments:
+            return None
+        self._refill(now)
+        trigger = now if self._reason(now) else self.first_pending + self.policy.max_staleness * self.backoff
+        return max(trigger, self._ready_at())
+
+    def start(self, now: float, reason: str):
+        self.in_flight = True
+        self.last_start = now
+        self._refill(now)
+        self.tokens = max(0.0, self.tokens - 1)
+        self.calls += 1
+        self.triggers[reason] += 1
+        if self.first_pending is not None:
+            self.staleness.append(now - self.first_pending)
+        self.clear_pending()
+
+    def finish(self, latency: float, ok: bool):
+        self.in_flight = False
+        self.latency = latency if self.latency is None else (1 - LATENCY_ALPHA) * self.latency + LATENCY_ALPHA * latency
+        if not ok:
+            self.errors += 1
+            self.backoff = min(self.policy.max_backoff, self.backoff * 2)
+        elif self.latency > self.policy.latency_target:
+            self.backoff = min(self.policy.max_backoff, self.backoff * 1.5)
+        else:
+            self.backoff = max(1.0, self.backoff * 0.75)
+
+    def stats(self) -> dict:
+        staleness = sorted(self.staleness)
+
+        def pct(q):
+            return round(staleness[min(len(staleness) - 1, int(len(staleness) * q))], 2) if staleness else None
+
+        return {
+            "segments": self.segments,
+            "calls": self.calls,
+            # Versus the old behaviour of one analysis call per finalized segment
+            "calls_saved": max(0, self.segments - self.calls),
+            "errors": self.errors,
+            "triggers": dict(self.triggers),
+            "staleness_p50_s": pct(0.5),
+            "staleness_p95_s": pct(0.95),
+            "staleness_max_s": round(staleness[-1], 2) if staleness else None,
+            "pending_words": self.pending_words,
+            "latency_ewma_s": round(self.latency, 3) if self.latency is not None else None,
+            "backoff": round(self.backoff, 2),
+        }
+
+
+class RateController:
+    """
+    Decides when each analysis kind re-runs, from how much the transcript
+    changed (new words, new speakers) and how long changes have waited,
+    within a per-kind call budget that backs off when the LLM gets slow or
+    fails.
+    """
+
+    def __init__(
+        self,
+        policies: Optional[Dict[str, TriggerPolicy]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.clock = clock
+        self.kinds = {kind: KindController(kind, policy, clock) for kind, policy in (policies or load_policies()).items()}
+        self.speakers: set = set()
+
+    def reset(self):
+        """Forget speakers and pending changes (a new recording); metrics and backoff are kept."""
+        self.speakers = set()
+        for controller in self.kinds.values():
+            controller.clear_pending()
+
+    def observe(self, words: int, speakers: Iterable[str]):
+        """Record one finalized segment (or a batch of them) of `words` words."""
+        new_speaker = any(speaker not in self.speakers for speaker in speakers)
+        self.speakers.update(speakers)
+        now = self.clock()
+        for controller in self.kinds.values():
+            controller.observe(words, new_speaker, now)
+
+    def due(self, kind: str) -> Optional[str]:
+        return self.kinds[kind].due(self.clock())
+
+    def due_kinds(self) -> Dict[str, str]:
+        """Kinds that should run now, with the reason for each."""
+        now = self.clock()
+        due = {}
+        for kind, controller in self.kinds.items():
+            reason = controller.due(now)
+            if reason:
+                due[kind] = reason
+        return due
+
+    def allowed_kinds(self) -> List[str]:
+        """Kinds that may run now without being due, e.g. to share a combined call with a due kind."""
+        now = self.clock()
+        return [kind for kind, controller in self.kinds.items() if controller.allowed(now)]
+
+    def next_check(self) -> Optional[float]:
+        """Seconds until a kind could become due by time alone; None = wait for a change."""
+        now = self.clock()
+        times = [t for t in (c.next_check(now) for c in self.kinds.values()) if t is not None]
+        return max(0.0, min(times) - now) if times else None
+
+    def start(self, reasons: Dict[str, str]):
+        """Mark kinds as running, e.g. the result of due_kinds()."""
+        now = self.clock()
+        for kind, reason in reasons.items():
+            self.kinds[kind].start(now, reason)
+
+    def finish(self, kinds: List[str], latency: float, ok: bool):
+        for kind in kinds:
+            self.kinds[kind].finish(latency, ok)
+
+    def stats(self) -> dict:
+        return {kind: controller.stats() for kind, controller in self.kinds.items()}
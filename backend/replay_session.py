@@ -0,0 +1,311 @@
+# replay_session.py
+#
+# Replays a recorded session log (RECORD_SESSIONS / "record": true on start,
+# see session_log.py) through the same callback path a live recording takes:
+# every transcription result goes to Session.on_transcript on a thread of its
+# own, in order, after the audio sent before it has been registered with the
+# session's timeline and audio clock. Replays run at the recorded pace times
+# `--speed`, or as fast as possible with `--speed 0`, so a regression in the
+# callback path can be reproduced without a microphone or Deepgram.
+#
+# Reports events per second and the time spent in each callback (p50/p99),
+# and with `--profile` a per-function report of the hot path:
+#   cprofile  deterministic, on the callback thread and the event loop thread
+#   sample    a statistical profiler that samples every thread's stack each
+#             `--sample-ms`; much lower overhead, so timings stay realistic
+#
+#   python replay_session.py recordings/default-20240101T120000.log.gz --speed 0 --profile cprofile
+#   python replay_session.py meeting.log.gz --speed 0 --profile sample --clients 8 --top 30
+#   python replay_session.py meeting.log.gz --analysis --llm-latency-ms 300
+#   python replay_session.py meeting.log.gz --wav meeting.wav
+#
+# Without `--analysis` the scheduler is left stopped, so no LLM is needed;
+# with it, analysis is answered by the local stub LLM.
+
+import argparse
+import asyncio
+import cProfile
+import json
+import os
+import pstats
+import statistics
+import sys
+import threading
+import time
+import wave
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from session_log import AUDIO, KEEPALIVE, META, RESULT, audio_record, read_session_log, result_from_json
+
+BACKEND_DIR = os.path.dirname(os.path.realpath(__file__))
+SESSION_ID = "replay"
+
+
+class ReplayClient:
+    """Stands in for a subscribed WebSocket, so replays include the fan-out."""
+
+    def __init__(self):
+        from starlette.websockets import WebSocketState
+
+        self.client_state = WebSocketState.CONNECTED
+        self.frames = 0
+
+    async def send_text(self, text: str):
+        self.frames += 1
+
+
+class Sampler:
+    """
+    Samples the stack of every other thread each `interval` seconds. A
+    function's self count is the samples it was running in, its total count
+    the samples it was anywhere on the stack.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.self_counts: Counter = Counter()
+        self.total_counts: Counter = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def _run(self):
+        me = threading.get_ident()
+        idle = {"wait", "select", "_run_once", "run_forever", "_worker", "get"}
+        while not self.stopped.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                # Threads parked in a wait aren't on the hot path
+                if stack[0][2] in idle:
+                    continue
+                self.samples += 1
+                self.self_counts[stack[0]] += 1
+                self.total_counts.update(set(stack))
+
+
+def function_label(func: Tuple[str, int, str]) -> str:
+    filename, line, name = func
+    if filename.startswith(BACKEND_DIR):
+        filename = os.path.relpath(filename, BACKEND_DIR)
+    elif filename != "~":
+        filename = os.path.basename(filename)
+    return f"{filename}:{line}({name})" if filename != "~" else name
+
+
+def in_backend(func: Tuple[str, int, str]) -> bool:
+    return func[0].startswith(BACKEND_DIR) and not func[0].endswith("replay_session.py")
+
+
+def report_cprofile(stats: pstats.Stats, top: int, everything: bool, elapsed: float):
+    rows = [
+        (func, calls, tottime, cumtime)
+        for func, (_, calls, tottime, cumtime, _) in stats.stats.items()
+        if everything or in_backend(func)
+    ]
+    rows.sort(key=lambda row: row[2], reverse=True)
+    print(f"\nHot path (cProfile, by own time{'' if everything else ', backend modules'}):")
+    print(f"{'function':<60} {'calls':>9} {'own ms':>9} {'own %':>6} {'total ms':>9}")
+    for func, calls, tottime, cumtime in rows[:top]:
+        print(f"{function_label(func)[:60]:<60} {calls:>9} {tottime * 1000:>9.1f} "
+              f"{100 * tottime / elapsed:>6.1f} {cumtime * 1000:>9.1f}")
+
+
+def report_samples(sampler: Sampler, top: int, everything: bool):
+    if not sampler.samples:
+        print("\nNo samples taken (replay shorter than the sampling interval?)")
+        return
+    rows = [
+        (func, count) for func, count in sampler.total_counts.items()
+        if everything or in_backend(func)
+    ]
+    rows.sort(key=lambda row: (sampler.self_counts[row[0]], row[1]), reverse=True)
+    print(f"\nHot path ({sampler.samples} samples every {sampler.interval * 1000:g} ms, "
+          f"by own samples{'' if everything else ', backend modules'}):")
+    print(f"{'function':<60} {'own %':>6} {'total %':>8}")
+    for func, count in rows[:top]:
+        print(f"{function_label(func)[:60]:<60} {100 * sampler.self_counts[func] / sampler.samples:>6.1f} "
+              f"{100 * count / sampler.samples:>8.1f}")
+
+
+def export_wav(path: str, output: str):
+    """The audio sent to the backend, on the capture timeline: withheld silence becomes zeros."""
+    meta = None
+    with wave.open(output, "wb") as wav:
+        end = 0
+        for record in read_session_log(path):
+            if record.kind == META:
+                meta = json.loads(record.payload)
+                wav.setnchannels(meta["channels"])
+                wav.setsampwidth(2)
+                wav.setframerate(meta["sample_rate"])
+            elif record.kind == AUDIO and meta is not None:
+                offset, data = audio_record(record.payload)
+                if offset > end:
+                    wav.writeframes(bytes(offset - end))
+                wav.writeframes(data)
+                end = offset + len(data)
+    if meta is None:
+        raise SystemExit(f"{path} has no audio format record")
+    print(f"Wrote {end / (meta['sample_rate'] * meta['channels'] * 2):.1f} s of audio to {output}")
+
+
+def decode(records: list) -> list:
+    """(arrival, kind, event) of the audio and result records, decoded up front to keep decoding out of the profile."""
+    events = []
+    for record in records:
+        if record.kind == AUDIO:
+            offset, data = audio_record(record.payload)
+            events.append((record.time, AUDIO, (offset, len(data))))
+        elif record.kind == RESULT:
+            events.append((record.time, RESULT, result_from_json(record.payload)))
+    return events
+
+
+def replay(args, session, meta: dict, events: list, stats: dict):
+    """Feed the events through the session from this thread, the way the backend's callback thread would."""
+    from audio_preprocess import AudioPreprocessor
+    from metrics import AudioClock
+
+    audio = session.audio = AudioPreprocessor(meta["sample_rate"], meta["channels"], gate=False)
+    clock = session.audio_clock = AudioClock(audio.bytes_per_second)
+    durations = stats["callbacks"]
+    started = time.perf_counter()
+    for arrival, kind, event in events:
+        if args.speed > 0:
+            delay = started + arrival / args.speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        if kind == AUDIO:
+            offset, nbytes = event
+            audio.timeline.add(offset, nbytes)
+            clock.sent(nbytes, end=audio.seconds(offset + nbytes))
+        else:
+            result = event
+            t0 = time.perf_counter()
+            session.on_transcript(result)
+            durations.append(time.perf_counter() - t0)
+    session.publish_update(session.segmenter.flush())
+    stats["elapsed"] = time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded session through the transcript callback path")
+    parser.add_argument("log", help="session log written with RECORD_SESSIONS")
+    parser.add_argument("--speed", type=float, default=1.0, help="multiple of the recorded pace (0 = as fast as possible)")
+    parser.add_argument("--profile", choices=["cprofile", "sample"], help="profile the replay")
+    parser.add_argument("--sample-ms", type=float, default=1.0, help="sampling profiler interval")
+    parser.add_argument("--top", type=int, default=25, help="functions in the hot-path report")
+    parser.add_argument("--all", action="store_true", help="report library functions too, not only backend modules")
+    parser.add_argument("--output", help="write the cProfile stats here (for snakeviz, pstats, ...)")
+    parser.add_argument("--clients", type=int, default=1, help="subscribers receiving the broadcast")
+    parser.add_argument("--analysis", action="store_true", help="run the analysis scheduler against the stub LLM")
+    parser.add_argument("--llm-port", type=int, default=9132)
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="stub time to first token")
+    parser.add_argument("--wav", help="only export the recorded audio to this WAV file")
+    args = parser.parse_args()
+
+    if args.wav:
+        export_wav(args.log, args.wav)
+        return
+
+    records = list(read_session_log(args.log))
+    meta = next((json.loads(r.payload) for r in records if r.kind == META), None)
+    if meta is None:
+        raise SystemExit(f"{args.log} has no audio format record")
+    counts = Counter(r.kind for r in records)
+    print(f"{args.log}: session {meta['session_id']}, {meta['backend']}, "
+          f"{records[-1].time:.1f} s recorded; {counts[RESULT]} results, {counts[AUDIO]} audio sends, "
+          f"{counts[KEEPALIVE]} keepalives")
+
+    # The app reads its configuration at import time
+    stub = None
+    if args.analysis:
+        os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{args.llm_port}/v1"
+        import stub_llm
+
+        stub = stub_llm.serve_in_background(args.llm_port, latency_ms=args.llm_latency_ms)
+    import logging
+    from sessions import Session
+
+    logging.getLogger().setLevel(logging.WARNING)
+    loop = asyncio.new_event_loop()
+    loop_thread = threading.Thread(target=loop.run_forever, daemon=True)
+    loop_thread.start()
+
+    async def setup():
+        session = Session(SESSION_ID, loop, roles=frozenset({"fanout", "analysis"} if args.analysis else {"fanout"}))
+        session.start()
+        clients = [ReplayClient() for _ in range(args.clients)]
+        for client in clients:
+            session.subscribe(client)
+        return session, clients
+
+    session, clients = asyncio.run_coroutine_threadsafe(setup(), loop).result()
+    events = decode(records)
+    stats = {"callbacks": []}
+    profiles: List[cProfile.Profile] = []
+    sampler: Optional[Sampler] = None
+    if args.profile == "cprofile":
+        profiles = [cProfile.Profile(), cProfile.Profile()]
+        # Broadcast and scheduling work lands on the event loop thread
+        loop.call_soon_threadsafe(profiles[1].enable)
+        profiles[0].enable()
+    elif args.profile == "sample":
+        sampler = Sampler(args.sample_ms / 1000)
+        sampler.start()
+
+    try:
+        replay(args, session, meta, events, stats)
+        # Let the loop deliver what the last callbacks queued
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0.1), loop).result()
+        stats["segments"] = len(session.transcript_store)
+    finally:
+        if profiles:
+            profiles[0].disable()
+            loop.call_soon_threadsafe(profiles[1].disable)
+            asyncio.run_coroutine_threadsafe(asyncio.sleep(0), loop).result()
+        if sampler is not None:
+            sampler.stop()
+        asyncio.run_coroutine_threadsafe(session.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        loop_thread.join()
+        if stub is not None:
+            stub.should_exit = True
+
+    callbacks = sorted(stats["callbacks"])
+    elapsed = stats["elapsed"]
+    print(f"Replayed {len(records)} events in {elapsed:.2f} s ({len(records) / elapsed:,.0f} events/s, "
+          f"{records[-1].time / elapsed:,.1f}x recorded pace)")
+    if callbacks:
+        print(f"on_transcript: {len(callbacks)} calls, p50 {statistics.median(callbacks) * 1e6:.0f} us, "
+              f"p99 {callbacks[int(len(callbacks) * 0.99)] * 1e6:.0f} us, max {callbacks[-1] * 1e6:.0f} us, "
+              f"{sum(callbacks) / elapsed * 100:.1f}% of the replay")
+    print(f"Segments stored: {stats['segments']}, frames per client: {clients[0].frames if clients else 0}")
+
+    if profiles:
+        stats = pstats.Stats(profiles[0])
+        stats.add(profiles[1])
+        if args.output:
+            stats.dump_stats(args.output)
+            print(f"Wrote cProfile stats to {args.output}")
+        report_cprofile(stats, args.top, args.all, elapsed)
+    elif sampler is not None:
+        report_samples(sampler, args.top, args.all)
+
+
+if __name__ == "__main__":
+    main()
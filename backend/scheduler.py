@@ -0,0 +1,327 @@
+# scheduler.py
+
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from analysis import (
+    MEETING_CONTEXT_ENTRIES,
+    SPEAKER_CONTEXT_ENTRIES,
+    Analyzer,
+    AnalysisExecutor,
+    SpeakerSentimentItem,
+    TranscriptEntry,
+    analyze_combined,
+    analyze_objective,
+    format_entries,
+    get_analysis_executor,
+    load_segment_analyzers,
+)
+from context import RollingContext
+from json_stream import JsonEvent
+from rate_controller import RateController, TriggerPolicy
+from sentiment import SentimentTracker, find_sentiment
+
+logger = logging.getLogger(__name__)
+
+# "separate": one LLM request per analysis kind, run concurrently.
+# "batched": objective and sentiment answered by one combined prompt.
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "separate")
+
+# Stream objective and combined responses and publish each part as soon as
+# it has been generated, instead of after the whole completion
+ANALYSIS_STREAMING = os.getenv("ANALYSIS_STREAMING", "true").lower() in ("1", "true", "yes")
+
+
+class AnalysisScheduler:
+    """
+    Runs the LLM analysis off the Deepgram receive thread.
+
+    Every finalized snippet is reported with `submit`, which only records
+    how much changed. A RateController decides per analysis kind (objective,
+    sentiment) when enough has changed, or changes have waited long enough,
+    to be worth a call, within that kind's budget and backoff. Due kinds run
+    as their own task (at most one per kind), reading the latest transcript
+    when they start, so everything submitted meanwhile is covered by one
+    call. In batched mode a due kind takes the others along when their
+    interval and budget allow it, and the combined request answers them
+    together; a kind that runs alone uses its own request. Results go to `publish` as soon as they are ready. With streaming on, the objective and each speaker's score are
+    published as soon as their part of the response has been generated.
+
+    Finalized segments reported with `analyze_segments` also go through the
+    segment analyzers (info density, controversy, fallacies), on the shared
+    AnalysisExecutor; each segment's merged record is published as a
+    "segment" analysis every time one of its analyzers finishes. Analyzers
+    that check a segment against earlier statements get them from
+    `get_related(text, seq)`, called on a worker thread.
+    """
+
+    def __init__(
+        self,
+        get_entries: Callable[[], Sequence[TranscriptEntry]],
+        publish: Callable[[dict], Awaitable[None]],
+        sentiment: SentimentTracker,
+        context: Optional[RollingContext] = None,
+        mode: str = ANALYSIS_MODE,
+        streaming: bool = ANALYSIS_STREAMING,
+        policies: Optional[Dict[str, TriggerPolicy]] = None,
+        segment_analyzers: Optional[Sequence[Analyzer]] = None,
+        executor: Optional[AnalysisExecutor] = None,
+        get_related: Optional[Callable[[str, int], str]] = None,
+    ):
+        self.get_entries = get_entries
+        self.publish = publish
+        self.sentiment = sentiment
+        self.context = context
+        self.batched = mode == "batched"
+        self.streaming = streaming
+        self.controller = RateController(policies)
+        self.segment_analyzers = list(load_segment_analyzers() if segment_analyzers is None else segment_analyzers)
+        # None: the process-wide executor, looked up on the running loop
+        self.executor = executor
+        self.get_related = get_related
+        self.wakeup = asyncio.Event()
+        self.tasks: Set[asyncio.Task] = set()
+        self.worker: Optional[asyncio.Task] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.submitted = 0
+
+    def start(self):
+        """Start the worker task. Must be called from the running event loop."""
+        if self.worker and not self.worker.done():
+            return
+        self.loop = asyncio.get_running_loop()
+        self.worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        tasks = [self.worker, *self.tasks] if self.worker else list(self.tasks)
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self.worker = None
+        self.tasks.clear()
+
+    def submit(self, words: int = 0, speakers: Sequence[str] = ()):
+        """Record finalized text (`words` words by `speakers`); analysis runs when the policy says so."""
+        self.submitted += 1
+        self.controller.observe(words, speakers)
+        self.wakeup.set()
+
+    def submit_threadsafe(self, words: int = 0, speakers: Sequence[str] = ()):
+        """`submit` from a non-event-loop thread (e.g. Deepgram's)."""
+        if self.loop and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.submit, words, tuple(speakers))
+
+    def analyze_segments(self, segments: Sequence[Tuple[int, str, str]]):
+        """Run the segment analyzers on finalized segments, given as (seq, speaker, text)."""
+        if not self.segment_analyzers:
+            return
+        for seq, speaker, text in segments:
+            task = asyncio.create_task(self._analyze_segment(seq, speaker, text))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    def analyze_segments_threadsafe(self, segments: Sequence[Tuple[int, str, str]]):
+        """`analyze_segments` from a non-event-loop thread (e.g. Deepgram's)."""
+        if self.segment_analyzers and self.loop and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.analyze_segments, list(segments))
+
+    async def _analyze_segment(self, seq: int, speaker: str, text: str):
+        async def on_result(record: dict, pending: List[str]):
+            await self.publish({
+                "type": "analysis",
+                "kind": "segment",
+                "seq": seq,
+                "data": dict(record),
+                # Analyzers of this segment still running; the record is final when empty
+                "pending": pending,
+                "transcript_length": seq,
+            })
+
+        def get_context(scope: str, speaker: str) -> str:
+            return self._segment_context(scope, speaker, text)
+
+        async def get_related() -> str:
+            return await asyncio.to_thread(self.get_related, text, seq)
+
+        executor = self.executor or get_analysis_executor()
+        await executor.analyze(speaker, text, self.segment_analyzers, get_context, on_result,
+                               get_related if self.get_related is not None else None)
+
+    def _segment_context(self, scope: str, speaker: str, text: str) -> str:
+        """The earlier conversation a speaker- or meeting-scope analyzer sees besides the segment."""
+        entries = self.get_entries()
+        recent = [
+            entry for entry in entries[max(0, len(entries) - 2 * MEETING_CONTEXT_ENTRIES):]
+            if not (entry.speaker == speaker and entry.transcript == text)
+        ]
+        if scope == "speaker":
+            return format_entries([entry for entry in recent if entry.speaker == speaker][-SPEAKER_CONTEXT_ENTRIES:])
+        recent = format_entries(recent[-MEETING_CONTEXT_ENTRIES:])
+        summary = self.context.summary if self.context is not None else ""
+        if not summary:
+            return recent
+        return f"Summary of the earlier conversation:\n{summary}\n\nMost recent conversation:\n{recent}"
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.controller.next_check())
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            due = self.controller.due_kinds()
+            if not due:
+                continue
+            if self.batched:
+                # Kinds whose budget allows a run share the combined request;
+                # the others aren't run, or charged, until they are due
+                due.update({kind: "batched" for kind in self.controller.allowed_kinds() if kind not in due})
+                self._spawn(due)
+            else:
+                for kind, reason in due.items():
+                    self._spawn({kind: reason})
+
+    def _spawn(self, reasons: Dict[str, str]):
+        task = asyncio.create_task(self._run_kinds(reasons))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _run_kinds(self, reasons: Dict[str, str]):
+        entries = self.get_entries()
+        kinds = list(reasons)
+        self.controller.start(reasons)
+        started = time.perf_counter()
+        ok = False
+        try:
+            if not entries:
+                ok = True
+            elif self.batched and len(kinds) > 1:
+                ok = await self._run_batched(entries)
+            elif kinds == ["objective"]:
+                ok = await self._analyze("objective", self._objective, entries)
+            else:
+                ok = await self._analyze("sentiment", self.sentiment.update, entries)
+        except Exception as e:
+            logger.error(f"Analysis pass failed: {e}")
+        finally:
+            self.controller.finish(kinds, time.perf_counter() - started, ok)
+            # Changes that arrived meanwhile may already be due
+            self.wakeup.set()
+
+    async def run_once(self):
+        """One pass of every kind now, regardless of the policy (benchmarks, forced refreshes)."""
+        entries = self.get_entries()
+        if not entries:
+            return
+        if self.batched:
+            await self._run_batched(entries)
+            return
+        await asyncio.gather(
+            self._analyze("objective", self._objective, entries),
+            self._analyze("sentiment", self.sentiment.update, entries),
+        )
+
+    async def _objective(self, entries: List[TranscriptEntry]):
+        published = None
+
+        async def on_event(event: JsonEvent):
+            nonlocal published
+            objective = objective_from_event(event)
+            if published is None and objective is not None:
+                published = [{"Objective": objective}]
+                await self._publish("objective", published, entries)
+
+        objective = await analyze_objective(entries, self.context, on_event if self.streaming else None)
+        # None: already published as it streamed in
+        return None if objective == published else objective
+
+    async def _analyze(self, kind: str, analyzer: Callable[[List[TranscriptEntry]], Awaitable[object]], entries: List[TranscriptEntry]) -> bool:
+        try:
+            data = await analyzer(entries)
+        except Exception as e:
+            logger.error(f"Error running {kind} analysis: {e}")
+            return False
+        if data is not None:
+            await self._publish(kind, data, entries)
+        return True
+
+    async def _run_batched(self, entries: List[TranscriptEntry]) -> bool:
+        tracker = self.sentiment
+        async with tracker.lock:
+            generation = tracker.generation
+            work = tracker.take_pending(entries)
+            unscored = {speaker: texts for speaker, texts, _ in work}
+            published_objective = None
+            streamed_sentiment = False
+
+            async def on_event(event: JsonEvent):
+                nonlocal published_objective, streamed_sentiment
+                objective = objective_from_event(event)
+                if objective is not None and published_objective is None:
+                    published_objective = [{"Objective": objective}]
+                    await self._publish("objective", published_objective, entries)
+                elif event.kind == "item" and event.key == "Sentiment":
+                    try:
+                        item = SpeakerSentimentItem.model_validate(event.value)
+                    except ValueError:
+                        return  # the final validation reports it
+                    if self._merge(unscored, generation, item.Speaker, item.Sentiment):
+                        streamed_sentiment = True
+                        await self._publish("sentiment", tracker.snapshot(), entries)
+
+            try:
+                data = await analyze_combined(
+                    entries,
+                    [(speaker, " ".join(texts), previous) for speaker, texts, previous in work],
+                    self.context,
+                    on_event if self.streaming else None,
+                )
+                objective = [{"Objective": data["Objective"]}]
+            except Exception as e:
+                logger.error(f"Error running batched analysis: {e}")
+                return False
+
+            merged = False
+            for speaker in list(unscored):
+                try:
+                    merged |= self._merge(unscored, generation, speaker, find_sentiment(data["Sentiment"], speaker))
+                except Exception as e:
+                    logger.error(f"Error scoring sentiment for {speaker}: {e}")
+            sentiment = tracker.snapshot()
+
+        if objective != published_objective:
+            await self._publish("objective", objective, entries)
+        if merged or not streamed_sentiment:
+            await self._publish("sentiment", sentiment, entries)
+        return True
+
+    def _merge(self, unscored: dict, generation: int, speaker: str, score: float) -> bool:
+        """Fold a score into the tracker unless the speaker was already merged or reset() ran meanwhile."""
+        if generation != self.sentiment.generation or speaker not in unscored:
+            return False
+        self.sentiment.merge(speaker, unscored.pop(speaker), max(-1.0, min(1.0, score)))
+        return True
+
+    async def _publish(self, kind: str, data, entries: List[TranscriptEntry]):
+        await self.publish({
+            "type": "analysis",
+            "kind": kind,
+            "data": data,
+            "transcript_length": len(entries),
+        })
+
+
+def objective_from_event(event: JsonEvent) -> Optional[str]:
+    """The objective text if `event` completed one, in either response shape."""
+    if event.kind == "member" and event.key == "Objective" and isinstance(event.value, str):
+        return event.value
+    if event.kind == "item" and isinstance(event.value, dict) and isinstance(event.value.get("Objective"), str):
+        return event.value["Objective"]
+    return None
@@ -0,0 +1,153 @@
+# segmenter.py
+
+import os
+import threading
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+# A finalized utterance is cut into a segment once it reaches this many words,
+# even if Deepgram hasn't signalled the end of speech yet
+SEGMENT_MAX_WORDS = int(os.getenv("SEGMENT_MAX_WORDS", "80"))
+
+# Words that start this far before the end of the last finalized word are
+# treated as already committed (Deepgram results shouldn't overlap, but
+# timings are rounded)
+TIME_EPSILON = 0.01
+
+
+@dataclass
+class Segment:
+    """A stable stretch of one speaker's words. `text` never changes once emitted."""
+    speaker: str
+    text: str
+    start: float
+    end: float
+    words: int
+    timings: List[Tuple[float, float]] = field(default_factory=list)  # (start, end) per word
+    # False when the utterance was cut short (speaker change, SEGMENT_MAX_WORDS)
+    # rather than ended by speech_final or the end of the stream
+    complete: bool = True
+
+
+@dataclass
+class SegmenterUpdate:
+    """What one Deepgram result produced: finished segments and in-progress text."""
+    segments: List[Segment] = field(default_factory=list)
+    interims: List[Segment] = field(default_factory=list)
+
+
+def speaker_label(speaker: Optional[int]) -> str:
+    # Add 1 to speaker index to start from 1 instead of 0
+    return f"Speaker {speaker + 1}" if speaker is not None else "Unknown"
+
+
+class TranscriptSegmenter:
+    """
+    Turns Deepgram live results into append-only transcript segments.
+
+    Deepgram keeps revising the words of an interim result until it marks
+    them `is_final`, and marks the end of an utterance with `speech_final`.
+    The segmenter works on words and their timings rather than on the
+    transcript string: finalized words are buffered per utterance and
+    emitted as a Segment when the utterance ends, the speaker changes (also
+    within a single result) or the utterance grows past SEGMENT_MAX_WORDS.
+    Interim words are never committed; they come back as cheap `interims`
+    showing each speaker's utterance in progress, which the next result
+    replaces.
+    """
+
+    def __init__(self, max_words: int = SEGMENT_MAX_WORDS):
+        self.max_words = max_words
+        self.lock = threading.Lock()
+        self.finalized_until = 0.0  # end time of the last finalized word
+        self.open_words: List[SimpleNamespace] = []  # finalized, not yet emitted
+        self.last_interim: Dict[str, str] = {}  # speaker -> text last sent as interim
+
+    def reset(self):
+        with self.lock:
+            self.finalized_until = 0.0
+            self.open_words = []
+            self.last_interim = {}
+
+    def process(self, result) -> SegmenterUpdate:
+        alt = result.channel.alternatives[0]
+        words = list(alt.words or [])
+        if not words and alt.transcript:
+            # No word timings (e.g. a backend without them): treat the
+            # transcript as a single word spanning the result
+            start = result.start or 0.0
+            words = [SimpleNamespace(
+                word=alt.transcript,
+                punctuated_word=alt.transcript,
+                start=start,
+                end=start + (result.duration or 0.0),
+                speaker=None,
+            )]
+
+        update = SegmenterUpdate()
+        with self.lock:
+            words = [w for w in words if w.start >= self.finalized_until - TIME_EPSILON]
+            if getattr(result, "is_final", True):
+                for run in self._speaker_runs(words):
+                    if self.open_words and self.open_words[0].speaker != run[0].speaker:
+                        self._flush(update, complete=False)
+                    self.open_words.extend(run)
+                    if len(self.open_words) >= self.max_words:
+                        self._flush(update, complete=False)
+                if words:
+                    self.finalized_until = words[-1].end
+                if getattr(result, "speech_final", False):
+                    self._flush(update)
+                if self.open_words:
+                    self._interim(update, self.open_words)
+            else:
+                for i, run in enumerate(self._speaker_runs(words)):
+                    if i == 0 and self.open_words and self.open_words[0].speaker == run[0].speaker:
+                        run = self.open_words + run
+                    self._interim(update, run)
+        return update
+
+    def flush(self) -> SegmenterUpdate:
+        """Emit whatever finalized words are still buffered (e.g. when the stream ends)."""
+        update = SegmenterUpdate()
+        with self.lock:
+            self._flush(update)
+        return update
+
+    @staticmethod
+    def _speaker_runs(words: List[SimpleNamespace]) -> List[List[SimpleNamespace]]:
+        runs: List[List[SimpleNamespace]] = []
+        for w in words:
+            if runs and runs[-1][-1].speaker == w.speaker:
+                runs[-1].append(w)
+            else:
+                runs.append([w])
+        return runs
+
+    @staticmethod
+    def _segment(words: List[SimpleNamespace], complete: bool = True) -> Segment:
+        return Segment(
+            speaker=speaker_label(words[0].speaker),
+            text=" ".join(getattr(w, "punctuated_word", None) or w.word for w in words),
+            start=words[0].start,
+            end=words[-1].end,
+            words=len(words),
+            timings=[(w.start, w.end) for w in words],
+            complete=complete,
+        )
+
+    def _flush(self, update: SegmenterUpdate, complete: bool = True):
+        if not self.open_words:
+            return
+        segment = self._segment(self.open_words, complete)
+        self.open_words = []
+        self.last_interim.pop(segment.speaker, None)
+        update.segments.append(segment)
+
+    def _interim(self, update: SegmenterUpdate, words: List[SimpleNamespace]):
+        interim = self._segment(words)
+        if self.last_interim.get(interim.speaker) == interim.text:
+            return
+        self.last_interim[interim.speaker] = interim.text
+        update.interims.append(interim)
@@ -0,0 +1,137 @@
+# sentiment.py
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from analysis import TranscriptEntry, score_speaker_delta
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest text in the exponentially weighted running score
+SENTIMENT_ALPHA = 0.4
+
+
+@dataclass
+class SpeakerSentiment:
+    """Running sentiment of one speaker and how many of their entries it covers."""
+    score: float
+    scored_entries: int
+
+
+def parse_sentiment(llm_response: str, speaker: str) -> float:
+    """
+    Pull the score for `speaker` out of a sentiment response. Accepts the
+    documented array form as well as a bare object, which JSON mode may force.
+    """
+    return find_sentiment(json.loads(llm_response), speaker)
+
+
+def find_sentiment(data, speaker: str) -> float:
+    """Like parse_sentiment, for an already decoded response."""
+    items = data if isinstance(data, list) else [data]
+    for item in items:
+        if item.get("Speaker", speaker) == speaker:
+            return max(-1.0, min(1.0, float(item["Sentiment"])))
+    raise ValueError(f"No sentiment for {speaker} in response")
+
+
+class SentimentTracker:
+    """
+    Per-speaker incremental sentiment.
+
+    Each call to `update` looks only at transcript entries it has not seen
+    yet. For every speaker with new entries, just that new text is sent to the
+    LLM together with the speaker's previous score, and the result is merged
+    with an exponentially weighted update. Each snippet therefore costs
+    O(new text) instead of O(meeting), and `snapshot` serves the cached state
+    without any LLM call.
+    """
+
+    def __init__(
+        self,
+        alpha: float = SENTIMENT_ALPHA,
+        score_delta: Callable[[str, str, Optional[float]], Awaitable[str]] = score_speaker_delta,
+    ):
+        self.alpha = alpha
+        self.score_delta = score_delta
+        self.speakers: Dict[str, SpeakerSentiment] = {}
+        self.pending: Dict[str, List[str]] = {}  # speaker -> text not yet scored
+        self.seen = 0  # number of transcript entries already consumed
+        self.generation = 0  # bumped by reset() to discard in-flight results
+        # Serializes updates so the same pending text is never scored twice
+        self.lock = asyncio.Lock()
+
+    def reset(self):
+        self.speakers = {}
+        self.pending = {}
+        self.seen = 0
+        self.generation += 1
+
+    def take_pending(self, transcript_entries: List[TranscriptEntry]) -> List[Tuple[str, List[str], Optional[float]]]:
+        """
+        Consume entries added since the last call and return the outstanding
+        work as (speaker, unscored texts, previous score) tuples.
+        """
+        if len(transcript_entries) < self.seen:
+            # The transcript was cleared and restarted underneath us
+            self.reset()
+        for entry in transcript_entries[self.seen:]:
+            self.pending.setdefault(entry.speaker, []).append(entry.transcript)
+        self.seen = len(transcript_entries)
+        return [
+            (speaker, list(texts), self.speakers[speaker].score if speaker in self.speakers else None)
+            for speaker, texts in self.pending.items()
+        ]
+
+    def merge(self, speaker: str, texts: List[str], score: float):
+        """Fold a fresh score for `texts` into the speaker's running state."""
+        state = self.speakers.get(speaker)
+        if state is None:
+            self.speakers[speaker] = SpeakerSentiment(score=score, scored_entries=len(texts))
+        else:
+            state.score = (1 - self.alpha) * state.score + self.alpha * score
+            state.scored_entries += len(texts)
+        self.pending.pop(speaker, None)
+
+    async def update(self, transcript_entries: List[TranscriptEntry]) -> List[dict]:
+        """
+        Score the entries added since the last call and return the snapshot.
+        Text whose scoring fails stays pending and is retried on the next update.
+        """
+        async with self.lock:
+            generation = self.generation
+            work = self.take_pending(transcript_entries)
+            results = await asyncio.gather(*(
+                self.score_delta(speaker, " ".join(texts), previous)
+                for speaker, texts, previous in work
+            ), return_exceptions=True)
+
+            if generation == self.generation:  # otherwise reset() ran meanwhile
+                for (speaker, texts, _), llm_response in zip(work, results):
+                    try:
+                        if isinstance(llm_response, Exception):
+                            raise llm_response
+                        self.merge(speaker, texts, parse_sentiment(llm_response, speaker))
+                    except Exception as e:
+                        logger.error(f"Error scoring sentiment for {speaker}: {e}")
+
+            return self.snapshot()
+
+    def restore(self, snapshot: List[dict]):
+        """Take over scores computed elsewhere (another process's snapshot) without scoring anything."""
+        for item in snapshot:
+            state = self.speakers.get(item["Speaker"])
+            if state is None:
+                self.speakers[item["Speaker"]] = SpeakerSentiment(score=float(item["Sentiment"]), scored_entries=0)
+            else:
+                state.score = float(item["Sentiment"])
+
+    def snapshot(self) -> List[dict]:
+        """Return the cached scores as [{"Speaker": name, "Sentiment": score}]."""
+        return [
+            {"Speaker": speaker, "Sentiment": round(state.score, 3)}
+            for speaker, state in self.speakers.items()
+        ]
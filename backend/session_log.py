@@ -0,0 +1,161 @@
+# session_log.py
+
+import gzip
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Iterator, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Record every recording's transcription events and audio (the start request
+# can turn it on or off per recording)
+RECORD_SESSIONS = os.getenv("RECORD_SESSIONS", "false").lower() in ("1", "true", "yes")
+RECORD_DIR = os.getenv("RECORD_DIR", os.path.join(os.path.dirname(os.path.realpath(__file__)), "recordings"))
+# Seconds between flushes of the log, bounding what a crash can lose
+RECORD_FLUSH_INTERVAL = 1.0
+
+# Record types
+META = b"M"  # JSON: session, audio format, backend, start time
+AUDIO = b"A"  # capture offset (u64) + the linear16 bytes sent to the backend
+RESULT = b"R"  # JSON: a transcription result as the callback received it
+KEEPALIVE = b"K"  # empty
+
+# type, arrival (seconds since the log started), payload length
+HEADER = struct.Struct("<cdI")
+OFFSET = struct.Struct("<Q")
+
+
+class LogRecord(NamedTuple):
+    kind: bytes
+    time: float
+    payload: bytes
+
+
+def result_to_dict(result) -> dict:
+    """A transcription result as plain data: Deepgram's response objects, or the fake backend's namespaces."""
+    if hasattr(result, "to_dict"):
+        return result.to_dict()
+    return json.loads(json.dumps(result, default=vars))
+
+
+def result_from_json(payload: bytes):
+    """The inverse of result_to_dict, with attribute access like the original result."""
+    return json.loads(payload, object_hook=lambda d: SimpleNamespace(**d))
+
+
+class SessionRecorder:
+    """
+    Writes what a recording's transcription backend was sent and what its
+    callback received to a gzip-compressed log of typed, timestamped
+    records, so the event stream can be replayed later (replay_session.py).
+
+    The audio and callback threads only timestamp and queue records; a
+    writer thread encodes, compresses and flushes them, so recording adds
+    no disk I/O to either path. Results are serialized when they are
+    queued, before the session remaps their timestamps. If the log can't be
+    written, recording stops: later records are dropped rather than queued.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.started = time.perf_counter()
+        self.records: "queue.SimpleQueue[Optional[tuple]]" = queue.SimpleQueue()
+        self.writer = threading.Thread(target=self._write, daemon=True)
+        self.count = 0
+        self.bytes = 0
+        self.failed = False
+        self.writer.start()
+
+    @classmethod
+    def create(cls, session_id: str, directory: str = RECORD_DIR) -> "SessionRecorder":
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        return cls(os.path.join(directory, f"{session_id}-{stamp}.log.gz"))
+
+    def _put(self, kind: bytes, payload):
+        # Nothing drains the queue once the writer has failed
+        if self.failed:
+            return
+        self.records.put((kind, time.perf_counter() - self.started, payload))
+
+    def meta(self, **fields):
+        self._put(META, json.dumps({**fields, "started_at": datetime.utcnow().isoformat()}).encode())
+
+    def audio(self, offset: int, data: bytes):
+        self._put(AUDIO, (offset, data))
+
+    def result(self, result):
+        self._put(RESULT, json.dumps(result_to_dict(result)).encode())
+
+    def keep_alive(self):
+        self._put(KEEPALIVE, b"")
+
+    def close(self):
+        """Write out everything queued and close the log."""
+        self.records.put(None)
+        self.writer.join()
+
+    def _write(self):
+        try:
+            with gzip.open(self.path, "wb", compresslevel=1) as f:
+                flushed = time.monotonic()
+                while True:
+                    try:
+                        record = self.records.get(timeout=RECORD_FLUSH_INTERVAL)
+                    except queue.Empty:
+                        record = ()
+                    if record is None:
+                        break
+                    if record:
+                        kind, arrival, payload = record
+                        if kind == AUDIO:
+                            payload = OFFSET.pack(payload[0]) + payload[1]
+                        f.write(HEADER.pack(kind, arrival, len(payload)))
+                        f.write(payload)
+                        self.count += 1
+                        self.bytes += HEADER.size + len(payload)
+                    if time.monotonic() - flushed >= RECORD_FLUSH_INTERVAL:
+                        f.flush()
+                        flushed = time.monotonic()
+            logger.info(f"Recorded {self.count} events to {self.path}")
+        except OSError as e:
+            self.failed = True
+            logger.error(f"Session recording to {self.path} failed: {e}")
+            # Free what was queued before the failure was noticed
+            while True:
+                try:
+                    self.records.get_nowait()
+                except queue.Empty:
+                    break
+
+    def stats(self) -> dict:
+        return {"path": self.path, "records": self.count, "bytes": self.bytes, "failed": self.failed}
+
+
+def read_session_log(path: str) -> Iterator[LogRecord]:
+    """The records of a log in the order written. A log cut short by a crash ends at its last whole record."""
+    with gzip.open(path, "rb") as f:
+        while True:
+            try:
+                header = f.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    return
+                kind, arrival, length = HEADER.unpack(header)
+                payload = f.read(length)
+            except EOFError:
+                return
+            if len(payload) < length:
+                return
+            yield LogRecord(kind, arrival, payload)
+
+
+def audio_record(payload: bytes):
+    """(capture offset, audio) of an AUDIO record's payload."""
+    return OFFSET.unpack_from(payload)[0], payload[OFFSET.size:]
@@ -0,0 +1,720 @@
+# sessions.py
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, FrozenSet, List, Optional
+
+from fastapi import WebSocket
+
+from analysis import RELATED_CONTEXT_ENTRIES, get_meeting_objective
+from broadcaster import Broadcaster, Subscriber
+from bus import BUS_LEASE_TTL, PROCESS_ID, PROCESS_ROLES, REGISTRY_STREAM, InProcessBus, MessageBus, session_stream
+from audio_preprocess import AUDIO_VAD, AudioPreprocessor, AudioRing
+from audio_sources import AudioSource, MicrophoneSource
+from context import RollingContext
+from context_index import ContextIndex
+from metrics import AUDIO_CALLBACK_LATENCY, SEGMENTS, TRACE_SEGMENTS, TRACER, AudioClock
+from persister import WriteBehindPersister
+from scheduler import AnalysisScheduler
+from segmenter import Segment, SegmenterUpdate, TranscriptSegmenter
+from session_log import RECORD_SESSIONS, SessionRecorder
+from sentiment import SentimentTracker
+from singleflight import SingleFlight
+from speaker_stats import SpeakerStats
+from supabase_client import ANALYSIS_TABLE, TRANSCRIPTS_TABLE, get_previous_transcripts
+from transcript_store import TranscriptStore
+from transcription import DeepgramBackend, TranscriptionBackend
+
+logger = logging.getLogger(__name__)
+
+# Per-process resource limits
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "32"))
+MAX_SUBSCRIBERS_PER_SESSION = int(os.getenv("MAX_SUBSCRIBERS_PER_SESSION", "64"))
+
+# Session used by the session-less routes (/real-time/start, /demo/objective, ...)
+DEFAULT_SESSION_ID = "default"
+
+DEFAULT_OBJECTIVE = json.dumps([{"Objective": "Real-time transcription with analysis"}])
+
+
+class SessionLimitError(Exception):
+    """Raised when a per-process or per-session resource limit is reached."""
+
+
+class Session:
+    """
+    One meeting: its transcript store, transcript segmenter, audio
+    source and transcription backend (driven by an audio worker thread),
+    analysis scheduler and WebSocket subscribers.
+
+    Everything the session publishes (segments, interim text, analysis)
+    goes through the message bus on the session's stream, and is broadcast
+    and analyzed when it comes back. With a shared bus, the same session id
+    in another process is a replica: it rebuilds the transcript, stats and
+    latest analysis from the stream, fans it out to its own subscribers and
+    can take over the analysis. The process holding the session's analysis
+    lease runs the scheduler; the one with the audio worker is its source.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        loop: asyncio.AbstractEventLoop,
+        persister: Optional[WriteBehindPersister] = None,
+        context_index: Optional[ContextIndex] = None,
+        bus: Optional[MessageBus] = None,
+        roles: FrozenSet[str] = PROCESS_ROLES,
+    ):
+        self.id = session_id
+        self.loop = loop
+        # Where the session's events go; other processes may share it
+        self.bus = bus if bus is not None else InProcessBus()
+        self.stream = session_stream(session_id)
+        self.roles = roles
+        self.lease_task: Optional[asyncio.Task] = None
+        # Write-behind storage for segments and analysis results (None = off)
+        self.persister = persister
+        # Local index of past snippets for fact-check lookups (None = off)
+        self.context_index = context_index
+        self.created_at = datetime.utcnow()
+
+        # Transcript storage: the newest entries in memory, older ones spilled to disk
+        self.transcript_store = TranscriptStore()
+        # Rolling summary + recent window used as the LLM prompt context
+        self.context = RollingContext()
+        # Per-speaker running sentiment, updated incrementally by the scheduler
+        self.sentiment = SentimentTracker()
+        # Talk time, turn-taking and info density, computed locally per segment
+        self.stats = SpeakerStats()
+        # Turns Deepgram's revisable interim results into append-only segments
+        self.segmenter = TranscriptSegmenter()
+
+        # Per-subscriber bounded queues; publishing never waits on a client
+        self.broadcaster = Broadcaster(loop)
+        self.stop_event = threading.Event()
+        self.audio_thread: Optional[threading.Thread] = None
+        self.audio_source: Optional[AudioSource] = None
+        self.backend: Optional[TranscriptionBackend] = None
+        # When each stretch of audio was sent, to time the backend's callbacks
+        self.audio_clock: Optional[AudioClock] = None
+        # Ring buffer, batching and silence gate between capture and backend
+        self.audio: Optional[AudioPreprocessor] = None
+        # Log of the audio sent and results received, for replay (None = off)
+        self.recorder: Optional[SessionRecorder] = None
+        self.last_callback: Optional[float] = None
+
+        # Latest objective (JSON text), from the scheduler or the objective endpoint
+        self.cached_objective: Optional[str] = None
+        # Concurrent objective pollers for the same transcript version share one LLM call
+        self.objective_flight = SingleFlight()
+
+        self.scheduler = AnalysisScheduler(
+            get_entries=self.transcript_store.snapshot,
+            publish=self.publish_analysis,
+            sentiment=self.sentiment,
+            context=self.context,
+            get_related=self.related_statements if context_index is not None else None,
+        )
+
+    def start(self):
+        """Follow the session's stream and, with the analysis role, compete for its analysis. Call from the loop."""
+        self.bus.subscribe(self.stream, self.on_bus_event, history=self.bus.shared)
+        if "analysis" in self.roles:
+            self.lease_task = self.loop.create_task(self.hold_analysis_lease())
+
+    @property
+    def recording(self) -> bool:
+        return self.audio_thread is not None and self.audio_thread.is_alive()
+
+    @property
+    def analysing(self) -> bool:
+        """Whether this process runs the session's analysis."""
+        return self.scheduler.worker is not None
+
+    def info(self) -> dict:
+        return {
+            "session_id": self.id,
+            "created_at": self.created_at.isoformat(),
+            "recording": self.recording,
+            "subscribers": len(self.broadcaster),
+            "transcript_entries": len(self.transcript_store),
+            "transcript": self.transcript_store.stats(),
+            "audio": self.audio.stats() if self.audio is not None else None,
+            "recording_log": self.recorder.stats() if self.recorder is not None else None,
+            "broadcast": self.broadcaster.stats(),
+            "analysis": self.scheduler.controller.stats(),
+            "analysing": self.analysing,
+        }
+
+    # -------------------
+    # Subscribers
+    # -------------------
+    @property
+    def subscribers(self) -> Dict[WebSocket, Subscriber]:
+        return self.broadcaster.subscribers
+
+    def subscribe(self, websocket: WebSocket):
+        if len(self.broadcaster) >= MAX_SUBSCRIBERS_PER_SESSION:
+            raise SessionLimitError(f"Session {self.id} already has {MAX_SUBSCRIBERS_PER_SESSION} subscribers")
+        self.broadcaster.add(websocket)
+
+    def unsubscribe(self, websocket: WebSocket):
+        self.broadcaster.remove(websocket)
+
+    async def broadcast(self, data: dict):
+        self.broadcaster.publish(data)
+
+    async def publish_analysis(self, data: dict):
+        """Broadcast an analysis result from the scheduler, and persist it (segment records once complete)."""
+        if self.persister is not None and not data.get("pending"):
+            self.persister.enqueue(ANALYSIS_TABLE, {
+                "session_id": self.id,
+                "kind": data["kind"],
+                "data": data["data"],
+                "transcript_length": data["transcript_length"],
+                "timestamp": datetime.utcnow().isoformat(),
+            })
+        if data["kind"] == "objective":
+            self.cached_objective = json.dumps(data["data"])
+        self.bus.publish(self.stream, {"origin": PROCESS_ID, "messages": [data], "created": time.perf_counter()})
+
+    def publish_threadsafe(self, event: dict):
+        """Publish an event on the session's stream from any thread."""
+        event["origin"] = PROCESS_ID
+        event["created"] = time.perf_counter()
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.bus.publish, self.stream, event)
+
+    # -------------------
+    # Message bus
+    # -------------------
+    def on_bus_event(self, event: dict, live: bool):
+        """
+        Apply an event from the session's stream. Events from other processes
+        update this replica's state first; live ones are then broadcast, and
+        new segments are reported to the scheduler.
+        """
+        kind = event.get("event", "messages")
+        local = event.get("origin") == PROCESS_ID
+        if kind == "reset":
+            if not local:
+                self.reset_state()
+                self.transcript_store.align(event["next_seq"])
+            return
+        if kind == "stop":
+            if live and self.recording:
+                self.loop.create_task(self.stop_recording())
+            return
+
+        messages = event["messages"]
+        transcripts = [message for message in messages if message["type"] == "transcript"]
+        segments = event.get("segments") or [{} for _ in transcripts]
+        if not local:
+            self.apply_transcripts(transcripts, segments)
+            for message in messages:
+                if message["type"] == "analysis":
+                    self.apply_analysis(message)
+        if live:
+            self.broadcaster.publish_many(messages, event.get("created") if local else None)
+        if transcripts and "analysis" in self.roles:
+            self.scheduler.submit(
+                sum(segment.get("words", 0) for segment in segments),
+                [message["speaker"] for message in transcripts],
+            )
+            # Segment analyzers refine each segment's analysis block as they finish
+            if live and self.analysing:
+                self.scheduler.analyze_segments([
+                    (message["seq"], message["speaker"], message["transcript"]) for message in transcripts
+                ])
+
+    def apply_transcripts(self, transcripts: List[dict], segments: List[dict]):
+        """Append another process's segments to this replica, keeping their sequence numbers."""
+        store = self.transcript_store
+        for message, segment in zip(transcripts, segments):
+            seq = message["seq"]
+            if seq < store.next_seq:
+                continue  # already applied (publishing is at least once)
+            if seq > store.next_seq:
+                if len(store):
+                    logger.warning(f"Session {self.id} missed segments {store.next_seq}-{seq - 1}; "
+                                   f"restarting its transcript copy at {seq}")
+                    store.clear()
+                store.align(seq)
+            store.append(message["speaker"], message["transcript"], start=message["start"], end=message["end"],
+                         timestamp=segment.get("stored_at"))
+            self.stats.add(Segment(
+                speaker=message["speaker"],
+                text=message["transcript"],
+                start=message["start"],
+                end=message["end"],
+                words=segment.get("words", len(message["transcript"].split())),
+                timings=[tuple(timing) for timing in segment.get("timings", [])],
+                complete=segment.get("complete", True),
+            ))
+
+    def apply_analysis(self, message: dict):
+        """Keep the latest objective and sentiment from the process running the analysis."""
+        if message["kind"] == "objective":
+            self.cached_objective = json.dumps(message["data"])
+        elif message["kind"] == "sentiment":
+            self.sentiment.restore(message["data"])
+
+    async def hold_analysis_lease(self):
+        """Run the scheduler while this process holds the session's analysis lease, renewing it as it goes."""
+        name = f"analysis:{self.id}"
+        while True:
+            try:
+                held = await self.bus.claim(name, PROCESS_ID, BUS_LEASE_TTL)
+            except Exception as e:
+                logger.warning(f"Could not renew the analysis lease of session {self.id}: {e}")
+                held = False
+            if held and not self.analysing:
+                logger.info(f"Running the analysis of session {self.id}")
+                self.scheduler.start()
+            elif not held and self.analysing:
+                logger.info(f"Analysis of session {self.id} moved to another process")
+                await self.scheduler.stop()
+            await asyncio.sleep(BUS_LEASE_TTL / 3)
+
+    def request_stop(self):
+        """Ask whichever process runs this session's audio worker to stop it."""
+        self.bus.publish(self.stream, {"origin": PROCESS_ID, "event": "stop"})
+
+    # -------------------
+    # Recording
+    # -------------------
+    def start_recording(
+        self,
+        source: Optional[AudioSource] = None,
+        backend: Optional[TranscriptionBackend] = None,
+        record: bool = RECORD_SESSIONS,
+    ) -> bool:
+        """
+        Start the audio worker, by default on the local microphone and
+        Deepgram. With `record`, the audio sent and the results received
+        are logged under RECORD_DIR for replay_session.py. Returns False if
+        it is already running.
+        """
+        if self.recording:
+            return False
+        self.audio_source = source or MicrophoneSource()
+        self.backend = backend or DeepgramBackend()
+        self.recorder = SessionRecorder.create(self.id) if record else None
+
+        self.reset_state()
+        # Replicas start over too, numbering on from here
+        self.publish_threadsafe({"event": "reset", "next_seq": self.transcript_store.next_seq})
+
+        self.stop_event.clear()
+        self.audio_thread = threading.Thread(target=self.audio_worker, daemon=True)
+        self.audio_thread.start()
+        return True
+
+    def reset_state(self):
+        """Reset segmenter & store, and everything derived from the transcript."""
+        self.segmenter.reset()
+        self.transcript_store.clear()
+        self.context.reset()
+        self.sentiment.reset()
+        self.stats.reset()
+        self.scheduler.controller.reset()
+        self.cached_objective = None
+
+    async def stop_recording(self) -> bool:
+        """Stop the audio worker. Returns False if it wasn't running."""
+        if not self.recording:
+            return False
+
+        self.stop_event.set()
+        await asyncio.to_thread(self.audio_thread.join)
+        self.audio_thread = None
+        return True
+
+    async def close(self):
+        await self.stop_recording()
+        self.bus.unsubscribe(self.stream)
+        if self.lease_task is not None:
+            self.lease_task.cancel()
+            self.lease_task = None
+            if self.analysing:
+                try:
+                    await self.bus.release(f"analysis:{self.id}", PROCESS_ID)
+                except Exception as e:
+                    logger.warning(f"Could not release the analysis lease of session {self.id}: {e}")
+        await self.scheduler.stop()
+        await self.broadcaster.close()
+        self.transcript_store.close()
+
+    # -------------------
+    # Objective
+    # -------------------
+    async def get_objective(self) -> str:
+        """
+        Return the LLM's textual response for the conversation objective.
+        Serves the latest objective unless the scheduler's rate controller
+        says the transcript changed enough for a new one; concurrent requests
+        for the same transcript version share a single in-flight call.
+        """
+        # If no transcripts, return default message
+        if not self.transcript_store:
+            return DEFAULT_OBJECTIVE
+
+        controller = self.scheduler.controller
+        reason = controller.due("objective")
+        if self.cached_objective and not reason:
+            return self.cached_objective
+
+        # Otherwise, get fresh objective
+        try:
+            entries = self.transcript_store.snapshot()
+            llm_response = await self.objective_flight.do(
+                entries.version, lambda: self.fetch_objective(entries, reason)
+            )
+            # Validate JSON format
+            json.loads(llm_response)  # This will raise an exception if invalid JSON
+            self.cached_objective = llm_response
+            return llm_response
+        except Exception as e:
+            logger.error(f"Error getting objective: {e}")
+            # Return last cached objective if available, otherwise default
+            return self.cached_objective or DEFAULT_OBJECTIVE
+
+    async def fetch_objective(self, entries, reason: Optional[str]) -> str:
+        """An objective request on behalf of the endpoint, counted against the objective budget when due."""
+        if not reason:
+            return await get_meeting_objective(entries, self.context)
+        controller = self.scheduler.controller
+        controller.start({"objective": reason})
+        started = time.perf_counter()
+        ok = False
+        try:
+            llm_response = await get_meeting_objective(entries, self.context)
+            ok = True
+            return llm_response
+        finally:
+            controller.finish(["objective"], time.perf_counter() - started, ok)
+
+    # -------------------
+    # Deepgram Callback
+    # -------------------
+    def on_transcript(self, result):
+        self.last_callback = time.perf_counter()
+        if self.recorder is not None:
+            self.recorder.result(result)
+        if self.audio is not None:
+            # Back onto the meeting's timeline if silence was withheld
+            self.audio.timeline.remap(result)
+        clock = self.audio_clock
+        sent = clock.sent_at(result.start + result.duration) if clock is not None else None
+        if sent is not None:
+            AUDIO_CALLBACK_LATENCY.labels("final" if result.is_final else "interim").observe(self.last_callback - sent)
+        self.publish_update(self.segmenter.process(result))
+
+    def publish_update(self, update: SegmenterUpdate):
+        """
+        Store finished segments and publish them with the interim text on
+        the session's stream, from which they are broadcast and analyzed.
+        Only finished segments reach the store and the LLM.
+        """
+        messages = []
+        segments = []
+        for segment in update.segments:
+            stored_at = time.time()
+            seq = self.transcript_store.append(
+                segment.speaker, segment.text, start=segment.start, end=segment.end, timestamp=stored_at
+            )
+            messages.append(self.transcript_message(segment, seq, self.analyze_segment(segment)))
+            # What replicas need beyond the message to rebuild the store and stats
+            segments.append({
+                "words": segment.words,
+                "timings": segment.timings,
+                "complete": segment.complete,
+                "stored_at": stored_at,
+            })
+            SEGMENTS.labels("true" if segment.complete else "false").inc()
+            if TRACE_SEGMENTS:
+                messages[-1]["trace_id"] = self.trace(segment, seq)
+        if update.segments and (self.persister is not None or self.context_index is not None):
+            rows = [
+                {
+                    "session_id": self.id,
+                    "seq": message["seq"],
+                    "speaker": message["speaker"],
+                    "transcript": message["transcript"],
+                    "start": message["start"],
+                    "end": message["end"],
+                    "timestamp": message["timestamp"],
+                    "analysis": message["analysis"],
+                }
+                for message in messages
+            ]
+            if self.persister is not None:
+                # Spooled locally and sent in bulk later; never waits on the network
+                self.persister.enqueue_many(TRANSCRIPTS_TABLE, rows)
+            if self.context_index is not None:
+                self.context_index.add_many(rows)
+        for interim in update.interims:
+            messages.append({
+                "type": "interim",
+                "speaker": interim.speaker,
+                "name": interim.speaker,
+                "transcript": interim.text,
+                "start": interim.start,
+                "end": interim.end,
+                "timestamp": datetime.utcnow().isoformat(),
+            })
+        if not messages:
+            return
+
+        # --- Publish in order; broadcast and analysis follow from the bus (on_bus_event) ---
+        self.publish_threadsafe({"messages": messages, "segments": segments})
+
+    def trace(self, segment: Segment, seq: int) -> str:
+        """Start the trace of a segment about to be published; its first send finishes it."""
+        trace_id = f"{self.id}-{seq}"
+        clock = self.audio_clock
+        TRACER.start(
+            trace_id,
+            session_id=self.id,
+            seq=seq,
+            audio_sent=clock.sent_at(segment.end) if clock is not None else None,
+            callback=self.last_callback,
+            published=time.perf_counter(),
+        )
+        return trace_id
+
+    def related_statements(self, text: str, seq: int) -> str:
+        """Fact-check context for segment `seq`: the most relevant snippets of this and earlier meetings."""
+        try:
+            return get_previous_transcripts(text, RELATED_CONTEXT_ENTRIES, exclude=(self.id, seq),
+                                            index=self.context_index)
+        except Exception as e:
+            logger.warning(f"Could not look up related statements: {e}")
+            return ""
+
+    def analyze_segment(self, segment: Segment) -> dict:
+        """
+        The segment's `analysis` block, filled locally: no LLM call. Sentiment
+        is the speaker's latest running score; controversy and fallacies
+        default to neutral until the segment analyzers' record for this `seq`
+        arrives as a "segment" analysis message.
+        """
+        analysis = self.stats.add(segment)
+        speaker_sentiment = self.sentiment.speakers.get(segment.speaker)
+        analysis["sentiment"] = round(speaker_sentiment.score, 3) if speaker_sentiment else 0.0
+        analysis["controversial"] = False
+        analysis["fallacies"] = []
+        return analysis
+
+    @staticmethod
+    def transcript_message(segment: Segment, seq: int, analysis: dict) -> dict:
+        return {
+            "type": "transcript",
+            "seq": seq,
+            "speaker": segment.speaker,
+            "name": segment.speaker,
+            "transcript": segment.text,
+            "start": segment.start,
+            "end": segment.end,
+            "timestamp": datetime.utcnow().isoformat(),
+            "analysis": analysis,
+        }
+
+    # -------------------
+    # Audio Thread
+    # -------------------
+    def audio_worker(self):
+        """
+        Send audio to the backend. Capture runs on its own thread and writes
+        into the preprocessor's ring buffer, so a stalled send never holds up
+        the microphone; this thread batches the audio, gates out silence
+        when the backend allows it and keeps the stream alive meanwhile.
+        """
+        logger.info(f"Audio worker starting for session {self.id}...")
+        source, backend = self.audio_source, self.backend
+
+        try:
+            source.open()
+        except Exception as e:
+            logger.error(f"Failed to open audio source: {e}")
+            if self.recorder is not None:
+                self.recorder.close()
+            return
+
+        if not backend.start(self.on_transcript, source.sample_rate, source.channels):
+            logger.error("Failed to start transcription backend")
+            source.close()
+            if self.recorder is not None:
+                self.recorder.close()
+            return
+
+        clock = self.audio_clock = AudioClock(source.bytes_per_second)
+        audio = self.audio = AudioPreprocessor(
+            source.sample_rate, source.channels, gate=AUDIO_VAD and backend.can_skip_silence
+        )
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.meta(
+                session_id=self.id,
+                sample_rate=source.sample_rate,
+                channels=source.channels,
+                backend=type(backend).__name__,
+                gate=audio.gate is not None,
+            )
+        capture = threading.Thread(target=self.capture_worker, args=(source, audio.ring), daemon=True)
+        capture.start()
+        logger.info("Recording started")
+
+        try:
+            while not self.stop_event.is_set():
+                runs = audio.read()
+                if runs is None:
+                    logger.info("Audio source ended")
+                    break
+                for offset, data in runs:
+                    clock.sent(len(data), end=audio.seconds(offset + len(data)))
+                    if recorder is not None:
+                        recorder.audio(offset, data)
+                    backend.send(data)
+                if audio.keepalive_due():
+                    if recorder is not None:
+                        recorder.keep_alive()
+                    backend.keep_alive()
+        except Exception as e:
+            logger.error(f"Audio worker error: {e}")
+        finally:
+            logger.info("Cleaning up audio worker...")
+            audio.ring.close()
+            capture.join()
+            backend.finish()
+            source.close()
+            # Words finalized after the last speech_final still form a segment
+            self.publish_update(self.segmenter.flush())
+            if recorder is not None:
+                recorder.close()
+
+    def capture_worker(self, source: AudioSource, ring: AudioRing):
+        """Read the source into the ring buffer until it ends or recording stops."""
+        try:
+            while not self.stop_event.is_set():
+                data = source.read()
+                if data is None:
+                    break
+                if data and not ring.write(data, block=not source.live):
+                    break
+        except Exception as e:
+            logger.error(f"Audio capture error: {e}")
+        finally:
+            ring.close()
+
+
+class SessionManager:
+    """
+    Owns every live Session in this process, keyed by session id, and
+    enforces the per-process session limit.
+
+    Sessions are announced on the bus's registry stream. With a shared bus,
+    processes with the analysis role open a replica of every session
+    announced anywhere, so one of them can run its analysis, and every
+    process closes its replica when the session is removed.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = MAX_SESSIONS,
+        persister: Optional[WriteBehindPersister] = None,
+        context_index: Optional[ContextIndex] = None,
+        bus: Optional[MessageBus] = None,
+        roles: FrozenSet[str] = PROCESS_ROLES,
+    ):
+        self.max_sessions = max_sessions
+        self.persister = persister
+        self.context_index = context_index
+        self.bus = bus if bus is not None else InProcessBus()
+        self.roles = roles
+        self.sessions: Dict[str, Session] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # Sessions announced while catching up on the registry
+        self.announced: Dict[str, None] = {}
+
+    def start(self):
+        """Bind to the running event loop and follow the registry. Must be called from it (app startup)."""
+        self.loop = asyncio.get_running_loop()
+        if self.bus.shared:
+            self.bus.subscribe(REGISTRY_STREAM, self.on_registry_event, history=True, caught_up=self.open_announced)
+
+    def on_registry_event(self, event: dict, live: bool):
+        if event.get("origin") == PROCESS_ID:
+            return
+        session_id = event["session_id"]
+        if not live:
+            # Only sessions still open once caught up get a replica
+            if event["event"] == "created":
+                self.announced[session_id] = None
+            else:
+                self.announced.pop(session_id, None)
+        elif event["event"] == "created":
+            self.open_replica(session_id)
+        elif session_id in self.sessions:
+            self.loop.create_task(self.remove(session_id, announce=False))
+
+    def open_announced(self):
+        for session_id in self.announced:
+            self.open_replica(session_id)
+        self.announced = {}
+
+    def open_replica(self, session_id: str):
+        if "analysis" not in self.roles or session_id in self.sessions:
+            return
+        try:
+            self.create(session_id, announce=False)
+        except SessionLimitError as e:
+            logger.warning(f"Not following session {session_id}: {e}")
+
+    def get(self, session_id: str) -> Optional[Session]:
+        return self.sessions.get(session_id)
+
+    def create(self, session_id: Optional[str] = None, announce: bool = True) -> Session:
+        session_id = session_id or uuid.uuid4().hex
+        if session_id in self.sessions:
+            return self.sessions[session_id]
+        if len(self.sessions) >= self.max_sessions:
+            raise SessionLimitError(f"Session limit of {self.max_sessions} reached")
+        session = Session(
+            session_id, self.loop or asyncio.get_running_loop(), self.persister, self.context_index,
+            bus=self.bus, roles=self.roles,
+        )
+        session.start()
+        self.sessions[session_id] = session
+        if announce:
+            self.bus.publish(REGISTRY_STREAM, {"origin": PROCESS_ID, "event": "created", "session_id": session_id})
+        logger.info(f"Session {session_id} created. Total sessions: {len(self.sessions)}")
+        return session
+
+    def get_or_create(self, session_id: str) -> Session:
+        return self.sessions.get(session_id) or self.create(session_id)
+
+    async def remove(self, session_id: str, announce: bool = True) -> bool:
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return False
+        await session.close()
+        if announce:
+            self.bus.publish(REGISTRY_STREAM, {"origin": PROCESS_ID, "event": "removed", "session_id": session_id})
+            # A session created again under this id starts from an empty stream
+            self.bus.drop(session.stream)
+        logger.info(f"Session {session_id} removed. Total sessions: {len(self.sessions)}")
+        return True
+
+    async def close(self):
+        """Close this process's sessions; with a shared bus, other processes keep theirs."""
+        if self.bus.shared:
+            self.bus.unsubscribe(REGISTRY_STREAM)
+        for session_id in list(self.sessions):
+            await self.remove(session_id, announce=not self.bus.shared)
@@ -0,0 +1,40 @@
+# singleflight.py
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one in-flight future.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running await the same future instead of starting their own. Once
+    the work finishes the key is forgotten, so the next call runs afresh.
+    """
+
+    def __init__(self):
+        self.calls: Dict[Hashable, asyncio.Future] = {}
+        self.started = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        future = self.calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self.calls[key] = future
+            future.add_done_callback(lambda f: self._forget(key, f))
+            self.started += 1
+        else:
+            self.shared += 1
+        # A waiter going away (e.g. a disconnected poller) must not cancel
+        # the work the other waiters share.
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: asyncio.Future):
+        if self.calls.get(key) is future:
+            del self.calls[key]
+        if not future.cancelled():
+            future.exception()  # mark retrieved even if every waiter left
@@ -0,0 +1,181 @@
+# speaker_stats.py
+
+import os
+import re
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+from segmenter import Segment
+
+# A turn starting within this many seconds of the previous speaker's last
+# word, while that speaker's utterance was still open, counts as an interruption
+INTERRUPTION_GAP = float(os.getenv("INTERRUPTION_GAP", "0.3"))
+
+# Weight of novelty (content words not heard before in the meeting) versus
+# content-word ratio in the info density score
+NOVELTY_WEIGHT = 0.5
+
+WORD_RE = re.compile(r"[a-z0-9']+")
+
+# Function words that carry little information on their own
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further
+had has have having he her here hers herself him himself his how i if in into is it its itself
+just let me more most my myself no nor not now of off on once only or other our ours ourselves
+out over own same she should so some such than that the their theirs them themselves then there
+these they this those through to too under until up very was we were what when where which while
+who whom why will with would you your yours yourself yourselves yeah yes okay ok oh um uh like
+well really actually gonna get got going know think mean right thing things also
+i'm i've i'll i'd you're you've we're we've we'll they're it's that's there's let's don't
+didn't doesn't isn't aren't wasn't can't won't
+""".split())
+
+# Columns of the per-speaker arrays
+TALK_TIME, WORDS, SEGMENTS, TURNS, INTERRUPTIONS, INTERRUPTED, OVERLAPS, OVERLAP_TIME, DENSITY = range(9)
+COLUMNS = 9
+
+
+def density_score(tokens: List[str], vocabulary: set) -> float:
+    """
+    Lexical information density of one segment in [0, 1]: the share of
+    content (non-stopword) words, blended with the share of those content
+    words that are new to the meeting. Adds the new words to `vocabulary`.
+    """
+    if not tokens:
+        return 0.0
+    content = [t for t in tokens if t not in STOPWORDS]
+    if not content:
+        return 0.0
+    unique = set(content)
+    novel = unique - vocabulary
+    vocabulary |= novel
+    return (1 - NOVELTY_WEIGHT) * len(content) / len(tokens) + NOVELTY_WEIGHT * len(novel) / len(unique)
+
+
+class SpeakerStats:
+    """
+    Speaker-level meeting analytics computed locally from finalized segments:
+    talk time, words per minute, turns, interruptions and overlaps (from
+    Deepgram word timings) and lexical information density.
+
+    Per-speaker totals live in one float array, a row per speaker, so adding
+    a segment is a handful of scalar updates and `summary` derives every
+    ratio for all speakers at once.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.speakers: Dict[str, int] = {}
+            self.totals = np.zeros((0, COLUMNS))
+            self.vocabulary: set = set()
+            self.last_speaker = None
+            self.last_end = 0.0
+            self.last_complete = True
+            self.first_start = None
+            self.latest_end = 0.0
+
+    def _row(self, speaker: str) -> int:
+        row = self.speakers.get(speaker)
+        if row is None:
+            row = len(self.speakers)
+            self.speakers[speaker] = row
+            self.totals = np.vstack([self.totals, np.zeros(COLUMNS)])
+        return row
+
+    def add(self, segment: Segment) -> dict:
+        """Account for a finalized segment and return its analysis metrics."""
+        timings = np.asarray(segment.timings, dtype=float).reshape(-1, 2)
+        tokens = WORD_RE.findall(segment.text.lower())
+
+        with self.lock:
+            row = self._row(segment.speaker)
+            totals = self.totals[row]
+            start = float(timings[0, 0]) if len(timings) else segment.start
+            end = float(timings[-1, 1]) if len(timings) else segment.end
+            duration = max(end - start, 0.0)
+            words = len(tokens)
+
+            turn = segment.speaker != self.last_speaker
+            overlap = turn and self.last_speaker is not None and start < self.last_end
+            interruption = (
+                turn and self.last_speaker is not None and not self.last_complete
+                and start - self.last_end < INTERRUPTION_GAP
+            )
+            if overlap:
+                totals[OVERLAPS] += 1
+                # Time this turn's words spent over the previous speaker's last word
+                word_starts, word_ends = timings[:, 0], timings[:, 1]
+                totals[OVERLAP_TIME] += float(np.clip(self.last_end - word_starts, 0, word_ends - word_starts).sum())
+            if interruption:
+                totals[INTERRUPTIONS] += 1
+                self.totals[self.speakers[self.last_speaker], INTERRUPTED] += 1
+
+            density = density_score(tokens, self.vocabulary)
+            totals[TALK_TIME] += duration
+            totals[WORDS] += words
+            totals[SEGMENTS] += 1
+            totals[TURNS] += turn
+            totals[DENSITY] += density
+
+            if self.first_start is None:
+                self.first_start = start
+            self.latest_end = max(self.latest_end, end)
+            self.last_speaker = segment.speaker
+            self.last_end = end
+            self.last_complete = segment.complete
+
+        return {
+            "info_density": round(density, 3),
+            "wpm": round(words / duration * 60, 1) if duration > 0 else 0.0,
+            "turn": turn,
+            "interruption": bool(interruption),
+            "overlap": bool(overlap),
+        }
+
+    def summary(self) -> dict:
+        """Per-speaker totals and derived ratios for the whole meeting so far."""
+        with self.lock:
+            names = list(self.speakers)
+            totals = self.totals.copy()
+            elapsed = self.latest_end - self.first_start if self.first_start is not None else 0.0
+
+        talk = totals[:, TALK_TIME]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            share = np.nan_to_num(talk / talk.sum()).round(3)
+            wpm = np.nan_to_num(totals[:, WORDS] / talk * 60).round(1)
+            density = np.nan_to_num(totals[:, DENSITY] / totals[:, SEGMENTS]).round(3)
+        counts = totals.astype(int).tolist()
+        rounded = totals.round(2).tolist()
+        share, wpm, density = share.tolist(), wpm.tolist(), density.tolist()
+
+        speakers = [
+            {
+                "speaker": name,
+                "talk_time": rounded[i][TALK_TIME],
+                "talk_share": share[i],
+                "words": counts[i][WORDS],
+                "wpm": wpm[i],
+                "segments": counts[i][SEGMENTS],
+                "turns": counts[i][TURNS],
+                "interruptions": counts[i][INTERRUPTIONS],
+                "interrupted": counts[i][INTERRUPTED],
+                "overlaps": counts[i][OVERLAPS],
+                "overlap_time": rounded[i][OVERLAP_TIME],
+                "info_density": density[i],
+            }
+            for i, name in enumerate(names)
+        ]
+        return {
+            "elapsed": round(max(elapsed, 0.0), 2),
+            "turns": sum(row[TURNS] for row in counts),
+            "interruptions": sum(row[INTERRUPTIONS] for row in counts),
+            "overlaps": sum(row[OVERLAPS] for row in counts),
+            "speakers": speakers,
+        }
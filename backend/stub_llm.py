@@ -0,0 +1,242 @@
+# stub_llm.py
+#
+# Local OpenAI-compatible stub of the analysis LLM, for offline development and
+# benchmarks. Answers the prompts in analysis.py with deterministic canned JSON
+# after a configurable delay: time to first token plus time per generated token.
+# Supports streamed ("stream": true) completions.
+#
+#   python stub_llm.py --port 9000 --latency-ms 800
+#   LLM_BASE_URL=http://localhost:9000/v1 uvicorn main:app --port 8000
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import uuid
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+STUB_LATENCY_MS = float(os.getenv("STUB_LLM_LATENCY_MS", "500"))
+STUB_JITTER_MS = float(os.getenv("STUB_LLM_JITTER_MS", "0"))
+STUB_ERROR_RATE = float(os.getenv("STUB_LLM_ERROR_RATE", "0"))
+# Generation time per completion token (~4 characters)
+STUB_TOKEN_MS = float(os.getenv("STUB_LLM_TOKEN_MS", "0"))
+# Share of JSON answers cut off mid-document, to exercise the repair retry
+STUB_MALFORMED_RATE = float(os.getenv("STUB_LLM_MALFORMED_RATE", "0"))
+
+POSITIVE_WORDS = {"good", "great", "thanks", "sure", "works", "agree", "fix", "brilliant", "progress", "completed"}
+NEGATIVE_WORDS = {"bug", "issue", "critical", "risk", "bankrupt", "steal", "irresponsible", "don't", "trick", "problem"}
+# Phrases the per-message fallacy and controversy answers key on
+FALLACY_PATTERNS = [
+    (r"\b(everyone|everybody) knows\b[^.!?]*", "Appeal to Popularity",
+     "Treats a claim as true because it is widely believed."),
+    (r"\bif we\b[^.!?]*\b(then|we'll|we will)\b[^.!?]*", "Slippery Slope",
+     "Assumes one step will inevitably lead to an extreme outcome."),
+    (r"\b(always|never)\b[^.!?]*", "Hasty Generalization",
+     "Draws a sweeping conclusion from limited evidence."),
+]
+CONTROVERSIAL_WORDS = {"unbreakable", "totally", "completely", "guarantee", "never", "always", "bankrupt", "steal"}
+
+app = FastAPI()
+stats = {"requests": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def lexical_sentiment(text: str) -> float:
+    words = re.findall(r"[a-z']+", text.lower())
+    pos = sum(word in POSITIVE_WORDS for word in words)
+    neg = sum(word in NEGATIVE_WORDS for word in words)
+    if pos + neg == 0:
+        return 0.0
+    return round((pos - neg) / (pos + neg), 2)
+
+
+def speaker_texts(conversation: str) -> dict:
+    texts = {}
+    for line in conversation.splitlines():
+        match = re.match(r"(Speaker \d+|Unknown)\b[^:]*: (.*)", line)
+        if match:
+            texts[match.group(1)] = texts.get(match.group(1), "") + " " + match.group(2)
+    return texts
+
+
+def message_answer(system_prompt: str, text: str) -> str:
+    """Canned answers for the per-message analyzers."""
+    words = re.findall(r"[a-z']+", text.lower())
+    if "information density" in system_prompt:
+        long_words = {word for word in words if len(word) > 4}
+        return json.dumps({"info_density": round(min(1.0, 2 * len(long_words) / max(1, len(words))), 2)})
+    if "controversial" in system_prompt:
+        return json.dumps({"controversial": any(word in CONTROVERSIAL_WORDS for word in words)})
+    if "logical fallacies" in system_prompt:
+        fallacies = []
+        for pattern, name, explanation in FALLACY_PATTERNS:
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match:
+                fallacies.append({"type": name, "segment": match.group(0).strip(), "explanation": explanation})
+        return json.dumps({"fallacies": fallacies})
+    return json.dumps({"sentiment": lexical_sentiment(text)})
+
+
+def answer(system_prompt: str, user_content: str) -> str:
+    """Pick a canned answer shaped like the prompt in analysis.py that asked."""
+    if "running summary" in system_prompt:
+        return " ".join(user_content.split()[-120:])
+
+    if "a single message" in system_prompt:
+        # Speaker- and meeting-scope prompts put earlier context before the message
+        return message_answer(system_prompt, user_content.rsplit("Message:\n", 1)[-1])
+
+    if "New text per speaker" in system_prompt:
+        updates = user_content.split("New text per speaker:\n", 1)[-1]
+        return json.dumps({
+            "Objective": "Discuss project progress and next steps",
+            "Sentiment": [
+                {"Speaker": speaker, "Sentiment": lexical_sentiment(text)}
+                for speaker, text in speaker_texts(updates).items()
+            ],
+        })
+
+    if "sentiment" in system_prompt.lower():
+        match = re.search(r"^Speaker: (.*)$", user_content, re.MULTILINE)
+        if match:
+            new_text = user_content.split("New text: ", 1)[-1]
+            return json.dumps([{"Speaker": match.group(1), "Sentiment": lexical_sentiment(new_text)}])
+        return json.dumps([
+            {"Speaker": speaker, "Sentiment": lexical_sentiment(text)}
+            for speaker, text in speaker_texts(user_content).items()
+        ])
+
+    return json.dumps([{"Objective": "Discuss project progress and next steps"}])
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+
+    delay = STUB_LATENCY_MS + random.uniform(-STUB_JITTER_MS, STUB_JITTER_MS)
+    await asyncio.sleep(max(0.0, delay) / 1000)
+
+    if random.random() < STUB_ERROR_RATE:
+        stats["errors"] += 1
+        raise HTTPException(status_code=503, detail="Stub LLM: injected failure")
+
+    messages = body.get("messages", [])
+    system_prompt = next((m["content"] for m in messages if m["role"] == "system"), "")
+    user_content = next((m["content"] for m in messages if m["role"] == "user"), "")
+    content = answer(system_prompt, user_content)
+    repair = any("could not be used" in m["content"] for m in messages if m["role"] == "user")
+    if content.startswith(("[", "{")) and not repair and random.random() < STUB_MALFORMED_RATE:
+        content = content[: len(content) // 2]
+
+    prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+    completion_tokens = estimate_tokens(content)
+    stats["prompt_tokens"] += prompt_tokens
+    stats["completion_tokens"] += completion_tokens
+
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    model = body.get("model", "stub")
+    if body.get("stream"):
+        return StreamingResponse(stream_chunks(completion_id, model, content), media_type="text/event-stream")
+
+    await asyncio.sleep(completion_tokens * STUB_TOKEN_MS / 1000)
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+async def stream_chunks(completion_id: str, model: str, content: str):
+    """Server-sent chat.completion.chunk events, one ~token of content at a time."""
+    def event(delta: dict, finish_reason=None) -> str:
+        return "data: " + json.dumps({
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }) + "\n\n"
+
+    yield event({"role": "assistant", "content": ""})
+    for start in range(0, len(content), 4):
+        await asyncio.sleep(STUB_TOKEN_MS / 1000)
+        yield event({"content": content[start:start + 4]})
+    yield event({}, "stop")
+    yield "data: [DONE]\n\n"
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+def configure(
+    latency_ms: float = None,
+    jitter_ms: float = None,
+    error_rate: float = None,
+    token_ms: float = None,
+    malformed_rate: float = None,
+):
+    global STUB_LATENCY_MS, STUB_JITTER_MS, STUB_ERROR_RATE, STUB_TOKEN_MS, STUB_MALFORMED_RATE
+    if latency_ms is not None:
+        STUB_LATENCY_MS = latency_ms
+    if jitter_ms is not None:
+        STUB_JITTER_MS = jitter_ms
+    if error_rate is not None:
+        STUB_ERROR_RATE = error_rate
+    if token_ms is not None:
+        STUB_TOKEN_MS = token_ms
+    if malformed_rate is not None:
+        STUB_MALFORMED_RATE = malformed_rate
+
+
+def serve_in_background(port: int = 9000, **config):
+    """
+    Run the stub in a daemon thread (for benchmarks) and return the uvicorn
+    server once it accepts connections. Stop it with `server.should_exit = True`.
+    """
+    import threading
+    import uvicorn
+
+    configure(**config)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub LLM")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=STUB_LATENCY_MS)
+    parser.add_argument("--jitter-ms", type=float, default=STUB_JITTER_MS)
+    parser.add_argument("--error-rate", type=float, default=STUB_ERROR_RATE)
+    parser.add_argument("--token-ms", type=float, default=STUB_TOKEN_MS)
+    parser.add_argument("--malformed-rate", type=float, default=STUB_MALFORMED_RATE)
+    args = parser.parse_args()
+
+    configure(args.latency_ms, args.jitter_ms, args.error_rate, args.token_ms, args.malformed_rate)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,143 @@
+# stub_postgrest.py
+#
+# Local PostgREST-compatible stub of the Supabase REST API, for developing and
+# testing persistence offline. Keeps rows in memory per table, accepts bulk
+# inserts and simple selects, and can inject latency, errors and outages.
+#
+#   python stub_postgrest.py --port 3000
+#   PERSIST_ENABLED=1 SUPABASE_URL=http://localhost:3000/rest/v1 uvicorn main:app --port 8000
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Dict, List
+
+from fastapi import FastAPI, HTTPException, Request, Response
+
+STUB_LATENCY_MS = float(os.getenv("STUB_PG_LATENCY_MS", "20"))
+STUB_ERROR_RATE = float(os.getenv("STUB_PG_ERROR_RATE", "0"))
+
+app = FastAPI()
+tables: Dict[str, List[dict]] = {}
+stats = {"inserts": 0, "rows": 0, "errors": 0}
+# While True every request fails with 503, as during an outage
+outage = {"down": False}
+
+
+@app.post("/rest/v1/{table}")
+async def insert(table: str, request: Request):
+    await asyncio.sleep(STUB_LATENCY_MS / 1000)
+    if outage["down"] or random.random() < STUB_ERROR_RATE:
+        stats["errors"] += 1
+        raise HTTPException(status_code=503, detail="Stub PostgREST: injected failure")
+
+    body = await request.json()
+    rows = body if isinstance(body, list) else [body]
+    if any(not isinstance(row, dict) for row in rows):
+        raise HTTPException(status_code=400, detail="Expected a JSON object or array of objects")
+    keys = set(rows[0]) if rows else set()
+    if any(set(row) != keys for row in rows):
+        # PostgREST's PGRST102: bulk inserts need the same keys in every object
+        raise HTTPException(status_code=400, detail="All object keys must match")
+
+    tables.setdefault(table, []).extend(rows)
+    stats["inserts"] += 1
+    stats["rows"] += len(rows)
+    if "return=minimal" in request.headers.get("prefer", ""):
+        return Response(status_code=201)
+    return Response(status_code=201, content=json.dumps(rows), media_type="application/json")
+
+
+# Horizontal filters understood by the stub (?column=op.value)
+FILTERS = {
+    "eq": lambda a, b: a == b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+}
+
+
+def matches(row: dict, column: str, condition: str) -> bool:
+    op, _, value = condition.partition(".")
+    cell = row.get(column)
+    if cell is None:
+        return False
+    if not isinstance(cell, str):
+        try:
+            value = type(cell)(json.loads(value))
+        except (ValueError, TypeError):
+            return False
+    return FILTERS[op](cell, value)
+
+
+@app.get("/rest/v1/{table}")
+async def select(table: str, request: Request, order: str = None, limit: int = None):
+    rows = list(tables.get(table, []))
+    for column, condition in request.query_params.items():
+        if column in ("select", "order", "limit") or condition.partition(".")[0] not in FILTERS:
+            continue
+        rows = [row for row in rows if matches(row, column, condition)]
+    if order:
+        column, _, direction = order.partition(".")
+        rows.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=direction == "desc")
+    if limit is not None:
+        rows = rows[:limit]
+    columns = request.query_params.get("select", "*")
+    if columns != "*":
+        wanted = columns.split(",")
+        rows = [{column: row.get(column) for column in wanted} for row in rows]
+    return rows
+
+
+@app.get("/stats")
+async def get_stats():
+    return {**stats, "tables": {name: len(rows) for name, rows in tables.items()}, "down": outage["down"]}
+
+
+@app.post("/outage")
+async def set_outage(down: bool = True):
+    outage["down"] = down
+    return {"down": down}
+
+
+def configure(latency_ms: float = None, error_rate: float = None, down: bool = None):
+    global STUB_LATENCY_MS, STUB_ERROR_RATE
+    if latency_ms is not None:
+        STUB_LATENCY_MS = latency_ms
+    if error_rate is not None:
+        STUB_ERROR_RATE = error_rate
+    if down is not None:
+        outage["down"] = down
+
+
+def serve_in_background(port: int = 3000, **config):
+    """
+    Run the stub in a daemon thread (for tests and benchmarks) and return the
+    uvicorn server once it accepts connections. Stop it with `server.should_exit = True`.
+    """
+    import threading
+    import uvicorn
+
+    configure(**config)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local PostgREST-compatible stub")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--latency-ms", type=float, default=STUB_LATENCY_MS)
+    parser.add_argument("--error-rate", type=float, default=STUB_ERROR_RATE)
+    args = parser.parse_args()
+
+    configure(args.latency_ms, args.error_rate)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
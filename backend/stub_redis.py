@@ -0,0 +1,329 @@
+# stub_redis.py
+#
+# Local stand-in for the Redis server the message bus uses (MESSAGE_BUS=redis),
+# for running several workers and the bus benchmark without installing Redis.
+# Speaks RESP2 and implements just the commands the bus sends: streams (XADD
+# with MAXLEN, XRANGE, XREVRANGE, blocking XREAD, XLEN), leases (SET NX PX,
+# GET, PEXPIRE, DEL, and EVAL of the bus's two lease scripts, which run as
+# Python equivalents) and PING. Data lives in memory; `--latency-ms` delays
+# every command, as a network hop would.
+#
+#   python stub_redis.py --port 6390
+#   MESSAGE_BUS=redis REDIS_URL=redis://localhost:6390/0 PROCESS_ROLES=ingest uvicorn main:app --port 8000
+#   MESSAGE_BUS=redis REDIS_URL=redis://localhost:6390/0 PROCESS_ROLES=analysis,fanout uvicorn main:app --port 8001
+
+import argparse
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from bus import LEASE_CLAIM_SCRIPT, LEASE_RELEASE_SCRIPT
+
+STUB_LATENCY_MS = float(os.getenv("STUB_REDIS_LATENCY_MS", "0"))
+
+EntryId = Tuple[int, int]
+Entry = Tuple[EntryId, List[bytes]]
+
+
+class NilArray:
+    """The null array XREAD answers with when a blocking read times out."""
+
+
+class CommandError(Exception):
+    pass
+
+
+def parse_id(value: bytes, default_seq: int) -> EntryId:
+    text = value.decode()
+    if "-" in text:
+        ms, seq = text.split("-", 1)
+        return int(ms), int(seq)
+    return int(text), default_seq
+
+
+def format_id(entry_id: EntryId) -> bytes:
+    return f"{entry_id[0]}-{entry_id[1]}".encode()
+
+
+def range_bound(value: bytes, low: bool) -> Tuple[EntryId, bool]:
+    """An XRANGE bound as (id, exclusive)."""
+    if value == b"-":
+        return (0, 0), False
+    if value == b"+":
+        return (2 ** 64, 0), False
+    exclusive = value.startswith(b"(")
+    return parse_id(value[1:] if exclusive else value, 0 if low else 2 ** 64), exclusive
+
+
+class Store:
+    def __init__(self):
+        self.streams: Dict[bytes, List[Entry]] = {}
+        self.values: Dict[bytes, Tuple[bytes, Optional[float]]] = {}  # key -> (value, expires at)
+        self.changed = asyncio.Event()
+        self.commands = 0
+
+    def _value(self, key: bytes) -> Optional[bytes]:
+        item = self.values.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= time.monotonic():
+            del self.values[key]
+            return None
+        return item[0]
+
+    def ping(self, *args):
+        return b"PONG" if not args else args[0]
+
+    def client(self, *args):
+        return "OK"
+
+    def select(self, db):
+        return "OK"
+
+    def set(self, key, value, *options):
+        options = [o.upper() for o in options]
+        expires = None
+        for i, option in enumerate(options):
+            if option == b"PX":
+                expires = time.monotonic() + int(options[i + 1]) / 1000
+            elif option == b"EX":
+                expires = time.monotonic() + int(options[i + 1])
+        if b"NX" in options and self._value(key) is not None:
+            return None
+        if b"XX" in options and self._value(key) is None:
+            return None
+        self.values[key] = (value, expires)
+        return "OK"
+
+    def get(self, key):
+        return self._value(key)
+
+    def pexpire(self, key, ms):
+        value = self._value(key)
+        if value is None:
+            return 0
+        self.values[key] = (value, time.monotonic() + int(ms) / 1000)
+        return 1
+
+    def delete(self, *keys):
+        removed = 0
+        for key in keys:
+            removed += (self._value(key) is not None) + (self.streams.pop(key, None) is not None)
+            self.values.pop(key, None)
+        return removed
+
+    def eval(self, script, numkeys, *args):
+        # Commands run one at a time, so a script is atomic here as in Redis
+        keys, argv = args[:int(numkeys)], args[int(numkeys):]
+        script = script.decode()
+        if script == LEASE_CLAIM_SCRIPT:
+            if self._value(keys[0]) == argv[0]:
+                return self.pexpire(keys[0], argv[1])
+            return 1 if self.set(keys[0], argv[0], b"NX", b"PX", argv[1]) else 0
+        if script == LEASE_RELEASE_SCRIPT:
+            if self._value(keys[0]) == argv[0]:
+                return self.delete(keys[0])
+            return 0
+        raise CommandError("only the bus's lease scripts are supported")
+
+    def xadd(self, key, *args):
+        args = list(args)
+        maxlen = None
+        if args and args[0].upper() == b"MAXLEN":
+            args.pop(0)
+            if args[0] in (b"~", b"="):
+                args.pop(0)
+            maxlen = int(args.pop(0))
+        requested, fields = args[0], args[1:]
+        if not fields or len(fields) % 2:
+            raise CommandError("wrong number of arguments for 'xadd' command")
+        stream = self.streams.setdefault(key, [])
+        last = stream[-1][0] if stream else (0, 0)
+        if requested == b"*":
+            now = int(time.time() * 1000)
+            entry_id = (now, 0) if now > last[0] else (last[0], last[1] + 1)
+        else:
+            entry_id = parse_id(requested, 0)
+            if entry_id <= last:
+                raise CommandError("The ID specified in XADD is equal or smaller than the target stream top item")
+        stream.append((entry_id, fields))
+        if maxlen is not None and len(stream) > maxlen:
+            del stream[:len(stream) - maxlen]
+        self.changed.set()
+        self.changed = asyncio.Event()
+        return format_id(entry_id)
+
+    def xlen(self, key):
+        return len(self.streams.get(key, ()))
+
+    def _range(self, key, low, high) -> List[Entry]:
+        (start, start_excl), (end, end_excl) = range_bound(low, True), range_bound(high, False)
+        return [
+            entry for entry in self.streams.get(key, ())
+            if (entry[0] > start if start_excl else entry[0] >= start)
+            and (entry[0] < end if end_excl else entry[0] <= end)
+        ]
+
+    def xrange(self, key, low, high, *options):
+        count = int(options[1]) if len(options) >= 2 and options[0].upper() == b"COUNT" else None
+        return [encode_entry(e) for e in self._range(key, low, high)[:count]]
+
+    def xrevrange(self, key, high, low, *options):
+        count = int(options[1]) if len(options) >= 2 and options[0].upper() == b"COUNT" else None
+        return [encode_entry(e) for e in self._range(key, low, high)[::-1][:count]]
+
+    async def xread(self, *args):
+        args = list(args)
+        count, block = None, None
+        while args and args[0].upper() != b"STREAMS":
+            option = args.pop(0).upper()
+            if option == b"COUNT":
+                count = int(args.pop(0))
+            elif option == b"BLOCK":
+                block = int(args.pop(0))
+        args.pop(0)
+        half = len(args) // 2
+        keys, ids = args[:half], args[half:]
+        after = []
+        for key, requested in zip(keys, ids):
+            stream = self.streams.get(key)
+            if requested == b"$":
+                after.append(stream[-1][0] if stream else (0, 0))
+            else:
+                after.append(parse_id(requested, 0))
+        deadline = None if not block else time.monotonic() + block / 1000
+        while True:
+            found = []
+            for key, last in zip(keys, after):
+                entries = [e for e in self.streams.get(key, ()) if e[0] > last][:count]
+                if entries:
+                    found.append([key, [encode_entry(e) for e in entries]])
+            if found:
+                return found
+            if block is None:
+                return NilArray()
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return NilArray()
+            try:
+                await asyncio.wait_for(self.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return NilArray()
+
+
+def encode_entry(entry: Entry) -> list:
+    return [format_id(entry[0]), entry[1]]
+
+
+def encode(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, NilArray):
+        return b"*-1\r\n"
+    if isinstance(value, str):
+        return b"+" + value.encode() + b"\r\n"
+    if isinstance(value, CommandError):
+        return b"-ERR " + str(value).encode() + b"\r\n"
+    if isinstance(value, int):
+        return b":" + str(value).encode() + b"\r\n"
+    if isinstance(value, bytes):
+        return b"$" + str(len(value)).encode() + b"\r\n" + value + b"\r\n"
+    return b"*" + str(len(value)).encode() + b"\r\n" + b"".join(encode(v) for v in value)
+
+
+async def read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.split()  # inline command
+    args = []
+    for _ in range(int(line[1:])):
+        size = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(size + 2))[:-2])
+    return args
+
+
+class StubRedis:
+    def __init__(self, latency_ms: float = STUB_LATENCY_MS):
+        self.store = Store()
+        self.latency = latency_ms / 1000
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                args = await read_command(reader)
+                if args is None:
+                    break
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                writer.write(encode(await self.execute(args)))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def execute(self, args: List[bytes]):
+        self.store.commands += 1
+        name = args[0].decode().lower()
+        command = getattr(self.store, "delete" if name == "del" else name, None)
+        if command is None or name.startswith("_"):
+            return CommandError(f"unknown command '{name}'")
+        try:
+            result = command(*args[1:])
+            if asyncio.iscoroutine(result):
+                result = await result
+            return result
+        except CommandError as e:
+            return e
+        except (TypeError, ValueError, IndexError) as e:
+            return CommandError(str(e))
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 6390):
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+
+    def stop(self):
+        """Stop accepting connections (from any thread)."""
+        self.loop.call_soon_threadsafe(self.server.close)
+
+
+def serve_in_background(port: int = 6390, latency_ms: float = STUB_LATENCY_MS) -> StubRedis:
+    """
+    Run the stub on its own event loop in a daemon thread (for benchmarks)
+    and return it once it accepts connections. Stop it with `stub.stop()`.
+    """
+    stub = StubRedis(latency_ms)
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(stub.serve(port=port))
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return stub
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Redis stub for the message bus")
+    parser.add_argument("--port", type=int, default=6390)
+    parser.add_argument("--latency-ms", type=float, default=STUB_LATENCY_MS, help="delay added to every command")
+    args = parser.parse_args()
+
+    async def main():
+        server = await StubRedis(args.latency_ms).serve("0.0.0.0", args.port)
+        print(f"Stub Redis listening on port {args.port}")
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
@@ -1,18 +1,96 @@
+import logging
 import os
+import time
+from typing import List, Optional, Tuple
+
 import requests
 
+from context_index import CONTEXT_INDEX_DIR, CONTEXT_TOP_K, DOC_FIELDS, ContextIndex, get_context_index
+from persister import WriteBehindPersister
+
+logger = logging.getLogger(__name__)
+
 SUPABASE_API_KEY = os.getenv("SUPABASE_API_KEY")
 PROJECT_ID = os.getenv("SUPABASE_PROJECT_ID")  # e.g., "mqaiuwpvphctupwtvidm"
-SUPABASE_URL = f"https://{PROJECT_ID}.supabase.co/rest/v1"
+# Any PostgREST-compatible endpoint works, e.g. the local stub in stub_postgrest.py:
+#   SUPABASE_URL=http://localhost:3000/rest/v1
+SUPABASE_URL = os.getenv("SUPABASE_URL") or f"https://{PROJECT_ID}.supabase.co/rest/v1"
+
+# Tables the live pipeline writes to through the write-behind persister
+TRANSCRIPTS_TABLE = os.getenv("SUPABASE_TRANSCRIPTS_TABLE", "transcripts")
+ANALYSIS_TABLE = os.getenv("SUPABASE_ANALYSIS_TABLE", "analysis")
+
+# Columns the persister writes; the README ("Persistence") has the DDL and
+# the migration for a transcripts table created before these were added
+TRANSCRIPTS_COLUMNS = ("session_id", "seq", "speaker", "transcript", "start", "end", "timestamp", "analysis")
+ANALYSIS_COLUMNS = ("session_id", "kind", "data", "transcript_length", "timestamp")
+
+SUPABASE_CONFIGURED = bool(os.getenv("SUPABASE_URL") or PROJECT_ID)
+
+# Seconds between pulls of other processes' snippets into the context index
+# (0 = only at startup)
+CONTEXT_SYNC_INTERVAL = float(os.getenv("CONTEXT_SYNC_INTERVAL", "60"))
+
+# Persist live transcripts and analysis. Off by default: turn it on once the
+# tables have the columns above
+PERSIST_ENABLED = os.getenv("PERSIST_ENABLED", "false").lower() in ("1", "true", "yes")
+
+def supabase_headers() -> dict:
+    return {
+        "apikey": SUPABASE_API_KEY or "",
+        "Authorization": f"Bearer {SUPABASE_API_KEY or ''}",
+    }
 
-# Insert a transcript (or analysis) row into the "transcripts" table
+def make_persister() -> Optional[WriteBehindPersister]:
+    """The write-behind persister for the live pipeline, or None if persistence is off."""
+    if not PERSIST_ENABLED:
+        return None
+    return WriteBehindPersister(SUPABASE_URL, supabase_headers())
+
+def make_context_index() -> Optional[ContextIndex]:
+    """
+    The context index for the live pipeline, or None if it is off. It keeps
+    what meetings said, so it only runs when persistence is on or
+    CONTEXT_INDEX_DIR asks for it.
+    """
+    if not (PERSIST_ENABLED or CONTEXT_INDEX_DIR):
+        return None
+    return get_context_index()
+
+def check_schema() -> List[str]:
+    """
+    Ask Supabase whether the persisted tables have every column the persister
+    writes. Returns one problem per table that doesn't (empty when the schema
+    is in place); raises requests.RequestException if Supabase can't be reached.
+    """
+    problems = []
+    for table, columns in ((TRANSCRIPTS_TABLE, TRANSCRIPTS_COLUMNS), (ANALYSIS_TABLE, ANALYSIS_COLUMNS)):
+        response = requests.get(
+            f"{SUPABASE_URL}/{table}",
+            params={"select": ",".join(columns), "limit": "0"},
+            headers=supabase_headers(),
+            timeout=5,
+        )
+        if response.status_code in (400, 404):
+            # PostgREST: 400 for an unknown column, 404 for an unknown table
+            try:
+                message = response.json().get("message") or response.text
+            except ValueError:
+                message = response.text
+            problems.append(f"{table}: {message}")
+        else:
+            response.raise_for_status()
+    return problems
+
+# Insert a transcript (or analysis) row into the "transcripts" table and return
+# the inserted rows. Blocks for a full round trip; the live pipeline uses
+# make_persister() instead.
 def insert_transcript(data: dict):
     url = f"{SUPABASE_URL}/transcripts"
     headers = {
-        "apikey": SUPABASE_API_KEY,
-        "Authorization": f"Bearer {SUPABASE_API_KEY}",
+        **supabase_headers(),
         "Content-Type": "application/json",
-        "Prefer": "return=minimal"
+        "Prefer": "return=representation"
     }
     response = requests.post(url, json=[data], headers=headers, timeout=5)
     response.raise_for_status()
@@ -21,22 +99,51 @@ def insert_transcript(data: dict):
 # Get all transcripts from Supabase
 def get_transcripts():
     url = f"{SUPABASE_URL}/transcripts?select=*"
-    headers = {
-        "apikey": SUPABASE_API_KEY,
-        "Authorization": f"Bearer {SUPABASE_API_KEY}"
-    }
-    response = requests.get(url, headers=headers, timeout=5)
+    response = requests.get(url, headers=supabase_headers(), timeout=5)
     response.raise_for_status()
     return response.json()
 
-# Get previous transcripts (for fact-checking context)
-def get_previous_transcripts():
-    url = f"{SUPABASE_URL}/transcripts?select=transcript&order=timestamp.desc&limit=10"
-    headers = {
-        "apikey": SUPABASE_API_KEY,
-        "Authorization": f"Bearer {SUPABASE_API_KEY}"
+# Transcript rows newer than `since` (an ISO timestamp; None = all), oldest first.
+# Used to sync the local context index.
+def fetch_transcripts(since: Optional[str] = None, limit: int = 10000) -> List[dict]:
+    params = {
+        "select": ",".join(DOC_FIELDS),
+        "order": "timestamp.asc",
+        "limit": str(limit),
     }
-    response = requests.get(url, headers=headers, timeout=5)
+    if since:
+        params["timestamp"] = f"gt.{since}"
+    response = requests.get(f"{SUPABASE_URL}/{TRANSCRIPTS_TABLE}", params=params, headers=supabase_headers(), timeout=10)
     response.raise_for_status()
-    transcripts = response.json()
-    return "\n".join([item["transcript"] for item in transcripts if "transcript" in item]) 
\ No newline at end of file
+    return response.json()
+
+_last_sync = 0.0  # time.monotonic() of the last sync attempt
+
+def sync_context_index() -> int:
+    """Pull transcripts this process hasn't indexed yet; returns how many were added."""
+    global _last_sync
+    if not SUPABASE_CONFIGURED:
+        return 0
+    _last_sync = time.monotonic()
+    return get_context_index().sync(fetch_transcripts)
+
+# Get previous transcripts (for fact-checking context): the snippets most
+# relevant to `query` from the local context index (the process-wide one by
+# default), or the most recent ones without a query, as "speaker: text"
+# lines. Only goes to Supabase to fill an empty index, at most once per
+# CONTEXT_SYNC_INTERVAL; the segment analyzers call this for every segment.
+def get_previous_transcripts(
+    query: Optional[str] = None,
+    k: int = CONTEXT_TOP_K,
+    exclude: Optional[Tuple[str, int]] = None,
+    index: Optional[ContextIndex] = None,
+) -> str:
+    if index is None:
+        index = get_context_index()
+    if not len(index) and time.monotonic() - _last_sync >= CONTEXT_SYNC_INTERVAL:
+        try:
+            sync_context_index()
+        except requests.RequestException as e:
+            logger.warning(f"Could not sync the context index: {e}")
+    snippets = index.search(query, k, exclude=exclude) if query else index.recent(k)
+    return "\n".join(f"{item['speaker']}: {item['transcript']}" for item in snippets)
@@ -0,0 +1,415 @@
+# transcript_store.py
+
+import bisect
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from analysis import TranscriptEntry
+
+# Newest entries always kept in memory; older ones are spilled to disk in batches
+TRANSCRIPT_HOT_ENTRIES = int(os.getenv("TRANSCRIPT_HOT_ENTRIES", "2000"))
+# Entries written per compressed chunk
+TRANSCRIPT_SPILL_BATCH = int(os.getenv("TRANSCRIPT_SPILL_BATCH", "500"))
+# Where spill files go ("" = the system temp dir); they are deleted on clear/close
+TRANSCRIPT_SPILL_DIR = os.getenv("TRANSCRIPT_SPILL_DIR", "")
+# zstd when the zstandard package is installed, gzip otherwise
+TRANSCRIPT_COMPRESSION = os.getenv("TRANSCRIPT_COMPRESSION", "zstd" if zstandard is not None else "gzip")
+
+# Decoded chunks kept around for sequential reads
+CHUNK_CACHE_SIZE = 4
+
+
+def entry_dict(seq: int, speaker: str, transcript: str, start: float, end: float, timestamp: float) -> dict:
+    """An entry in the shape served by the transcript endpoints."""
+    return {
+        "seq": seq,
+        "speaker": speaker,
+        "transcript": transcript,
+        "start": start,
+        "end": end,
+        "timestamp": datetime.utcfromtimestamp(timestamp).isoformat(),
+    }
+
+
+class Chunk(NamedTuple):
+    """Where one spilled batch lives in the spill file, and what it covers."""
+    first: int  # index of its first entry (since the last clear)
+    count: int
+    offset: int
+    length: int
+    min_start: float  # audio offsets covered, for time-range reads
+    max_end: float
+
+
+class SegmentSpill:
+    """
+    Append-only file of compressed chunks holding the oldest entries of a
+    TranscriptStore, one JSON line per entry. Chunks are immutable once
+    written; their positions are indexed in memory, so a read decompresses
+    only the chunks it touches.
+    """
+
+    def __init__(self, directory: str = TRANSCRIPT_SPILL_DIR, compression: str = TRANSCRIPT_COMPRESSION):
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("TRANSCRIPT_COMPRESSION=zstd needs the zstandard package")
+        if compression not in ("zstd", "gzip"):
+            raise ValueError(f"Unknown transcript compression {compression!r}, expected zstd or gzip")
+        self.compression = compression
+        self.directory = tempfile.mkdtemp(prefix="transcript-", dir=directory or None)
+        self.path = os.path.join(self.directory, f"segments.jsonl.{'zst' if compression == 'zstd' else 'gz'}")
+        self.file = open(self.path, "ab+")
+        self.chunks: List[Chunk] = []
+        self.firsts: List[int] = []  # chunk first indices, for bisect
+        self.cache: "OrderedDict[int, List[list]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.bytes = 0
+        self.raw_bytes = 0
+        self.closed = False
+
+    @property
+    def entries(self) -> int:
+        return self.chunks[-1].first + self.chunks[-1].count if self.chunks else 0
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor(level=3).compress(data)
+        return gzip.compress(data, compresslevel=6)
+
+    def _decompress(self, data: bytes) -> bytes:
+        if self.compression == "zstd":
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def write(self, rows: List[list]):
+        """Append a chunk of [speaker, text, start, end, timestamp] rows following the last one."""
+        raw = "".join(json.dumps(row) + "\n" for row in rows).encode()
+        data = self._compress(raw)
+        with self.lock:
+            self.file.seek(0, os.SEEK_END)
+            offset = self.file.tell()
+            self.file.write(data)
+            self.file.flush()
+            chunk = Chunk(self.entries, len(rows), offset, len(data),
+                          min(row[2] for row in rows), max(row[3] for row in rows))
+            self.chunks.append(chunk)
+            self.firsts.append(chunk.first)
+            self.bytes += len(data)
+            self.raw_bytes += len(raw)
+
+    def chunk_rows(self, i: int) -> List[list]:
+        with self.lock:
+            rows = self.cache.get(i)
+            if rows is not None:
+                self.cache.move_to_end(i)
+                return rows
+            if self.closed:
+                raise IndexError("transcript entry no longer available (the transcript was cleared)")
+            chunk = self.chunks[i]
+            self.file.seek(chunk.offset)
+            data = self.file.read(chunk.length)
+        rows = [json.loads(line) for line in self._decompress(data).splitlines()]
+        with self.lock:
+            self.cache[i] = rows
+            while len(self.cache) > CHUNK_CACHE_SIZE:
+                self.cache.popitem(last=False)
+        return rows
+
+    def row(self, index: int) -> list:
+        i = bisect.bisect_right(self.firsts, index) - 1
+        return self.chunk_rows(i)[index - self.chunks[i].first]
+
+    def rows(self, first: int = 0, last: Optional[int] = None) -> Iterator[tuple]:
+        """(index, row) for spilled indices in [first, last), one chunk in memory at a time."""
+        last = self.entries if last is None else min(last, self.entries)
+        if first >= last:
+            return
+        for i in range(max(0, bisect.bisect_right(self.firsts, first) - 1), len(self.chunks)):
+            chunk = self.chunks[i]
+            if chunk.first >= last:
+                break
+            rows = self.chunk_rows(i)
+            for j in range(max(first, chunk.first), min(last, chunk.first + chunk.count)):
+                yield j, rows[j - chunk.first]
+
+    def overlapping(self, start: float, end: float) -> List[int]:
+        """Indices of the chunks that may hold entries overlapping [start, end] audio seconds."""
+        return [i for i, chunk in enumerate(self.chunks) if chunk.min_start <= end and chunk.max_end >= start]
+
+    def close(self):
+        """Delete the spill file. Views still holding it can no longer read spilled entries."""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.cache.clear()
+            self.file.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class TranscriptStore(Sequence):
+    """
+    Append-only transcript storage with monotonically increasing sequence
+    numbers.
+
+    Entries are kept column-wise instead of as one pydantic object each:
+    speaker ids, audio offsets and timestamps in typed arrays, the text in a
+    plain list of strings. Sequence numbers keep increasing across `clear()`,
+    so a reader's `since` cursor from before a restart never matches new
+    entries by accident. Indexing yields TranscriptEntry objects built on
+    demand, so analysis code can treat the store as a list.
+
+    Memory stays bounded: only the newest `hot_entries` (plus up to one
+    batch) are held in memory. Older entries are spilled in batches of
+    `spill_batch` to a compressed, append-only SegmentSpill and read back
+    lazily by index, sequence number or audio time.
+    """
+
+    def __init__(
+        self,
+        hot_entries: int = TRANSCRIPT_HOT_ENTRIES,
+        spill_batch: int = TRANSCRIPT_SPILL_BATCH,
+        spill_dir: str = TRANSCRIPT_SPILL_DIR,
+        compression: str = TRANSCRIPT_COMPRESSION,
+    ):
+        self.lock = threading.Lock()
+        self.hot_entries = hot_entries
+        self.spill_batch = max(1, spill_batch)
+        self.spill_dir = spill_dir
+        self.compression = compression
+        self.spill: Optional[SegmentSpill] = None  # created on the first spill
+        self.spilled = 0  # entries on disk; in-memory index 0 is entry `spilled`
+        self.speaker_names: List[str] = []
+        self.speaker_index: Dict[str, int] = {}
+        self.speaker_ids = array("I")
+        self.starts = array("d")  # audio offset of the entry, seconds
+        self.ends = array("d")
+        self.timestamps = array("d")  # wall-clock time, seconds since the epoch
+        self.texts: List[str] = []
+        self.first_seq = 1  # sequence number of the entry at index 0
+        self.next_seq = 1
+
+    def append(
+        self,
+        speaker: str,
+        transcript: str,
+        start: float = 0.0,
+        end: float = 0.0,
+        timestamp: Optional[float] = None,
+    ) -> int:
+        """Store an entry and return its sequence number."""
+        with self.lock:
+            speaker_id = self.speaker_index.get(speaker)
+            if speaker_id is None:
+                speaker_id = len(self.speaker_names)
+                self.speaker_names.append(speaker)
+                self.speaker_index[speaker] = speaker_id
+            self.speaker_ids.append(speaker_id)
+            self.starts.append(start)
+            self.ends.append(end)
+            self.timestamps.append(time.time() if timestamp is None else timestamp)
+            self.texts.append(transcript)
+            seq = self.next_seq
+            self.next_seq += 1
+            if len(self.texts) >= self.hot_entries + self.spill_batch:
+                self._spill()
+            return seq
+
+    def _spill(self):
+        """Move the oldest batch of in-memory entries to disk. Called with the lock held."""
+        n = self.spill_batch
+        if self.spill is None:
+            self.spill = SegmentSpill(self.spill_dir, self.compression)
+        names = self.speaker_names
+        self.spill.write([
+            [names[self.speaker_ids[i]], self.texts[i], self.starts[i], self.ends[i], self.timestamps[i]]
+            for i in range(n)
+        ])
+        # New columns rather than deleting in place, so existing views stay valid
+        self.speaker_ids = self.speaker_ids[n:]
+        self.starts = self.starts[n:]
+        self.ends = self.ends[n:]
+        self.timestamps = self.timestamps[n:]
+        self.texts = self.texts[n:]
+        self.spilled += n
+
+    def clear(self):
+        """Drop all entries, including spilled ones. Sequence numbers continue from where they were."""
+        with self.lock:
+            if self.spill is not None:
+                self.spill.close()
+            self.spill = None
+            self.first_seq = self.next_seq
+            self.spilled = 0
+            self.speaker_names = []
+            self.speaker_index = {}
+            self.speaker_ids = array("I")
+            self.starts = array("d")
+            self.ends = array("d")
+            self.timestamps = array("d")
+            self.texts = []
+
+    def align(self, seq: int):
+        """Number the next entry `seq`, for a copy of another process's store that starts mid-meeting. Must be empty."""
+        with self.lock:
+            if self.spilled or self.texts:
+                raise ValueError("Only an empty store can be renumbered")
+            self.first_seq = self.next_seq = seq
+
+    def close(self):
+        self.clear()
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the newest entry (first_seq - 1 when empty)."""
+        return self.next_seq - 1
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.first_seq}-{self.last_seq}"'
+
+    def __len__(self) -> int:
+        return self.spilled + len(self.texts)
+
+    def __getitem__(self, index):
+        return self.snapshot()[index]
+
+    def snapshot(self) -> "TranscriptView":
+        """
+        A fixed-length view of the entries stored so far. Spilling and
+        clear() replace the columns rather than changing them, so a view
+        stays valid.
+        """
+        with self.lock:
+            return TranscriptView(
+                self.speaker_names, self.speaker_ids, self.texts, self.spill, self.spilled,
+                self.spilled + len(self.texts), self.first_seq,
+            )
+
+    def _hot_rows(self, first: int, last: int) -> Iterator[dict]:
+        """Entries with index in [first, last) that are in memory. Called with the lock held."""
+        names = self.speaker_names
+        for i in range(max(first, self.spilled) - self.spilled, min(last, len(self)) - self.spilled):
+            yield entry_dict(self.first_seq + self.spilled + i, names[self.speaker_ids[i]], self.texts[i],
+                             self.starts[i], self.ends[i], self.timestamps[i])
+
+    def _cold_rows(self, spill: Optional[SegmentSpill], first_seq: int, first: int, last: int) -> Iterator[dict]:
+        if spill is None:
+            return
+        for i, row in spill.rows(first, last):
+            yield entry_dict(first_seq + i, *row)
+
+    def read(self, from_seq: int = 0, to_seq: Optional[int] = None) -> Iterator[dict]:
+        """
+        The entries with from_seq <= seq <= to_seq, oldest first, as dicts.
+        Spilled entries are decompressed one chunk at a time as iteration
+        reaches them.
+        """
+        with self.lock:
+            spill, first_seq, spilled = self.spill, self.first_seq, self.spilled
+            first = max(0, from_seq - first_seq)
+            last = len(self) if to_seq is None else max(first, min(len(self), to_seq - first_seq + 1))
+            hot = list(self._hot_rows(first, last))
+        yield from self._cold_rows(spill, first_seq, first, min(last, spilled))
+        yield from hot
+
+    def since(self, seq: int = 0) -> List[dict]:
+        """Return the entries with a sequence number greater than `seq`, as dicts."""
+        return list(self.read(seq + 1))
+
+    def between(self, start: float, end: float) -> Iterator[dict]:
+        """The entries overlapping [start, end] seconds of audio, oldest first."""
+        with self.lock:
+            spill, first_seq = self.spill, self.first_seq
+            names, starts, ends, base = self.speaker_names, self.starts, self.ends, first_seq + self.spilled
+            hot = [
+                entry_dict(base + i, names[self.speaker_ids[i]], self.texts[i], starts[i], ends[i], self.timestamps[i])
+                for i in range(len(starts))
+                if starts[i] <= end and ends[i] >= start
+            ]
+        if spill is not None:
+            for i in spill.overlapping(start, end):
+                chunk = spill.chunks[i]
+                for j, row in spill.rows(chunk.first, chunk.first + chunk.count):
+                    if row[2] <= end and row[3] >= start:
+                        yield entry_dict(first_seq + j, *row)
+        yield from hot
+
+    def export(self) -> Iterator[str]:
+        """The whole transcript as JSON lines, streamed a chunk at a time."""
+        for row in self.read():
+            yield json.dumps(row) + "\n"
+
+    def stats(self) -> dict:
+        spill = self.spill
+        return {
+            "entries": len(self),
+            "in_memory": len(self.texts),
+            "spilled": self.spilled,
+            "chunks": len(spill.chunks) if spill is not None else 0,
+            "spill_bytes": spill.bytes if spill is not None else 0,
+            "compression_ratio": round(spill.bytes / spill.raw_bytes, 3) if spill is not None and spill.raw_bytes else None,
+        }
+
+
+class TranscriptView(Sequence):
+    """Read-only view of the first `length` entries of a TranscriptStore."""
+
+    def __init__(
+        self,
+        speaker_names: List[str],
+        speaker_ids: array,
+        texts: List[str],
+        spill: Optional[SegmentSpill] = None,
+        spilled: int = 0,
+        length: Optional[int] = None,
+        first_seq: int = 1,
+    ):
+        self.speaker_names = speaker_names
+        self.speaker_ids = speaker_ids
+        self.texts = texts
+        self.spill = spill
+        self.spilled = spilled  # entries before index `spilled` are read from the spill
+        self.length = spilled + len(texts) if length is None else length
+        self.first_seq = first_seq
+
+    @property
+    def version(self) -> Tuple[int, int]:
+        """(first, last) sequence number; identifies the transcript across clear() and renumbering."""
+        return self.first_seq, self.first_seq + self.length - 1
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._entry(i) for i in range(*index.indices(self.length))]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("transcript index out of range")
+        return self._entry(index)
+
+    def _entry(self, index: int) -> TranscriptEntry:
+        if index < self.spilled:
+            speaker, transcript = self.spill.row(index)[:2]
+            return TranscriptEntry(speaker=speaker, transcript=transcript)
+        index -= self.spilled
+        return TranscriptEntry(
+            speaker=self.speaker_names[self.speaker_ids[index]],
+            transcript=self.texts[index],
+        )
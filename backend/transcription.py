@@ -0,0 +1,217 @@
+# transcription.py
+
+import json
+import logging
+import os
+import re
+from types import SimpleNamespace
+from typing import Callable, List, Optional
+
+from audio_sources import SAMPLE_WIDTH, resolve_audio_path
+from sample_conversation import SAMPLE_CONVERSATION
+
+logger = logging.getLogger(__name__)
+
+# Environment variables
+DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
+
+
+class TranscriptionBackend:
+    """
+    Turns a stream of linear16 audio into Deepgram-shaped live results.
+
+    `start` opens the stream and registers `on_result`, which the backend
+    calls (from any thread) with each result as it arrives; `send` feeds
+    audio and `finish` closes the stream.
+    """
+
+    # Whether silence may be withheld from `send`. Backends that keep time by
+    # the audio they receive, like FakeTranscriptionBackend, need all of it
+    can_skip_silence = False
+
+    def start(self, on_result: Callable[[object], None], sample_rate: int, channels: int) -> bool:
+        raise NotImplementedError
+
+    def send(self, data: bytes):
+        raise NotImplementedError
+
+    def keep_alive(self):
+        """Keep the stream open while no audio is being sent."""
+
+    def finish(self):
+        pass
+
+
+class DeepgramBackend(TranscriptionBackend):
+    """Deepgram's live transcription websocket."""
+
+    can_skip_silence = True
+
+    def __init__(self, api_key: Optional[str] = None, model: str = "enhanced-meeting"):
+        self.api_key = api_key or DEEPGRAM_API_KEY
+        self.model = model
+        self.dg_connection = None
+
+    def start(self, on_result: Callable[[object], None], sample_rate: int, channels: int) -> bool:
+        # Imported here so the fake backend and headless deployments don't
+        # need the Deepgram SDK
+        from deepgram import DeepgramClient, LiveOptions, LiveTranscriptionEvents
+
+        dg = DeepgramClient(self.api_key)
+        self.dg_connection = dg.listen.websocket.v("1")
+
+        def on_transcript(connection, result, **kwargs):
+            on_result(result)
+
+        self.dg_connection.on(LiveTranscriptionEvents.Transcript, on_transcript)
+
+        options = LiveOptions(
+            model=self.model,
+            encoding="linear16",
+            sample_rate=sample_rate,
+            channels=channels,
+            punctuate=True,
+            interim_results=True,
+            diarize=True,
+        )
+        return bool(self.dg_connection.start(options))
+
+    def send(self, data: bytes):
+        self.dg_connection.send(data)
+
+    def keep_alive(self):
+        self.dg_connection.keep_alive()
+
+    def finish(self):
+        if self.dg_connection is not None:
+            self.dg_connection.finish()
+
+
+def make_result(words: List[SimpleNamespace], start: float, is_final: bool, speech_final: bool) -> SimpleNamespace:
+    """Build an object shaped like Deepgram's LiveResultResponse."""
+    end = words[-1].end if words else start
+    return SimpleNamespace(
+        type="Results",
+        start=start,
+        duration=end - start,
+        is_final=is_final,
+        speech_final=speech_final,
+        channel=SimpleNamespace(alternatives=[SimpleNamespace(
+            transcript=" ".join(w.punctuated_word for w in words),
+            confidence=1.0,
+            words=words,
+        )]),
+    )
+
+
+class FakeTranscriptionBackend(TranscriptionBackend):
+    """
+    Emits scripted Deepgram-shaped results instead of transcribing, so the
+    pipeline can run headless and be load-tested faster than real time.
+
+    The script is a list of {"speaker", "transcript"} messages (e.g.
+    SAMPLE_CONVERSATION) spoken back to back at `words_per_second`. Time is
+    measured by the amount of audio sent, not the wall clock, so a source
+    replayed at N x real time yields results N x faster. Like Deepgram,
+    each utterance is finalized in chunks of up to `final_words` words (only
+    the last one is `speech_final`), and each chunk is preceded by an interim
+    result covering its first half.
+    """
+
+    def __init__(self, script: List[dict], words_per_second: float = 2.5,
+                 gap: float = 0.4, interim_results: bool = True, repeat: bool = False,
+                 final_words: int = 12):
+        script = [message for message in script if message["transcript"].split()]
+        if not script:
+            raise ValueError("FakeTranscriptionBackend needs a non-empty script")
+        self.script = script
+        self.words_per_second = words_per_second
+        self.gap = gap
+        self.interim_results = interim_results
+        self.repeat = repeat
+        self.final_words = final_words
+        self.speaker_ids = {}
+        self.on_result: Optional[Callable[[object], None]] = None
+        self.bytes_per_second = 0
+        self.audio_time = 0.0
+        self.pending: List[tuple] = []  # (emit_at, result), in time order
+        self.next_message = 0
+        self.next_start = 0.0
+        self.results_sent = 0
+
+    def start(self, on_result: Callable[[object], None], sample_rate: int, channels: int) -> bool:
+        self.on_result = on_result
+        self.bytes_per_second = sample_rate * channels * SAMPLE_WIDTH
+        return True
+
+    def _speaker_id(self, speaker) -> int:
+        if isinstance(speaker, int):
+            return speaker
+        match = re.fullmatch(r"Speaker (\d+)", str(speaker))
+        if match:
+            return int(match.group(1)) - 1
+        return self.speaker_ids.setdefault(speaker, len(self.speaker_ids))
+
+    def _schedule_next(self) -> bool:
+        """Lay out the next scripted utterance. Returns False when the script is done."""
+        if self.next_message >= len(self.script):
+            if not self.repeat:
+                return False
+            self.next_message = 0
+        message = self.script[self.next_message]
+        self.next_message += 1
+
+        speaker = self._speaker_id(message["speaker"])
+        start = self.next_start
+        step = 1.0 / self.words_per_second
+        words = [
+            SimpleNamespace(
+                word=re.sub(r"[^\w']", "", token).lower(),
+                punctuated_word=token,
+                start=start + i * step,
+                end=start + (i + 0.8) * step,
+                confidence=1.0,
+                speaker=speaker,
+            )
+            for i, token in enumerate(message["transcript"].split())
+        ]
+        self.next_start = words[-1].end + self.gap
+
+        for i in range(0, len(words), self.final_words):
+            chunk = words[i:i + self.final_words]
+            chunk_start = chunk[0].start
+            if self.interim_results and len(chunk) > 1:
+                half = chunk[:len(chunk) // 2]
+                self.pending.append((half[-1].end, make_result(half, chunk_start, False, False)))
+            speech_final = i + self.final_words >= len(words)
+            self.pending.append((chunk[-1].end, make_result(chunk, chunk_start, True, speech_final)))
+        return True
+
+    def send(self, data: bytes):
+        self.audio_time += len(data) / self.bytes_per_second
+        while True:
+            if not self.pending and not self._schedule_next():
+                return
+            emit_at, result = self.pending[0]
+            if emit_at > self.audio_time:
+                return
+            self.pending.pop(0)
+            self.results_sent += 1
+            self.on_result(result)
+
+
+def make_backend(kind: str, script_path: Optional[str] = None, repeat: bool = False) -> TranscriptionBackend:
+    """
+    Build a TranscriptionBackend by name: deepgram, or fake (scripted from a
+    JSON file of messages under AUDIO_FILE_DIR, SAMPLE_CONVERSATION by default).
+    """
+    if kind == "deepgram":
+        return DeepgramBackend()
+    if kind == "fake":
+        if script_path:
+            with open(resolve_audio_path(script_path), "r") as f:
+                script = json.load(f)
+        else:
+            script = SAMPLE_CONVERSATION
+        return FakeTranscriptionBackend(script, repeat=repeat)
+    raise ValueError(f"Unknown transcription backend {kind!r}")
@@ -1,34 +1,13 @@
 'use client'
 
-import { useState, useEffect } from 'react'
-import axios from 'axios'
 import LiveTranscriptPanel from '@/components/LiveTranscriptPanel'
 import AnalyticsPanel from '@/components/AnalyticsPanel'
+import ReplayControls from '@/features/demo/ReplayControls'
+import useDemoReplay from '@/features/demo/useDemoReplay'
 import Link from 'next/link'
 
 export default function DemoPage() {
-  const [transcripts, setTranscripts] = useState<any[]>([])
-  const [error, setError] = useState<string | null>(null)
-  const [initialLoad, setInitialLoad] = useState(true)
-
-  const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
-
-  useEffect(() => {
-    fetchDemoConversation()
-  }, [])
-
-  const fetchDemoConversation = async () => {
-    try {
-      const response = await axios.get(`${API_URL}/demo/conversation`)
-      setTranscripts(response.data)
-      setError(null)
-    } catch (error: any) {
-      console.error('Failed to fetch demo conversation:', error)
-      setError(error.response?.data?.detail || "Failed to load demo conversation")
-    } finally {
-      setInitialLoad(false)
-    }
-  }
+  const { transcripts, error, initialLoad, speed, ended, setSpeed, restart } = useDemoReplay()
 
   if (initialLoad) {
     return (
@@ -46,12 +25,15 @@ export default function DemoPage() {
         <div className="bg-white rounded-2xl shadow-sm p-6">
           <div className="flex justify-between items-center mb-6">
             <h2 className="text-xl">Demo Conversation</h2>
-            <Link
-              href="/real-time"
-              className="px-4 py-2 rounded-lg font-medium bg-purple-50 text-purple-600 hover:bg-purple-100"
-            >
-              Switch to Live Mode
-            </Link>
+            <div className="flex items-center gap-3">
+              <ReplayControls speed={speed} ended={ended} onSpeed={setSpeed} onRestart={restart} />
+              <Link
+                href="/real-time"
+                className="px-4 py-2 rounded-lg font-medium bg-purple-50 text-purple-600 hover:bg-purple-100"
+              >
+                Switch to Live Mode
+              </Link>
+            </div>
           </div>
           <LiveTranscriptPanel transcripts={transcripts} />
         </div>
@@ -63,6 +45,12 @@ export default function DemoPage() {
           <AnalyticsPanel transcripts={transcripts} />
         </div>
       </div>
+
+      {error && (
+        <div className="fixed bottom-4 right-4 bg-red-100 text-red-700 p-4 rounded-lg shadow-lg">
+          {error}
+        </div>
+      )}
     </div>
   )
-} 
\ No newline at end of file
+}
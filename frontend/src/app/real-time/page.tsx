@@ -4,6 +4,7 @@ import { useState, useRef, useEffect } from 'react'
 import axios from 'axios'
 import LiveTranscriptPanel from '@/components/LiveTranscriptPanel'
 import AnalyticsPanel from '@/components/AnalyticsPanel'
+import { applyFrame } from '@/features/realtime/messages'
 import Link from 'next/link'
 
 const logger = {
@@ -34,8 +35,8 @@ export default function RealTimePage() {
       }
       ws.onmessage = (event) => {
         try {
-          const data = JSON.parse(event.data)
-          setTranscripts(prev => [...prev, data])
+          const frame = JSON.parse(event.data)
+          setTranscripts(prev => applyFrame(prev, frame))
         } catch (err) {
           logger.error('Failed to parse message:', err)
         }
@@ -6,6 +6,7 @@ interface Fallacy {
 
 interface Analysis {
   info_density: number;
+  llm_info_density?: number;
   sentiment: number;
   controversial: boolean;
   fallacies: Fallacy[];
@@ -17,6 +18,7 @@ interface Transcript {
   transcript: string;
   timestamp: string;
   analysis: Analysis;
+  interim?: boolean;
 }
 
 interface Props {
@@ -70,14 +72,14 @@ export default function LiveTranscriptPanel({ transcripts }: Props) {
                 {new Date(t.timestamp).toLocaleTimeString()}
               </span>
             </div>
-            <div className="text-gray-600">
+            <div className={t.interim ? "text-gray-400 italic" : "text-gray-600"}>
               {analysis.fallacies?.length > 0 
                 ? highlightFallacy(t.transcript, analysis.fallacies)
                 : t.transcript
               }
             </div>
             <div className="flex gap-2 text-sm">
-              {analysis.info_density > 0.8 && (
+              {(analysis.llm_info_density ?? analysis.info_density) > 0.8 && (
                 <span className="bg-emerald-50 text-emerald-700 px-2 py-0.5 rounded">
                   High Density
                 </span>
@@ -0,0 +1,37 @@
+'use client'
+
+import { DEMO_SPEEDS } from '@/features/demo/useDemoReplay'
+
+interface Props {
+  speed: number;
+  ended: boolean;
+  onSpeed: (speed: number) => void;
+  onRestart: () => void;
+}
+
+export default function ReplayControls({ speed, ended, onSpeed, onRestart }: Props) {
+  return (
+    <div className="flex items-center gap-1">
+      {DEMO_SPEEDS.map(value => (
+        <button
+          key={value}
+          onClick={() => onSpeed(value)}
+          className={`px-2 py-1 rounded-md text-sm font-medium transition-colors
+            ${speed === value
+              ? 'bg-gray-800 text-white'
+              : 'bg-gray-100 text-gray-600 hover:bg-gray-200'}`}
+        >
+          {value}×
+        </button>
+      ))}
+      {ended && (
+        <button
+          onClick={onRestart}
+          className="px-2 py-1 rounded-md text-sm font-medium bg-gray-100 text-gray-600 hover:bg-gray-200"
+        >
+          Replay
+        </button>
+      )}
+    </div>
+  )
+}
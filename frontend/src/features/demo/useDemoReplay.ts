@@ -0,0 +1,73 @@
+'use client'
+
+import { useState, useRef, useEffect } from 'react'
+import { applyFrame } from '@/features/realtime/messages'
+
+export const DEMO_SPEEDS = [1, 4, 10]
+
+// Plays the demo conversation from /demo/ws, which replays it at its recorded
+// timing in the real-time message protocol, so demo mode goes through the
+// same message handling as a live meeting.
+export default function useDemoReplay(initialSpeed: number = DEMO_SPEEDS[0]) {
+  const [transcripts, setTranscripts] = useState<any[]>([])
+  const [error, setError] = useState<string | null>(null)
+  const [initialLoad, setInitialLoad] = useState(true)
+  const [speed, setSpeedState] = useState(initialSpeed)
+  const [ended, setEnded] = useState(false)
+
+  const wsRef = useRef<WebSocket | null>(null)
+
+  const WS_URL = process.env.NEXT_PUBLIC_WS_URL || 'ws://localhost:8000'
+
+  useEffect(() => {
+    const ws = new WebSocket(`${WS_URL}/demo/ws?speed=${initialSpeed}`)
+    ws.onmessage = (event) => {
+      try {
+        const frame = JSON.parse(event.data)
+        if (!Array.isArray(frame) && frame.type === 'replay') {
+          setInitialLoad(false)
+          setSpeedState(frame.speed)
+          setEnded(frame.event === 'end')
+          // A seek is followed by one frame with every message before the
+          // new position, so start over from an empty transcript
+          if (frame.event === 'seek') {
+            setTranscripts([])
+          }
+          return
+        }
+        setTranscripts(prev => applyFrame(prev, frame))
+      } catch (err) {
+        console.error('Failed to parse message:', err)
+      }
+    }
+    ws.onerror = (err) => {
+      console.error('Demo replay WebSocket error:', err)
+      setError('Failed to connect to the demo replay')
+      setInitialLoad(false)
+    }
+    ws.onclose = (event) => {
+      if (event.code === 1011) {
+        setError(event.reason || 'Failed to load demo conversation')
+      }
+      setInitialLoad(false)
+    }
+    wsRef.current = ws
+
+    return () => {
+      ws.close()
+      wsRef.current = null
+    }
+  }, [WS_URL, initialSpeed])
+
+  const send = (command: object) => {
+    const ws = wsRef.current
+    if (ws && ws.readyState === WebSocket.OPEN) {
+      ws.send(JSON.stringify(command))
+    }
+  }
+
+  const setSpeed = (value: number) => send({ command: 'speed', speed: value })
+  const restart = () => send({ command: 'seek', position: 0 })
+
+  return { transcripts, error, initialLoad, speed, ended, setSpeed, restart }
+}
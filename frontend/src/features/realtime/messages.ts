@@ -0,0 +1,56 @@
+// Handling of the /real-time/ws message protocol. The demo replay (/demo/ws)
+// speaks the same protocol, so live and demo views share these helpers.
+
+export const applySentiment = (transcripts: any[], scores: any[]) => {
+  const updated = [...transcripts]
+  for (const score of scores) {
+    for (let i = updated.length - 1; i >= 0; i--) {
+      if (updated[i].speaker === score.Speaker && !updated[i].interim) {
+        updated[i] = {
+          ...updated[i],
+          analysis: { ...updated[i].analysis, sentiment: score.Sentiment },
+        }
+        break
+      }
+    }
+  }
+  return updated
+}
+
+// Segment analyzers (info density, controversy, fallacies) finish after the
+// segment was shown; merge their record into the transcript with that seq.
+export const applySegmentAnalysis = (transcripts: any[], seq: number, record: any) =>
+  transcripts.map(t =>
+    t.seq === seq && !t.interim ? { ...t, analysis: { ...t.analysis, ...record } } : t
+  )
+
+// Interim text is shown as one in-progress line per speaker, replaced by the
+// next interim update and dropped once that speaker's final segment arrives.
+export const applyTranscript = (transcripts: any[], data: any) => {
+  const updated = transcripts.filter(t => !(t.interim && t.speaker === data.speaker))
+  if (data.type === 'interim') {
+    return [...updated, { ...data, interim: true }]
+  }
+  return [...updated, data]
+}
+
+// Apply one parsed WebSocket frame: a message, or a JSON array of the
+// messages published within one tick.
+export const applyFrame = (transcripts: any[], frame: any) => {
+  const messages = Array.isArray(frame) ? frame : [frame]
+  let updated = transcripts
+  for (const data of messages) {
+    if (data.type === 'analysis') {
+      // Sentiment arrives separately from the snippet it scores; apply it
+      // to each speaker's latest transcript.
+      if (data.kind === 'sentiment' && Array.isArray(data.data)) {
+        updated = applySentiment(updated, data.data)
+      } else if (data.kind === 'segment') {
+        updated = applySegmentAnalysis(updated, data.seq, data.data)
+      }
+    } else if (data.type === 'transcript' || data.type === 'interim') {
+      updated = applyTranscript(updated, data)
+    }
+  }
+  return updated
+}